@@ -0,0 +1,79 @@
+from django.apps import apps as apps_globais
+from django.db.models import Count, Min, Sum
+
+
+def mesclar_duplicados(apps=None):
+    """
+    Junta os registros duplicados antes das restrições de unicidade:
+    turnos com a mesma sigla, escalas com a mesma (unidade, mes, ano) e
+    atribuições repetidas (escala, funcionario, dia, tipo_turno).
+    Aceita o registro de apps histórico para poder rodar dentro de uma migração.
+    Retorna a quantidade de registros removidos por modelo.
+    """
+    apps = apps or apps_globais
+    Turno = apps.get_model('core', 'Turno')
+    Escala = apps.get_model('core', 'Escala')
+    AtribuicaoEscala = apps.get_model('core', 'AtribuicaoEscala')
+    CargaHorariaMensal = apps.get_model('core', 'CargaHorariaMensal')
+
+    removidos = {'turnos': 0, 'escalas': 0, 'atribuicoes': 0}
+    escalas_afetadas = set()
+
+    # Turnos: fica o de menor id de cada sigla
+    repetidos = Turno.objects.values('sigla').annotate(qtd=Count('id'), manter=Min('id')).filter(qtd__gt=1)
+    for grupo in repetidos:
+        outros = list(Turno.objects.filter(sigla=grupo['sigla']).exclude(id=grupo['manter']).values_list('id', flat=True))
+        escalas_afetadas.update(
+            AtribuicaoEscala.objects.filter(tipo_turno_id__in=outros).values_list('escala_id', flat=True).distinct()
+        )
+        AtribuicaoEscala.objects.filter(tipo_turno_id__in=outros).update(tipo_turno_id=grupo['manter'])
+        removidos['turnos'] += Turno.objects.filter(id__in=outros).delete()[1].get(Turno._meta.label, 0)
+
+    # Escalas: fica a mais antiga; atribuições e observações vão para ela
+    repetidas = (
+        Escala.objects.values('unidade_id', 'mes', 'ano')
+        .annotate(qtd=Count('id'), manter=Min('id'))
+        .filter(qtd__gt=1)
+    )
+    for grupo in repetidas:
+        escalas = list(Escala.objects.filter(
+            unidade_id=grupo['unidade_id'], mes=grupo['mes'], ano=grupo['ano']
+        ).order_by('id'))
+        principal, outras = escalas[0], escalas[1:]
+        outros_ids = [e.id for e in outras]
+        observacoes = [principal.observacoes] + [e.observacoes for e in outras]
+        principal.observacoes = "\n".join(dict.fromkeys(o.strip() for o in observacoes if o and o.strip()))
+        principal.save(update_fields=['observacoes'])
+        AtribuicaoEscala.objects.filter(escala_id__in=outros_ids).update(escala_id=principal.id)
+        CargaHorariaMensal.objects.filter(escala_id__in=outros_ids).delete()
+        removidos['escalas'] += Escala.objects.filter(id__in=outros_ids).delete()[1].get(Escala._meta.label, 0)
+        escalas_afetadas.add(principal.id)
+
+    # Atribuições idênticas: fica a de menor id
+    repetidas = (
+        AtribuicaoEscala.objects.values('escala_id', 'funcionario_id', 'dia', 'tipo_turno_id')
+        .annotate(qtd=Count('id'), manter=Min('id'))
+        .filter(qtd__gt=1)
+    )
+    for grupo in repetidas:
+        manter = grupo.pop('manter')
+        grupo.pop('qtd')
+        removidos['atribuicoes'] += AtribuicaoEscala.objects.filter(**grupo).exclude(id=manter).delete()[0]
+        escalas_afetadas.add(grupo['escala_id'])
+
+    # C.H. mensal das escalas que mudaram
+    if escalas_afetadas:
+        CargaHorariaMensal.objects.filter(escala_id__in=escalas_afetadas).delete()
+        linhas = (
+            AtribuicaoEscala.objects.filter(escala_id__in=escalas_afetadas)
+            .values('escala_id', 'funcionario_id')
+            .annotate(total=Sum('tipo_turno__horas'))
+            .order_by()
+        )
+        CargaHorariaMensal.objects.bulk_create(
+            [CargaHorariaMensal(escala_id=l['escala_id'], funcionario_id=l['funcionario_id'], horas=l['total'] or 0)
+             for l in linhas],
+            batch_size=1000,
+        )
+
+    return removidos
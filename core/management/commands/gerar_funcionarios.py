@@ -0,0 +1,270 @@
+import calendar
+import random
+import time
+from datetime import date, time as hora, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import (
+    AtribuicaoEscala, CargaHorariaMensal, Escala, Feriado, Ferias, Funcionario, Turno, Unidade,
+)
+from escalas.cache import invalidar_escala, invalidar_feriados
+from escalas.versoes import registrar_versao
+
+# Listas de nomes e sobrenomes comuns brasileiros para gerar nomes fictícios
+NOMES = [
+    'João', 'Maria', 'Ana', 'Pedro', 'José', 'Paula', 'Carlos', 'Fernanda', 'Lucas', 'Juliana',
+    'Rafael', 'Camila', 'Gabriel', 'Larissa', 'Felipe', 'Beatriz', 'Matheus', 'Isabela', 'Bruno', 'Letícia',
+    'Diego', 'Vitória', 'Thiago', 'Sophia', 'Rodrigo', 'Amanda', 'Gustavo', 'Laura', 'Eduardo', 'Bianca',
+    'Ricardo', 'Natália', 'Henrique', 'Alícia', 'André', 'Gabriela', 'Vinícius', 'Luana', 'Leonardo', 'Carolina',
+    'Alexandre', 'Manuela', 'Fábio', 'Valentina', 'Roberto', 'Helena', 'Sérgio', 'Clara', 'Antônio', 'Elisa',
+    'Miguel', 'Alice', 'Arthur', 'Heloísa', 'Samuel', 'Lívia', 'Davi', 'Yasmin', 'Lorenzo', 'Mirella',
+    'Benjamin', 'Rebeca', 'Heitor', 'Stella', 'Enzo', 'Luna', 'Joaquim', 'Maya', 'Valentim', 'Aurora',
+    'Theo', 'Melissa', 'Lucca', 'Cecília', 'César', 'Eloá', 'Isaac', 'Esther', 'Bernardo', 'Sarah',
+    'Daniel', 'Olívia', 'Murilo', 'Liz', 'Luan', 'Antonella', 'Otávio', 'Allana', 'Cauê', 'Milena',
+    'Ian', 'Lavínia', 'Levi', 'Maria Eduarda', 'Noah', 'Maria Clara', 'Bento', 'Maria Julia', 'Vicente', 'Maria Luiza'
+]
+
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Costa',
+    'Ribeiro', 'Carvalho', 'Gomes', 'Martins', 'Araújo', 'Melo', 'Barbosa', 'Cardoso', 'Nunes', 'Dias',
+    'Rocha', 'Marques', 'Vieira', 'Castro', 'Machado', 'Fernandes', 'Mendes', 'Freitas', 'Monteiro', 'Moreira',
+    'Correia', 'Cavalcanti', 'Batista', 'Moura', 'Cavalcante', 'Lopes', 'Miranda', 'Gonçalves', 'Borges', 'Teixeira',
+    'Reis', 'Pinto', 'Ramos', 'Tavares', 'Bezerra', 'Farias', 'Magalhães', 'Dantas', 'Leite', 'Peixoto',
+    'Barros', 'Campos', 'Viana', 'Andrade', 'Nogueira', 'Xavier', 'Pires', 'Duarte', 'Figueiredo', 'Sousa',
+    'Braga', 'Macedo', 'Pinheiro', 'Moraes', 'Queiroz', 'Garcia', 'Almeida', 'Fonseca', 'Cruz', 'Brito',
+    'Guimarães', 'Aguiar', 'Rezende', 'Sales', 'Furtado', 'Siqueira', 'Medeiros', 'Paiva', 'Morais', 'Azevedo',
+    'Amaral', 'Franco', 'Cunha', 'Sampaio', 'Assis', 'Neves', 'Mesquita', 'Domingues', 'Coelho', 'Rego',
+    'Guedes', 'Pessoa', 'Saraiva', 'Lins', 'Pontes', 'Nascimento', 'Fagundes', 'Matos', 'Dutra', 'Guerra'
+]
+
+UNIDADES = [
+    'UTI Adulto', 'Clínica Médica', 'Emergência', 'Pediatria', 'Centro Cirúrgico', 'Obstetrícia', 'UTI Neonatal',
+    'Clínica Cirúrgica', 'Oncologia', 'Hemodiálise', 'Cardiologia', 'Ortopedia', 'Neurologia', 'Infectologia',
+]
+
+# (cargo, grupo, peso no sorteio)
+CARGOS = [('TE', 'TÉCNICOS EM ENFERMAGEM', 6), ('ENF', 'ENFERMEIROS', 3), ('AE', 'AUXILIARES', 1)]
+VINCULOS = ['EBSERH', 'UFMA', 'MS']
+CH_SEMANAIS = [36, 40]
+TURNOS_PREFERIDOS = ['M6', 'T6', 'N12', 'M6, T6', '', '', '']
+
+# sigla, descrição, início, fim, horas, período
+CATALOGO_TURNOS = [
+    ('M6', 'Matutino 07:00-13:00', hora(7), hora(13), 6, 'matutino'),
+    ('T6', 'Vespertino 13:00-19:00', hora(13), hora(19), 6, 'vespertino'),
+    ('M12', 'Diurno 07:00-19:00', hora(7), hora(19), 12, 'matutino'),
+    ('N12', 'Noturno 19:00-07:00', hora(19), hora(7), 12, 'noturno'),
+    ('FO', 'Folga', None, None, 0, 'folga'),
+    ('FE', 'Férias', None, None, 0, 'folga'),
+]
+
+# Ciclos de trabalho por C.H. semanal: o funcionário percorre o ciclo a partir de um deslocamento sorteado
+CICLOS = {
+    36: ['M6', 'T6', 'N12', 'FO', 'FO'],
+    40: ['M6', 'M6', 'T6', 'N12', 'FO', 'FO'],
+}
+
+# Feriados nacionais de data fixa (mês, dia, tipo)
+FERIADOS_FIXOS = [
+    (1, 1, 'FD'), (4, 21, 'FD'), (5, 1, 'FD'), (9, 7, 'FD'), (10, 12, 'FD'),
+    (10, 28, 'PF'), (11, 2, 'FD'), (11, 15, 'FD'), (11, 20, 'FD'), (12, 24, 'PF'), (12, 25, 'FD'), (12, 31, 'PF'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados fictícios em volume para testes de carga: unidades, funcionários, turnos, "
+        "feriados, férias e escalas preenchidas. Com a mesma --semente o resultado é o mesmo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unidades', type=int, default=5, help="Quantidade de unidades novas.")
+        parser.add_argument('--funcionarios', type=int, default=100, help="Total de funcionários, repartidos entre as unidades.")
+        parser.add_argument('--anos', type=int, default=0, help="Anos de escalas a gerar (0 = só cadastros).")
+        parser.add_argument('--ano-inicial', type=int, default=None, help="Primeiro ano das escalas (padrão: para terminar no ano atual).")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do gerador aleatório.")
+        parser.add_argument('--lote', type=int, default=5000, help="Linhas por bulk_create.")
+
+    def handle(self, *args, **options):
+        if options['unidades'] < 1 or options['funcionarios'] < 1:
+            raise CommandError("--unidades e --funcionarios devem ser maiores que zero.")
+        self.rng = random.Random(options['semente'])
+        self.lote = options['lote']
+        anos = options['anos']
+        ano_inicial = options['ano_inicial'] or date.today().year - max(anos, 1) + 1
+        inicio = time.monotonic()
+
+        with transaction.atomic():
+            turnos = self.criar_turnos()
+            unidades = self.criar_unidades(options['unidades'])
+            funcionarios = self.criar_funcionarios(options['funcionarios'], unidades)
+            self.stdout.write(f"{len(unidades)} unidade(s), {len(funcionarios)} funcionário(s), {len(turnos)} turno(s).")
+            if anos:
+                anos = list(range(ano_inicial, ano_inicial + anos))
+                feriados = self.criar_feriados(anos)
+                ferias = self.criar_ferias(funcionarios, anos)
+                total = self.criar_escalas(unidades, funcionarios, turnos, anos, ferias)
+                self.stdout.write(
+                    f"{len(feriados)} feriado(s) novo(s), {sum(len(p) for p in ferias.values())} período(s) de férias, "
+                    f"{total['escalas']} escala(s), {total['atribuicoes']} atribuição(ões)."
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Dados gerados em {time.monotonic() - inicio:.1f}s."))
+
+    # Cadastros
+
+    def criar_turnos(self):
+        Turno.objects.bulk_create(
+            [Turno(sigla=s, descricao=d, hora_inicio=i, hora_fim=f, horas=h, periodo=p) for s, d, i, f, h, p in CATALOGO_TURNOS],
+            ignore_conflicts=True,
+        )
+        return {t.sigla: t for t in Turno.objects.filter(sigla__in=[t[0] for t in CATALOGO_TURNOS])}
+
+    def criar_unidades(self, quantidade):
+        unidades = []
+        for n in range(quantidade):
+            nome = UNIDADES[n % len(UNIDADES)]
+            if n >= len(UNIDADES):
+                nome = f"{nome} {n // len(UNIDADES) + 1}"
+            unidades.append(Unidade(nome=nome, portaria=f"{self.rng.randint(100, 2999)}/{date.today().year}"))
+        # Postgres e SQLite devolvem os ids no bulk_create
+        return Unidade.objects.bulk_create(unidades, batch_size=self.lote)
+
+    def criar_funcionarios(self, quantidade, unidades):
+        rng = self.rng
+        siapes_usados = set(Funcionario.objects.values_list('siape', flat=True))
+        # unidades de tamanhos diferentes, como no hospital
+        pesos = [rng.uniform(0.5, 2.0) for _ in unidades]
+        cargos = [c for c, _, _ in CARGOS]
+        grupos = {c: g for c, g, _ in CARGOS}
+        pesos_cargo = [p for _, _, p in CARGOS]
+
+        funcionarios = []
+        for _ in range(quantidade):
+            siape = str(rng.randint(1000000, 9999999))
+            while siape in siapes_usados:
+                siape = str(rng.randint(1000000, 9999999))
+            siapes_usados.add(siape)
+            cargo = rng.choices(cargos, pesos_cargo)[0]
+            funcionarios.append(Funcionario(
+                nome_completo=f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}",
+                siape=siape,
+                registro_conselho=f"COREN-{rng.randint(100000, 999999)}" if cargo != 'AE' else "",
+                classe=rng.choice(['A', 'B', 'C', '']),
+                cargo=cargo,
+                vinculo=rng.choice(VINCULOS),
+                ch_semanal=rng.choice(CH_SEMANAIS),
+                unidade=rng.choices(unidades, pesos)[0],
+                grupo=grupos[cargo],
+                preferencias_turno=rng.choice(TURNOS_PREFERIDOS),
+            ))
+        Funcionario.objects.bulk_create(funcionarios, batch_size=self.lote)
+        return funcionarios
+
+    def criar_feriados(self, anos):
+        existentes = set(Feriado.objects.filter(data__year__in=anos).values_list('data', flat=True))
+        novos = [
+            Feriado(data=date(ano, mes, dia), tipo=tipo)
+            for ano in anos for mes, dia, tipo in FERIADOS_FIXOS
+            if date(ano, mes, dia) not in existentes
+        ]
+        Feriado.objects.bulk_create(novos, batch_size=self.lote)
+        if novos:
+            # bulk_create não dispara os sinais que invalidam os meses do calendário
+            invalidar_feriados()
+        return novos
+
+    def criar_ferias(self, funcionarios, anos):
+        """
+        Um período de 30 dias (ou dois de 15) por funcionário e ano.
+        Retorna {funcionario_id: [(inicio, fim), ...]}.
+        """
+        rng = self.rng
+        periodos = {}
+        ferias = []
+        for func in funcionarios:
+            for ano in anos:
+                duracoes = [30] if rng.random() < 0.7 else [15, 15]
+                for duracao in duracoes:
+                    inicio = date(ano, 1, 1) + timedelta(days=rng.randrange(365 - duracao))
+                    fim = inicio + timedelta(days=duracao - 1)
+                    periodos.setdefault(func.id, []).append((inicio, fim))
+                    ferias.append(Ferias(funcionario_id=func.id, data_inicio=inicio, data_fim=fim))
+        Ferias.objects.bulk_create(ferias, batch_size=self.lote)
+        return periodos
+
+    # Escalas
+
+    def criar_escalas(self, unidades, funcionarios, turnos, anos, ferias):
+        por_unidade = {}
+        for func in funcionarios:
+            por_unidade.setdefault(func.unidade_id, []).append(func)
+        deslocamento = {func.id: self.rng.randrange(len(CICLOS[func.ch_semanal])) for func in funcionarios}
+        id_turno = {sigla: turno.id for sigla, turno in turnos.items()}
+        horas_turno = {turno.id: turno.horas for turno in turnos.values()}
+        ferias_id = id_turno['FE']
+
+        escalas = Escala.objects.bulk_create(
+            [Escala(unidade=u, mes=mes, ano=ano) for ano in anos for mes in range(1, 13) for u in unidades],
+            batch_size=self.lote,
+        )
+
+        total = {'escalas': len(escalas), 'atribuicoes': 0}
+        ciclos = {ch: [id_turno[sigla] for sigla in ciclo] for ch, ciclo in CICLOS.items()}
+        atribuicoes = []
+        cargas = []
+        no_lote = []
+        for escala in escalas:
+            num_dias = calendar.monthrange(escala.ano, escala.mes)[1]
+            primeiro = date(escala.ano, escala.mes, 1)
+            ultimo = date(escala.ano, escala.mes, num_dias)
+            # dia corrido, para o ciclo continuar de um mês para o outro
+            base = primeiro.toordinal()
+            for func in por_unidade.get(escala.unidade_id, []):
+                ciclo = ciclos[func.ch_semanal]
+                inicio_ciclo = base + deslocamento[func.id]
+                de_ferias = set()
+                for i, f in ferias.get(func.id, []):
+                    if i <= ultimo and f >= primeiro:
+                        de_ferias.update(range(max(i, primeiro).day, min(f, ultimo).day + 1))
+                horas = 0
+                for dia in range(1, num_dias + 1):
+                    turno_id = ferias_id if dia in de_ferias else ciclo[(inicio_ciclo + dia) % len(ciclo)]
+                    horas += horas_turno[turno_id]
+                    atribuicoes.append((escala.id, func.id, dia, turno_id))
+                cargas.append(CargaHorariaMensal(escala_id=escala.id, funcionario_id=func.id, horas=horas))
+            no_lote.append(escala)
+            # o lote só fecha entre escalas: cada uma é gravada inteira antes da sua versão
+            if len(atribuicoes) >= self.lote:
+                total['atribuicoes'] += self._gravar(atribuicoes, cargas, no_lote)
+                atribuicoes, cargas, no_lote = [], [], []
+        total['atribuicoes'] += self._gravar(atribuicoes, cargas, no_lote)
+        return total
+
+    def _gravar(self, atribuicoes, cargas, escalas):
+        """
+        Grava um lote de atribuições (tuplas escala, funcionário, dia, turno) e a C.H.
+        mensal já somada. As atribuições vão num executemany direto: são centenas
+        de milhares de linhas e montar um AtribuicaoEscala por linha para o
+        bulk_create custava mais que o próprio INSERT. Como nenhum dos dois dispara
+        sinais, cada escala do lote ganha aqui a primeira versão no histórico e tem
+        o cache invalidado, como numa gravação pela tela.
+        """
+        if atribuicoes:
+            meta = AtribuicaoEscala._meta
+            colunas = ", ".join(
+                connection.ops.quote_name(meta.get_field(campo).column)
+                for campo in ("escala", "funcionario", "dia", "tipo_turno")
+            )
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {connection.ops.quote_name(meta.db_table)} ({colunas}) VALUES (%s, %s, %s, %s)",
+                    atribuicoes,
+                )
+        CargaHorariaMensal.objects.bulk_create(cargas, batch_size=self.lote)
+        for escala in escalas:
+            registrar_versao(escala, origem="gerar_funcionarios")
+            invalidar_escala(escala.id)
+        return len(atribuicoes)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.duplicados import mesclar_duplicados
+
+
+class Command(BaseCommand):
+    help = "Junta turnos, escalas e atribuições duplicados (rodar antes de aplicar as restrições de unicidade)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Só mostra o que seria removido.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            removidos = mesclar_duplicados()
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        prefixo = "Seriam removidos" if options['dry_run'] else "Removidos"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixo}: {removidos['turnos']} turno(s), {removidos['escalas']} escala(s), "
+            f"{removidos['atribuicoes']} atribuição(ões) duplicados."
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def preencher_cargas_horarias(apps, schema_editor):
+    AtribuicaoEscala = apps.get_model('core', 'AtribuicaoEscala')
+    CargaHorariaMensal = apps.get_model('core', 'CargaHorariaMensal')
+    linhas = (
+        AtribuicaoEscala.objects.values('escala_id', 'funcionario_id')
+        .annotate(total=Sum('tipo_turno__horas'))
+        .order_by()
+    )
+    CargaHorariaMensal.objects.bulk_create(
+        (CargaHorariaMensal(escala_id=l['escala_id'], funcionario_id=l['funcionario_id'], horas=l['total'] or 0)
+         for l in linhas),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_turno_alter_atribuicaoescala_tipo_turno_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargaHorariaMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horas', models.FloatField(default=0)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('escala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargas_horarias', to='core.escala')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.funcionario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('escala', 'funcionario'), name='carga_horaria_escala_funcionario_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_cargas_horarias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def mesclar(apps, schema_editor):
+    from core.duplicados import mesclar_duplicados
+    mesclar_duplicados(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_cargahorariamensal'),
+    ]
+
+    operations = [
+        # Precisa rodar numa migração separada das restrições de unicidade
+        # (no Postgres as FKs são verificadas só no fim da transação).
+        migrations.RunPython(mesclar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_mesclar_duplicados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atribuicaoescala',
+            index=models.Index(fields=['escala', 'dia', 'tipo_turno'], name='atrib_escala_dia_turno_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='funcionario',
+            index=models.Index(fields=['unidade', 'cargo', 'nome_completo'], name='func_unidade_cargo_nome_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='atribuicaoescala',
+            constraint=models.UniqueConstraint(fields=('escala', 'funcionario', 'dia', 'tipo_turno'), name='atribuicao_escala_func_dia_turno_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='escala',
+            constraint=models.UniqueConstraint(fields=('unidade', 'mes', 'ano'), name='escala_unidade_mes_ano_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='turno',
+            constraint=models.UniqueConstraint(fields=('sigla',), name='turno_sigla_uniq'),
+        ),
+    ]
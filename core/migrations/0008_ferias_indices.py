@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def criar_gist(apps, schema_editor):
+    # Consultas de sobreposição de períodos (escalas.disponibilidade) usam este índice no Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS ferias_periodo_gist ON core_ferias "
+        "USING gist (daterange(data_inicio, data_fim, '[]'))"
+    )
+
+
+def remover_gist(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS ferias_periodo_gist")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ferias',
+            index=models.Index(fields=['funcionario', 'data_inicio', 'data_fim'], name='ferias_func_periodo_idx'),
+        ),
+        migrations.RunPython(criar_gist, remover_gist),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_ferias_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoEscala',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField()),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('autor', models.CharField(blank=True, max_length=150)),
+                ('origem', models.CharField(blank=True, max_length=30)),
+                ('adicionadas', models.JSONField(blank=True, default=list)),
+                ('removidas', models.JSONField(blank=True, default=list)),
+                ('grade', models.JSONField(blank=True, null=True)),
+                ('escala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versoes', to='core.escala')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['escala', 'criada_em'], name='versao_escala_criada_idx')],
+                'constraints': [models.UniqueConstraint(fields=('escala', 'numero'), name='versao_escala_numero_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_versaocache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='funcionario',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_funcionario_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unidade',
+            name='cobertura_minima',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_atualizada_em(apps, schema_editor):
+    # tarefas já reservadas: o último sinal conhecido é o início
+    Tarefa = apps.get_model('core', 'Tarefa')
+    Tarefa.objects.filter(atualizada_em__isnull=True).update(atualizada_em=F('iniciada_em'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_unidade_cobertura_minima'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefa',
+            name='atualizada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher_atualizada_em, migrations.RunPython.noop),
+    ]
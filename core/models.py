@@ -5,6 +5,8 @@ import datetime
 class Unidade(models.Model):
     nome = models.CharField(max_length=200)  # ex.: UNIDADE DE OBSTETRÍCIA - CCOG
     portaria = models.CharField(max_length=50, blank=True)  # ex.: 1192/2023
+    # mínimo de profissionais por período, ex.: {"noturno": 3}; o que faltar vem do padrão
+    cobertura_minima = models.JSONField(default=dict, blank=True)
 
 class Turno(models.Model):
     sigla = models.CharField(max_length=10)  # ex.: M6, N2, FO
@@ -14,6 +16,11 @@ class Turno(models.Model):
     horas = models.FloatField()  # ex.: 6.0
     periodo = models.CharField(max_length=20)  # matutino, vespertino, noturno, folga
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sigla'], name='turno_sigla_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.sigla} - Horas {self.horas}"
 
@@ -28,6 +35,13 @@ class Funcionario(models.Model):
     unidade = models.ForeignKey(Unidade, on_delete=models.CASCADE)
     grupo = models.CharField(max_length=50, blank=True)  # ex.: TÉCNICOS EM ENFERMAGEM
     preferencias_turno = models.CharField(max_length=100, blank=True)  # ex.: M6, T6
+    atualizado_em = models.DateTimeField(auto_now=True)  # Last-Modified/ETag da equipe (escalas.equipe)
+
+    class Meta:
+        indexes = [
+            # listagem da grade: filtra por unidade/cargo e ordena por nome
+            models.Index(fields=['unidade', 'cargo', 'nome_completo'], name='func_unidade_cargo_nome_idx'),
+        ]
 
 class Feriado(models.Model):
     data = models.DateField()
@@ -38,6 +52,22 @@ class Ferias(models.Model):
     data_inicio = models.DateField()
     data_fim = models.DateField()
 
+    class Meta:
+        indexes = [
+            # férias que cruzam um mês: funcionario IN (...) AND data_inicio <= fim AND data_fim >= inicio
+            # (no Postgres a migração 0008 cria também um GiST sobre daterange(data_inicio, data_fim))
+            models.Index(fields=['funcionario', 'data_inicio', 'data_fim'], name='ferias_func_periodo_idx'),
+        ]
+
+class VersaoCache(models.Model):
+    # Versões que invalidam os caches das escalas (ver escalas.cache). Ficam no banco para que
+    # todos os processos (web, trabalhador da fila, comandos, pool do lote) vejam a mesma.
+    chave = models.CharField(max_length=100, unique=True)  # ex.: escala:12, unidade:3, global:, feriados:
+    numero = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.chave} = {self.numero}"
+
 class Escala(models.Model):
     mes = models.IntegerField()
     ano = models.IntegerField()
@@ -45,6 +75,11 @@ class Escala(models.Model):
     gerada_em = models.DateTimeField(auto_now_add=True)
     observacoes = models.TextField(blank=True)  # ex.: Férias de X de Y a Z
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['unidade', 'mes', 'ano'], name='escala_unidade_mes_ano_uniq'),
+        ]
+
 class AtribuicaoEscala(models.Model):
     escala = models.ForeignKey('Escala', on_delete=models.CASCADE)
     funcionario = models.ForeignKey('core.Funcionario', on_delete=models.CASCADE)
@@ -53,5 +88,90 @@ class AtribuicaoEscala(models.Model):
     # Campo para carga horária mensal (calculado)
     ch_mensal = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['escala', 'funcionario', 'dia', 'tipo_turno'], name='atribuicao_escala_func_dia_turno_uniq'
+            ),
+        ]
+        indexes = [
+            # totais e cobertura: escala + dia, contando por turno
+            models.Index(fields=['escala', 'dia', 'tipo_turno'], name='atrib_escala_dia_turno_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.funcionario.nome_completo} - Dia {self.dia} - {self.tipo_turno.sigla}"
+
+class VersaoEscala(models.Model):
+    # Histórico da escala: cada gravação guarda só o que mudou; a cada poucas versões, a grade inteira
+    # (células como listas planas [funcionario_id, dia, turno_id, ...]; ver escalas.versoes)
+    escala = models.ForeignKey(Escala, on_delete=models.CASCADE, related_name='versoes')
+    numero = models.PositiveIntegerField()
+    criada_em = models.DateTimeField(auto_now_add=True)
+    autor = models.CharField(max_length=150, blank=True)
+    origem = models.CharField(max_length=30, blank=True)  # ex.: edicao, gerador, copia
+    adicionadas = models.JSONField(default=list, blank=True)
+    removidas = models.JSONField(default=list, blank=True)
+    grade = models.JSONField(null=True, blank=True)  # grade completa nesta versão (só nas versões-base)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['escala', 'numero'], name='versao_escala_numero_uniq'),
+        ]
+        indexes = [
+            # "como estava no dia X": última versão da escala até uma data
+            models.Index(fields=['escala', 'criada_em'], name='versao_escala_criada_idx'),
+        ]
+
+    def __str__(self):
+        return f"Escala {self.escala_id} - versão {self.numero}"
+
+class CargaHorariaMensal(models.Model):
+    # Resumo da carga horária de cada funcionário na escala, mantido a cada gravação
+    escala = models.ForeignKey(Escala, on_delete=models.CASCADE, related_name='cargas_horarias')
+    funcionario = models.ForeignKey(Funcionario, on_delete=models.CASCADE)
+    horas = models.FloatField(default=0)
+    atualizada_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['escala', 'funcionario'], name='carga_horaria_escala_funcionario_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.funcionario_id} - Escala {self.escala_id} - {self.horas}h"
+
+
+class Tarefa(models.Model):
+    # Fila de trabalhos pesados executados fora da requisição (manage.py processar_tarefas)
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=50)  # ex.: gerar_escala, recalcular_ch
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    progresso = models.PositiveSmallIntegerField(default=0)  # 0 a 100
+    mensagem = models.CharField(max_length=200, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    trabalhador = models.CharField(max_length=100, blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    atualizada_em = models.DateTimeField(null=True, blank=True)  # último sinal do trabalhador (progresso)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'criada_em'], name='tarefa_status_criada_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.funcionario.nome_completo} - Dia {self.dia} - {self.tipo_turno.codigo}"
\ No newline at end of file
+        return f"{self.tipo} #{self.id} ({self.status})"
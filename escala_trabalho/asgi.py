@@ -13,4 +13,5 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'escala_trabalho.settings')
 
+# Os eventos ao vivo das escalas (escalas.views.eventos_escala) só funcionam servidos por aqui
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'escalas.desempenho.DesempenhoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,8 +59,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': ['templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compiladas uma vez por processo; o runserver recarrega as editadas
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -89,6 +97,65 @@ DATABASES = {
         },
 }
 
+# ESCALAS_BANCO=sqlite usa o arquivo local (desenvolvimento, benchmarks sem Postgres)
+if os.environ.get('ESCALAS_BANCO') == 'sqlite':
+    DATABASES['default'] = DATABASES['default1']
+
+# Cache
+# Sem ESCALAS_CACHE_URL usa memória local; aceita redis://... ou file:///caminho.
+# O cache só guarda conteúdo: as versões que o invalidam ficam no banco (core.VersaoCache),
+# então gravações do trabalhador da fila ou de comandos valem também para a memória local.
+
+ESCALAS_CACHE_URL = os.environ.get('ESCALAS_CACHE_URL', '')
+
+if ESCALAS_CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': ESCALAS_CACHE_URL,
+        }
+    }
+elif ESCALAS_CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': ESCALAS_CACHE_URL[len('file://'):],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'escalas',
+        }
+    }
+
+# Tempo máximo (s) de uma grade de escala em cache; alterações invalidam antes disso
+ESCALAS_CACHE_TIMEOUT = 60 * 60
+
+# O formulário da escala manda um campo por funcionário e dia (70 funcionários x 31 dias > 2.000)
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 20000
+
+# Histórico das escalas (escalas.versoes): a grade inteira é guardada a cada N versões, o resto é diff
+ESCALAS_VERSOES_POR_BASE = 20
+
+# Pub/sub dos eventos ao vivo das escalas (escalas.eventos); o local só alcança o próprio processo
+ESCALAS_EVENTOS_BARRAMENTO = 'escalas.eventos.BarramentoLocal'
+
+# Arquivos gerados (PDFs das escalas, planilhas da fila). Os PDFs são nomeados pelo hash da escala
+# e das versões guardadas no banco (escalas.pdf.chave_pdf); limpar_artefatos apaga os antigos
+ESCALAS_ARTEFATOS_DIR = os.environ.get('ESCALAS_ARTEFATOS_DIR', BASE_DIR / 'artefatos')
+
+# Medição de desempenho por requisição (escalas.desempenho): fração das requisições
+# amostradas, de 0 (desligado, o middleware nem é carregado) a 1
+ESCALAS_DESEMPENHO_AMOSTRAGEM = float(os.environ.get('ESCALAS_DESEMPENHO_AMOSTRAGEM', '0'))
+# Amostras guardadas em memória e consultas lentas guardadas por amostra
+ESCALAS_DESEMPENHO_CAPACIDADE = 2000
+ESCALAS_DESEMPENHO_CONSULTAS_LENTAS = 5
+# As amostras vão para este arquivo (JSON por linha) a cada ESCALAS_DESEMPENHO_INTERVALO_GRAVACAO s
+ESCALAS_DESEMPENHO_ARQUIVO = os.environ.get('ESCALAS_DESEMPENHO_ARQUIVO', BASE_DIR / 'desempenho.jsonl')
+ESCALAS_DESEMPENHO_INTERVALO_GRAVACAO = 60
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
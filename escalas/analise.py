@@ -0,0 +1,229 @@
+from datetime import date, timedelta
+
+from core.models import Funcionario, Turno, Unidade
+
+from .calendario import feriados_entre
+from .exportacao import atribuicoes_do_periodo
+from .parametros import COBERTURA_MINIMA_PADRAO, TOLERANCIA_HORAS
+from .totais import PERIODOS
+
+try:
+    import numpy as np
+except ImportError:  # análises são opcionais
+    np = None
+
+TAMANHO_LOTE = 20000
+
+# Quantas lacunas de cobertura vão na resposta (as demais entram só nas contagens)
+MAX_LACUNAS = 500
+
+NOTURNO = PERIODOS.index("noturno")
+_EPOCA = date(1970, 1, 1)
+
+
+def analise_disponivel():
+    return np is not None
+
+
+def _dia(d):
+    return (d - _EPOCA).days
+
+
+def carregar(inicio, fim, unidade_ids=None):
+    """
+    Atribuições entre `inicio` e `fim` como colunas NumPy:
+    {"unidade", "funcionario", "dia" (dias desde 1970-01-01), "periodo" (-1 = folga), "horas"}.
+    Uma consulta; as linhas chegam em lotes pelo cursor e viram arrays lote a lote.
+    """
+    atribuicoes = atribuicoes_do_periodo(inicio, fim)
+    if unidade_ids:
+        atribuicoes = atribuicoes.filter(escala__unidade_id__in=unidade_ids)
+    consulta = atribuicoes.order_by().values_list(
+        "escala__unidade_id", "funcionario_id", "escala__ano", "escala__mes", "dia", "tipo_turno_id"
+    )
+
+    lotes = []
+    lote = []
+    for linha in consulta.iterator(chunk_size=TAMANHO_LOTE):
+        lote.append(linha)
+        if len(lote) == TAMANHO_LOTE:
+            lotes.append(np.array(lote, dtype=np.int64))
+            lote = []
+    if lote:
+        lotes.append(np.array(lote, dtype=np.int64))
+    dados = np.concatenate(lotes) if lotes else np.empty((0, 6), dtype=np.int64)
+
+    # turno -> período e horas por consulta na tabela lateral (Turno é pequena)
+    turnos = list(Turno.objects.values_list("id", "periodo", "horas"))
+    tamanho = max([t[0] for t in turnos], default=0) + 1
+    periodo_turno = np.full(tamanho, -1, dtype=np.int8)
+    horas_turno = np.zeros(tamanho, dtype=np.float32)
+    for turno_id, periodo, horas in turnos:
+        periodo = (periodo or "").strip().lower()
+        periodo_turno[turno_id] = PERIODOS.index(periodo) if periodo in PERIODOS else -1
+        horas_turno[turno_id] = horas or 0
+
+    # datetime64 por mês + dia - 1 dá a data sem passar por objetos date
+    meses = (dados[:, 2] - 1970) * 12 + (dados[:, 3] - 1)
+    dias = meses.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + dados[:, 4] - 1
+    return {
+        "unidade": dados[:, 0],
+        "funcionario": dados[:, 1],
+        "dia": dias,
+        "periodo": periodo_turno[dados[:, 5]],
+        "horas": horas_turno[dados[:, 5]],
+    }
+
+
+def _chave_mes(dias):
+    return dias.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def lacunas_cobertura(colunas, inicio, fim, cobertura_minima=None):
+    """
+    Dias/períodos abaixo do mínimo em cada unidade. Só entram os meses em que a
+    unidade tem escala (alguma atribuição), para não acusar meses ainda não montados.
+    """
+    minimos = dict(COBERTURA_MINIMA_PADRAO, **(cobertura_minima or {}))
+    minimo = np.array([minimos[p] for p in PERIODOS])
+    primeiro, num_dias = _dia(inicio), (fim - inicio).days + 1
+
+    unidades, unidade_idx = np.unique(colunas["unidade"], return_inverse=True)
+    trabalho = colunas["periodo"] >= 0
+    # contagem [unidade, dia, período] num único bincount
+    plano = (unidade_idx[trabalho] * num_dias + colunas["dia"][trabalho] - primeiro) * len(PERIODOS)
+    plano += colunas["periodo"][trabalho]
+    contagem = np.bincount(plano, minlength=len(unidades) * num_dias * len(PERIODOS))
+    contagem = contagem.reshape(len(unidades), num_dias, len(PERIODOS))
+
+    # meses com escala em cada unidade
+    dias_range = np.arange(primeiro, primeiro + num_dias)
+    mes_do_dia = _chave_mes(dias_range)
+    com_escala = np.zeros((len(unidades), num_dias), dtype=bool)
+    if len(unidades):
+        meses_unidade = np.unique(unidade_idx * 100000 + _chave_mes(colunas["dia"]))
+        u_idx, mes = np.divmod(meses_unidade, 100000)
+        for u, m in zip(u_idx, mes):
+            com_escala[u] |= mes_do_dia == m
+
+    falta = np.maximum(minimo[None, None, :] - contagem, 0) * com_escala[:, :, None]
+    u_idx, d_idx, p_idx = np.nonzero(falta)
+    ordem = np.lexsort((p_idx, d_idx, u_idx))[:MAX_LACUNAS]
+    lacunas = [
+        {
+            "unidade_id": int(unidades[u_idx[k]]),
+            "data": (inicio + timedelta(days=int(d_idx[k]))).isoformat(),
+            "periodo": PERIODOS[p_idx[k]],
+            "escalados": int(contagem[u_idx[k], d_idx[k], p_idx[k]]),
+            "minimo": int(minimo[p_idx[k]]),
+        }
+        for k in ordem
+    ]
+    por_unidade = {
+        int(unidades[u]): {
+            "dias_descobertos": int(np.count_nonzero(falta[u].any(axis=1))),
+            "profissionais_faltando": int(falta[u].sum()),
+        }
+        for u in range(len(unidades))
+    }
+    return {"lacunas": lacunas, "total_lacunas": int(len(u_idx)), "por_unidade": por_unidade}
+
+
+def horas_e_distribuicao(colunas, inicio, fim):
+    """
+    Por funcionário: horas trabalhadas x contrato (ch_semanal proporcional aos dias
+    dos meses com escala), meses acima da tolerância, plantões noturnos e turnos
+    em fim de semana e feriado.
+    """
+    funcionarios, func_idx = np.unique(colunas["funcionario"], return_inverse=True)
+    n = len(funcionarios)
+    trabalho = colunas["periodo"] >= 0
+    dias = colunas["dia"]
+
+    horas = np.bincount(func_idx, weights=colunas["horas"], minlength=n)
+    turnos = np.bincount(func_idx[trabalho], minlength=n)
+    noturnos = np.bincount(func_idx[colunas["periodo"] == NOTURNO], minlength=n)
+    # 1970-01-01 foi quinta-feira: (dia + 3) % 7 dá 0 = segunda ... 6 = domingo
+    fim_de_semana = trabalho & ((dias + 3) % 7 >= 5)
+    fins_de_semana = np.bincount(func_idx[fim_de_semana], minlength=n)
+    datas_feriado = np.array(
+        [_dia(d) for d in feriados_entre(inicio, fim)],
+        dtype=np.int64,
+    )
+    em_feriado = trabalho & np.isin(dias, datas_feriado)
+    feriados = np.bincount(func_idx[em_feriado], minlength=n)
+
+    # horas por funcionário e mês para comparar com o contrato de cada mês
+    meses = _chave_mes(dias)
+    mes_min = meses.min() if len(meses) else 0
+    num_meses = int(meses.max() - mes_min + 1) if len(meses) else 0
+    horas_mes = np.bincount(
+        func_idx * num_meses + (meses - mes_min), weights=colunas["horas"], minlength=n * num_meses
+    ).reshape(n, num_meses)
+    escalado_mes = np.bincount(func_idx * num_meses + (meses - mes_min), minlength=n * num_meses).reshape(n, num_meses) > 0
+    primeiros = np.arange(mes_min, mes_min + num_meses).astype("datetime64[M]")
+    dias_no_mes = ((primeiros + 1).astype("datetime64[D]") - primeiros.astype("datetime64[D]")).astype(np.int64)
+
+    dados = {
+        f["id"]: f for f in Funcionario.objects.filter(id__in=funcionarios.tolist()).values(
+            "id", "nome_completo", "cargo", "ch_semanal", "unidade_id"
+        )
+    }
+    ch_semanal = np.array([dados.get(int(f), {}).get("ch_semanal", 0) for f in funcionarios], dtype=np.float64)
+    contrato_mes = ch_semanal[:, None] * dias_no_mes[None, :] / 7 * escalado_mes
+    contrato = contrato_mes.sum(axis=1)
+    meses_acima = ((horas_mes - contrato_mes) > TOLERANCIA_HORAS).sum(axis=1)
+
+    resultado = []
+    for k, func_id in enumerate(funcionarios.tolist()):
+        func = dados.get(func_id, {})
+        resultado.append({
+            "id": func_id,
+            "nome": func.get("nome_completo", ""),
+            "cargo": func.get("cargo", ""),
+            "unidade_id": func.get("unidade_id"),
+            "horas": round(float(horas[k]), 1),
+            "contrato": round(float(contrato[k]), 1),
+            "saldo": round(float(horas[k] - contrato[k]), 1),
+            "meses_acima_do_contrato": int(meses_acima[k]),
+            "turnos": int(turnos[k]),
+            "noturnos": int(noturnos[k]),
+            "fins_de_semana": int(fins_de_semana[k]),
+            "feriados": int(feriados[k]),
+        })
+    resultado.sort(key=lambda f: -f["saldo"])
+    return resultado
+
+
+def analisar(inicio, fim, unidade_ids=None, cobertura_minima=None):
+    """
+    Relatório do período, pronto para JSON:
+    {"inicio", "fim", "atribuicoes", "unidades": [...], "lacunas": [...], "funcionarios": [...]}.
+    """
+    if np is None:
+        raise RuntimeError("Análises requerem o pacote numpy.")
+    colunas = carregar(inicio, fim, unidade_ids)
+    cobertura = lacunas_cobertura(colunas, inicio, fim, cobertura_minima)
+    funcionarios = horas_e_distribuicao(colunas, inicio, fim)
+
+    nomes = dict(Unidade.objects.filter(id__in=list(cobertura["por_unidade"])).values_list("id", "nome"))
+    unidades = []
+    for unidade_id, totais in cobertura["por_unidade"].items():
+        da_unidade = [f for f in funcionarios if f["unidade_id"] == unidade_id]
+        unidades.append({
+            "id": unidade_id,
+            "nome": nomes.get(unidade_id, ""),
+            **totais,
+            "funcionarios": len(da_unidade),
+            "horas_acima_do_contrato": round(sum(max(f["saldo"], 0) for f in da_unidade), 1),
+        })
+    unidades.sort(key=lambda u: (-u["profissionais_faltando"], u["nome"]))
+    return {
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "atribuicoes": int(len(colunas["dia"])),
+        "unidades": unidades,
+        "lacunas": cobertura["lacunas"],
+        "total_lacunas": cobertura["total_lacunas"],
+        "funcionarios": funcionarios,
+    }
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .cache import cache_escalas
+
+# Quanto tempo uma requisição espera outra terminar de gerar o mesmo arquivo
+ESPERA_GERACAO = 30
+INTERVALO_ESPERA = 0.2
+
+
+def _diretorio():
+    return Path(getattr(settings, "ESCALAS_ARTEFATOS_DIR", Path(settings.BASE_DIR) / "artefatos"))
+
+
+def chave_artefato(*partes):
+    """
+    Hash (sha256) das partes que determinam o conteúdo do arquivo.
+    Uso: chave_artefato("pdf", escala.id, versao_escala(escala))
+    """
+    return hashlib.sha256(":".join(str(p) for p in partes).encode()).hexdigest()
+
+
+def caminho_artefato(chave, extensao):
+    return _diretorio() / chave[:2] / f"{chave}.{extensao}"
+
+
+def _gravar(caminho, escrever):
+    # escreve num temporário do mesmo diretório e renomeia: quem lê nunca vê arquivo pela metade
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=caminho.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as arquivo:
+            escrever(arquivo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+
+def gravar_artefato(chave, extensao, escrever):
+    """
+    Grava o arquivo da chave chamando `escrever(arquivo)` com o arquivo binário aberto,
+    sem montar o conteúdo em memória (ex.: planilhas grandes da fila). Retorna o caminho.
+    """
+    caminho = caminho_artefato(chave, extensao)
+    _gravar(caminho, escrever)
+    return caminho
+
+
+def obter_artefato(chave, extensao, gerar):
+    """
+    Devolve o caminho do arquivo da chave, gerando-o com `gerar()` (que devolve bytes)
+    só se ainda não existir. Várias requisições pedindo o mesmo arquivo ao mesmo
+    tempo geram uma vez só: a primeira pega a trava e as outras esperam o arquivo.
+    """
+    caminho = caminho_artefato(chave, extensao)
+    if caminho.exists():
+        return caminho
+
+    trava = f"escalas:artefato:{chave}"
+    cache = cache_escalas()
+    if not cache.add(trava, 1, ESPERA_GERACAO):
+        limite = time.monotonic() + ESPERA_GERACAO
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            if caminho.exists():
+                return caminho
+        # quem tinha a trava demorou demais ou falhou: gera aqui mesmo
+    try:
+        if not caminho.exists():
+            _gravar(caminho, lambda arquivo: arquivo.write(gerar()))
+    finally:
+        cache.delete(trava)
+    return caminho
+
+
+def limpar_artefatos(dias):
+    """
+    Apaga arquivos não lidos há mais de `dias` (versões antigas deixam de ser pedidas).
+    Retorna quantos foram removidos.
+    """
+    limite = time.time() - dias * 86400
+    removidos = 0
+    for caminho in _diretorio().glob("*/*.*"):
+        try:
+            if max(caminho.stat().st_atime, caminho.stat().st_mtime) < limite:
+                caminho.unlink()
+                removidos += 1
+        except FileNotFoundError:
+            pass
+    return removidos
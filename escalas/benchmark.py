@@ -0,0 +1,204 @@
+import io
+import json
+import statistics
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core.models import AtribuicaoEscala, Escala, Funcionario, Turno
+
+from .analise import analise_disponivel
+from .pdf import pdf_disponivel
+
+# nome -> opções de gerar_funcionarios (o ano é fixo para os resultados serem comparáveis)
+TAMANHOS = {
+    "pequeno": {"unidades": 2, "funcionarios": 40, "anos": 1},
+    "medio": {"unidades": 5, "funcionarios": 300, "anos": 1},
+    "grande": {"unidades": 20, "funcionarios": 1400, "anos": 1},
+}
+ANO, MES = 2024, 3
+
+# Regressão só conta se também passar desta diferença absoluta (ruído de medição)
+MIN_DIFERENCA_MS = 5.0
+
+
+def _preparar_dados(tamanho, banco_de_teste, semente=42):
+    """
+    Limpa o banco e gera o conjunto de dados do tamanho pedido. Retorna o alvo das
+    medições (a maior unidade, no mês MES/ANO) e o volume gerado. Recusa-se a rodar
+    fora do banco de teste criado por executar: o flush apaga tudo.
+    """
+    if connection.settings_dict["NAME"] != banco_de_teste:
+        raise RuntimeError(f"O benchmark só limpa o banco de teste, não {connection.settings_dict['NAME']!r}.")
+    call_command("flush", interactive=False, verbosity=0)
+    call_command("gerar_funcionarios", ano_inicial=ANO, semente=semente, stdout=io.StringIO(), **TAMANHOS[tamanho])
+    unidade_id = (
+        Funcionario.objects.values("unidade_id").annotate(qtd=Count("id")).order_by("-qtd").first()["unidade_id"]
+    )
+    escala = Escala.objects.get(unidade_id=unidade_id, mes=MES, ano=ANO)
+    return {
+        "unidade_id": unidade_id,
+        "escala_id": escala.id,
+        "funcionarios_na_unidade": Funcionario.objects.filter(unidade_id=unidade_id).count(),
+        "atribuicoes_no_mes": AtribuicaoEscala.objects.filter(escala=escala).count(),
+        "atribuicoes_total": AtribuicaoEscala.objects.count(),
+    }
+
+
+def _grade_alternada(alvo, rodada):
+    """
+    Dados do POST de cadastrar_escala com todas as células; a cada rodada os turnos
+    trocam de lugar, então toda repetição grava de verdade.
+    """
+    turnos = list(Turno.objects.filter(sigla__in=["M6", "T6", "N12", "FO"]).values_list("id", flat=True))
+    dados = {"unidade": alvo["unidade_id"], "mes": MES, "ano": ANO}
+    funcionarios = Funcionario.objects.filter(unidade_id=alvo["unidade_id"]).values_list("id", flat=True)
+    for n, func_id in enumerate(funcionarios):
+        for dia in range(1, 32):
+            dados[f"turno_{func_id}_{dia}"] = str(turnos[(n + dia + rodada) % len(turnos)])
+    return dados
+
+
+def _alteracoes_celulas(alvo, rodada, quantidade=50):
+    turnos = list(Turno.objects.filter(sigla__in=["M6", "T6"]).values_list("sigla", flat=True))
+    funcionarios = list(Funcionario.objects.filter(unidade_id=alvo["unidade_id"]).values_list("id", flat=True)[:10])
+    alteracoes = [
+        {"funcionario": func_id, "dia": dia, "turno": turnos[(dia + rodada) % len(turnos)]}
+        for func_id in funcionarios for dia in range(1, quantidade // max(len(funcionarios), 1) + 1)
+    ]
+    return json.dumps({"alteracoes": alteracoes[:quantidade]})
+
+
+def casos(alvo):
+    """
+    (nome, método, url, dados ou função(rodada) -> dados, content_type) de cada tela/API medida.
+    """
+    u, e = alvo["unidade_id"], alvo["escala_id"]
+    filtro = {"mes": MES, "ano": ANO, "unidade": u}
+    lista = [
+        ("ver_escalas", "post", reverse("ver_escalas"), filtro, None),
+        ("cobertura", "post", reverse("cobertura"), filtro, None),
+        ("escala_detalhe", "get", reverse("escala_detalhe", args=[u, MES, ANO]), {}, None),
+        ("cadastrar_escala", "get", reverse("cadastrar_escala"), filtro, None),
+        ("cadastrar_escala_post", "post", f"{reverse('cadastrar_escala')}?unidade={u}&mes={MES}&ano={ANO}",
+         lambda rodada: _grade_alternada(alvo, rodada), None),
+        ("api_funcionarios", "get", reverse("api_funcionarios"), {"unidade": u}, None),
+        ("api_salvar_celulas", "post", reverse("api_salvar_celulas", args=[u, MES, ANO]),
+         lambda rodada: _alteracoes_celulas(alvo, rodada), "application/json"),
+        ("exportar_escala_csv", "get", reverse("exportar_escala", args=[e, "csv"]), {}, None),
+        ("exportar_mes_csv", "get", reverse("exportar_mes", args=[MES, ANO, "csv"]), {}, None),
+    ]
+    if pdf_disponivel():
+        lista.append(("escala_pdf", "get", reverse("escala_pdf", args=[e]), {}, None))
+    if analise_disponivel():
+        lista.append(("api_analise", "get", reverse("api_analise"), {"inicio": f"{ANO}-01-01", "fim": f"{ANO}-03-31"}, None))
+    return lista
+
+
+def _requisitar(client, metodo, url, dados, content_type):
+    if content_type:
+        resposta = getattr(client, metodo)(url, dados, content_type=content_type)
+    else:
+        resposta = getattr(client, metodo)(url, dados)
+    if getattr(resposta, "streaming", False):
+        for _ in resposta.streaming_content:
+            pass
+    return resposta
+
+
+def medir(client, caso, repeticoes):
+    """
+    Tempo de ponta a ponta (ms) com o cache vazio em cada repetição e consultas ao banco.
+    """
+    nome, metodo, url, dados, content_type = caso
+    tempos = []
+    consultas = []
+    status = None
+    for rodada in range(repeticoes):
+        cache.clear()
+        corpo = dados(rodada) if callable(dados) else dados
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            resposta = _requisitar(client, metodo, url, corpo, content_type)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(len(capturadas))
+        status = resposta.status_code
+    tempos.sort()
+    return {
+        "status": status,
+        "mediana_ms": round(statistics.median(tempos), 2),
+        "min_ms": round(tempos[0], 2),
+        "max_ms": round(tempos[-1], 2),
+        "consultas": max(consultas),
+    }
+
+
+def executar(tamanhos, repeticoes=5, ao_medir=None):
+    """
+    Gera cada conjunto de dados e mede todos os casos. `ao_medir(tamanho, nome, resultado)`
+    é chamado a cada caso. Retorna o dicionário que vai para o JSON.
+    Tudo roda num banco de teste descartável, criado e destruído aqui: os dados
+    gerados (e o flush entre os tamanhos) nunca tocam o banco configurado.
+    """
+    resultados = {
+        "banco": connection.vendor,
+        "data": date.today().isoformat(),
+        "repeticoes": repeticoes,
+        "tamanhos": {},
+    }
+    setup_test_environment()
+    nome_original = connection.settings_dict["NAME"]
+    banco_de_teste = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        for tamanho in tamanhos:
+            alvo = _preparar_dados(tamanho, banco_de_teste)
+            client = Client()
+            medidos = {}
+            for caso in casos(alvo):
+                # uma requisição de aquecimento (imports, templates compilados)
+                _requisitar(client, caso[1], caso[2], caso[3](0) if callable(caso[3]) else caso[3], caso[4])
+                medidos[caso[0]] = medir(client, caso, repeticoes)
+                if ao_medir:
+                    ao_medir(tamanho, caso[0], medidos[caso[0]])
+            resultados["tamanhos"][tamanho] = {"dados": alvo, "casos": medidos}
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        teardown_test_environment()
+    return resultados
+
+
+def comparar(resultados, base, limite):
+    """
+    Casos mais lentos que a base em mais de `limite` (0.2 = 20%) ou com mais consultas.
+    Retorna [{"tamanho", "caso", "motivo"}, ...].
+    """
+    regressoes = []
+    for tamanho, medidos in resultados["tamanhos"].items():
+        anteriores = base.get("tamanhos", {}).get(tamanho, {}).get("casos", {})
+        for nome, atual in medidos["casos"].items():
+            anterior = anteriores.get(nome)
+            if not anterior:
+                continue
+            if atual["status"] >= 400 and anterior["status"] < 400:
+                regressoes.append({
+                    "tamanho": tamanho, "caso": nome, "motivo": f"HTTP {anterior['status']} -> {atual['status']}",
+                })
+            diferenca = atual["mediana_ms"] - anterior["mediana_ms"]
+            if diferenca > MIN_DIFERENCA_MS and atual["mediana_ms"] > anterior["mediana_ms"] * (1 + limite):
+                regressoes.append({
+                    "tamanho": tamanho, "caso": nome,
+                    "motivo": f"{anterior['mediana_ms']:.1f}ms -> {atual['mediana_ms']:.1f}ms",
+                })
+            if atual["consultas"] > anterior["consultas"]:
+                regressoes.append({
+                    "tamanho": tamanho, "caso": nome,
+                    "motivo": f"{anterior['consultas']} -> {atual['consultas']} consultas",
+                })
+    return regressoes
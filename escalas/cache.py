@@ -0,0 +1,116 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from core.models import VersaoCache
+
+# Tempo de vida das grades em cache; a validade real vem das versões
+TEMPO_CACHE = getattr(settings, "ESCALAS_CACHE_TIMEOUT", 60 * 60)
+
+_pendentes = threading.local()
+
+
+def cache_escalas():
+    """
+    Cache onde as escalas guardam conteúdo (grades, equipes, travas); não guarda versões.
+    """
+    return caches[getattr(settings, "ESCALAS_CACHE_ALIAS", "default")]
+
+
+def _chave_versao(escopo, ident=""):
+    return f"{escopo}:{ident}"
+
+
+def _versoes(chaves):
+    """
+    Lê várias versões numa consulta. Elas ficam no banco, não no cache: uma gravação
+    feita por outro processo (trabalhador da fila, comando, pool do lote) muda a versão
+    que este processo lê, mesmo com cache em memória local. Versão nunca alterada vale 0.
+    """
+    versoes = dict(VersaoCache.objects.filter(chave__in=chaves).values_list("chave", "numero"))
+    return {chave: versoes.get(chave, 0) for chave in chaves}
+
+
+def _incrementar(chaves):
+    # cria as que faltam e soma 1 em todas num UPDATE só (F() evita perder incrementos concorrentes)
+    chaves = sorted(chaves)
+    with transaction.atomic():
+        existentes = set(VersaoCache.objects.filter(chave__in=chaves).values_list("chave", flat=True))
+        novas = [VersaoCache(chave=chave) for chave in chaves if chave not in existentes]
+        if novas:
+            VersaoCache.objects.bulk_create(novas, ignore_conflicts=True)
+        VersaoCache.objects.filter(chave__in=chaves).update(numero=F("numero") + 1)
+
+
+def _agendar(chave):
+    """
+    Invalida ao fim da transação. As chaves ficam num conjunto, então muitas
+    linhas alteradas de uma vez (ex.: cascata de deletes) geram um único
+    incremento por chave; os callbacks seguintes encontram o conjunto vazio.
+    """
+    pendentes = getattr(_pendentes, "chaves", None)
+    if pendentes is None:
+        pendentes = _pendentes.chaves = set()
+    pendentes.add(chave)
+    transaction.on_commit(_aplicar_pendentes)
+
+
+def _aplicar_pendentes():
+    chaves = getattr(_pendentes, "chaves", set())
+    _pendentes.chaves = set()
+    if chaves:
+        _incrementar(chaves)
+
+
+def invalidar_escala(escala_id):
+    _agendar(_chave_versao("escala", escala_id))
+
+
+def invalidar_unidade(unidade_id):
+    _agendar(_chave_versao("unidade", unidade_id))
+
+
+def invalidar_tudo():
+    _agendar(_chave_versao("global"))
+
+
+def invalidar_feriados():
+    _agendar(_chave_versao("feriados"))
+
+
+def versao_feriados():
+    """
+    Versão dos feriados (muda a cada save/delete de Feriado); chave dos meses em calendario.
+    """
+    chave = _chave_versao("feriados")
+    return _versoes([chave])[chave]
+
+
+def versao_escala(escala):
+    """
+    Versão combinada da escala, da unidade (funcionários) e global (turnos).
+    """
+    chaves = [
+        _chave_versao("escala", escala.id),
+        _chave_versao("unidade", escala.unidade_id),
+        _chave_versao("global"),
+    ]
+    versoes = _versoes(chaves)
+    return ".".join(str(versoes[chave]) for chave in chaves)
+
+
+def em_cache(tipo, escala, montar):
+    """
+    Devolve os dados montados para a escala, guardados em cache até a próxima alteração.
+    Uso: em_cache("grade", escala, lambda: montar_grade(escala))
+    """
+    chave = f"escalas:{tipo}:{escala.unidade_id}:{escala.mes}:{escala.ano}:{escala.id}:{versao_escala(escala)}"
+    cache = cache_escalas()
+    dados = cache.get(chave)
+    if dados is None:
+        dados = montar()
+        cache.set(chave, dados, TEMPO_CACHE)
+    return dados
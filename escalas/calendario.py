@@ -0,0 +1,101 @@
+import calendar
+from datetime import date
+from functools import lru_cache
+from typing import NamedTuple
+
+from core.models import Feriado
+
+from .cache import versao_feriados
+
+# Índice = date.weekday() (0 = segunda)
+SIGLAS_DIA_SEMANA = ("SEG", "TER", "QUA", "QUI", "SEX", "SAB", "DOM")
+
+# Meses guardados por processo (20 anos); a versão dos feriados faz parte da chave
+TAMANHO_CACHE = 240
+
+# As semanas das telas começam no domingo
+_CALENDARIO = calendar.Calendar(firstweekday=6)
+
+
+class DiaMes(NamedTuple):
+    data: date
+    numero: int
+    dia_semana: int  # date.weekday(): 0 = segunda ... 6 = domingo
+    sigla: str
+    fim_de_semana: bool
+    feriado: bool
+
+
+class Mes(NamedTuple):
+    """
+    Estrutura do mês, igual para todas as escalas:
+    `dias` (DiaMes de 1 a num_dias), `semanas` (semanas completas de domingo a sábado,
+    com datas dos meses vizinhos nas pontas) e `feriados` (números dos dias).
+    """
+    ano: int
+    mes: int
+    num_dias: int
+    dias: tuple
+    semanas: tuple
+    feriados: frozenset
+
+    def dia(self, numero):
+        if not 1 <= numero <= self.num_dias:
+            raise IndexError(f"Dia {numero} fora de {self.mes}/{self.ano}")
+        return self.dias[numero - 1]
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def dias_no_mes(ano, mes):
+    return calendar.monthrange(ano, mes)[1]
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _montar_mes(ano, mes, versao):
+    num_dias = dias_no_mes(ano, mes)
+    feriados = frozenset(
+        d.day for d in Feriado.objects.filter(data__year=ano, data__month=mes).values_list("data", flat=True)
+    )
+    dias = []
+    for numero in range(1, num_dias + 1):
+        data = date(ano, mes, numero)
+        dia_semana = data.weekday()
+        dias.append(DiaMes(
+            data, numero, dia_semana, SIGLAS_DIA_SEMANA[dia_semana], dia_semana >= 5, numero in feriados,
+        ))
+    semanas = tuple(tuple(semana) for semana in _CALENDARIO.monthdatescalendar(ano, mes))
+    return Mes(ano, mes, num_dias, tuple(dias), semanas, feriados)
+
+
+def mes_calendario(ano, mes, versao=None):
+    """
+    Dias, dias da semana, fins de semana, feriados e semanas do mês. Montado uma vez
+    por processo e reaproveitado até um Feriado mudar (a versão dos feriados muda).
+    Uso:
+        mes = mes_calendario(2024, 3)
+        for dia in mes.dias: dia.numero, dia.sigla, dia.fim_de_semana, dia.feriado
+    Quem monta vários meses pode ler a versão uma vez e passá-la em `versao`.
+    """
+    if versao is None:
+        versao = versao_feriados()
+    return _montar_mes(int(ano), int(mes), versao)
+
+
+def feriados_entre(inicio, fim):
+    """
+    Datas de feriado de `inicio` a `fim` (inclusive), a partir dos meses memorizados.
+    """
+    datas = []
+    versao = versao_feriados()
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        for numero in sorted(mes_calendario(ano, mes, versao).feriados):
+            data = date(ano, mes, numero)
+            if inicio <= data <= fim:
+                datas.append(data)
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return datas
+
+
+def ultimo_dia(ano, mes):
+    return date(ano, mes, dias_no_mes(ano, mes))
@@ -0,0 +1,105 @@
+from django.db.models import Sum
+
+from core.models import AtribuicaoEscala, CargaHorariaMensal
+
+
+def _somar_horas(escala, funcionario_ids=None):
+    atribuicoes = AtribuicaoEscala.objects.filter(escala=escala)
+    if funcionario_ids is not None:
+        atribuicoes = atribuicoes.filter(funcionario_id__in=funcionario_ids)
+    linhas = atribuicoes.values("funcionario_id").annotate(total=Sum("tipo_turno__horas")).order_by()
+    return {linha["funcionario_id"]: linha["total"] or 0 for linha in linhas}
+
+
+def _gravar(escala, horas):
+    if horas:
+        CargaHorariaMensal.objects.bulk_create(
+            [CargaHorariaMensal(escala=escala, funcionario_id=func_id, horas=total) for func_id, total in horas.items()],
+            update_conflicts=True,
+            unique_fields=["escala", "funcionario"],
+            update_fields=["horas", "atualizada_em"],
+        )
+
+
+def atualizar_funcionarios(escala, funcionario_ids):
+    """
+    Atualiza o resumo de C.H. só dos funcionários cujas células mudaram.
+    Retorna {funcionario_id: horas}.
+    """
+    funcionario_ids = set(funcionario_ids)
+    if not funcionario_ids:
+        return {}
+    horas = _somar_horas(escala, funcionario_ids)
+    for func_id in funcionario_ids:
+        horas.setdefault(func_id, 0)
+    _gravar(escala, horas)
+    return horas
+
+
+def recalcular_escala(escala):
+    """
+    Refaz o resumo de C.H. da escala inteira: uma consulta agregada e uma gravação em lote.
+    Retorna {funcionario_id: horas}.
+    """
+    horas = _somar_horas(escala)
+    _gravar(escala, horas)
+    CargaHorariaMensal.objects.filter(escala=escala).exclude(funcionario_id__in=horas.keys()).delete()
+    return horas
+
+
+def recalcular_escalas(escala_ids):
+    """
+    recalcular_escala para várias escalas de uma vez (ex.: cópia do mês de todas as unidades):
+    uma consulta agregada, uma gravação em lote e um delete.
+    """
+    escala_ids = list(escala_ids)
+    if not escala_ids:
+        return
+    linhas = (
+        AtribuicaoEscala.objects.filter(escala_id__in=escala_ids)
+        .values("escala_id", "funcionario_id").annotate(total=Sum("tipo_turno__horas")).order_by()
+    )
+    cargas = [
+        CargaHorariaMensal(escala_id=linha["escala_id"], funcionario_id=linha["funcionario_id"], horas=linha["total"] or 0)
+        for linha in linhas
+    ]
+    if cargas:
+        CargaHorariaMensal.objects.bulk_create(
+            cargas,
+            update_conflicts=True,
+            unique_fields=["escala", "funcionario"],
+            update_fields=["horas", "atualizada_em"],
+        )
+    manter = {(c.escala_id, c.funcionario_id) for c in cargas}
+    sobras = [
+        carga_id
+        for carga_id, escala_id, func_id in CargaHorariaMensal.objects.filter(escala_id__in=escala_ids)
+        .values_list("id", "escala_id", "funcionario_id")
+        if (escala_id, func_id) not in manter
+    ]
+    if sobras:
+        CargaHorariaMensal.objects.filter(id__in=sobras).delete()
+
+
+def horas_mensais(escala, funcionario_ids=None):
+    """
+    Lê a C.H. mensal já calculada. Retorna {funcionario_id: horas}.
+    """
+    if escala is None:
+        return {}
+    cargas = CargaHorariaMensal.objects.filter(escala=escala)
+    if funcionario_ids is not None:
+        cargas = cargas.filter(funcionario_id__in=funcionario_ids)
+    horas = dict(cargas.values_list("funcionario_id", "horas"))
+    if funcionario_ids is not None:
+        for func_id in funcionario_ids:
+            horas.setdefault(func_id, 0)
+    return horas
+
+
+def meta_horas(ch_semanal, dias_disponiveis, feriados_uteis_disponiveis=0):
+    """
+    Horas esperadas no mês: C.H. semanal proporcional aos dias fora de férias; cada
+    feriado em dia útil abate um dia de trabalho (ch_semanal / 5).
+    """
+    return max(ch_semanal * dias_disponiveis / 7 - ch_semanal / 5 * feriados_uteis_disponiveis, 0)
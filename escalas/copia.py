@@ -0,0 +1,151 @@
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+
+from core.models import AtribuicaoEscala, Escala, Turno, Unidade
+
+from .cache import invalidar_escala
+from .calendario import dias_no_mes
+from .carga_horaria import recalcular_escalas
+from .disponibilidade import DisponibilidadeMes, ferias_sobrepostas
+from .eventos import publicar_recarga
+from .versoes import registrar_versao
+
+# Como os dias do mês anterior viram dias do novo mês
+SEMANA = "semana"  # mesmo dia da semana, na semana mais próxima
+CICLO = "ciclo"  # continua um rodízio de `ciclo` dias a partir do fim do mês anterior
+MODOS = (SEMANA, CICLO)
+
+# Rodízio semanal; 12x36 é ciclo 2, 12x60 é ciclo 3
+CICLO_PADRAO = 7
+
+TAMANHO_LOTE = 2000
+
+
+def mes_anterior(mes, ano):
+    return (12, ano - 1) if mes == 1 else (mes - 1, ano)
+
+
+def mapa_de_dias(mes, ano, modo=SEMANA, ciclo=CICLO_PADRAO):
+    """
+    {dia do novo mês: dia do mês anterior de onde vem a célula}. Dias sem origem ficam de fora.
+    """
+    mes_o, ano_o = mes_anterior(mes, ano)
+    num_origem = dias_no_mes(ano_o, mes_o)
+    num_destino = dias_no_mes(ano, mes)
+    mapa = {}
+    if modo == SEMANA:
+        # origem com o mesmo dia da semana, deslocada no máximo 3 dias
+        deslocamento = (date(ano, mes, 1).weekday() - date(ano_o, mes_o, 1).weekday()) % 7
+        if deslocamento > 3:
+            deslocamento -= 7
+        for dia in range(1, num_destino + 1):
+            origem = dia + deslocamento
+            if origem < 1:
+                origem += 7
+            elif origem > num_origem:
+                origem -= 7
+            mapa[dia] = origem
+    elif modo == CICLO:
+        if not 1 <= ciclo <= num_origem:
+            raise ValueError(f"Ciclo deve ficar entre 1 e {num_origem} dias")
+        # o dia d do novo mês é o dia num_origem + d do rodízio: mesma posição no último ciclo completo
+        for dia in range(1, num_destino + 1):
+            mapa[dia] = num_origem - (ciclo - dia % ciclo) % ciclo
+    else:
+        raise ValueError(f"Modo de cópia desconhecido: {modo}")
+    return mapa
+
+
+def copiar_mes(mes, ano, unidade_ids=None, modo=SEMANA, ciclo=CICLO_PADRAO, substituir=False):
+    """
+    Copia as escalas do mês anterior para (mes, ano) nas unidades pedidas (todas, se None)
+    numa transação: uma leitura das atribuições de origem, uma das férias e um bulk_create.
+    Quem saiu da unidade fica de fora; nos dias de férias entra FE (como no gerador) no
+    lugar do turno copiado. Escalas de destino já preenchidas só são refeitas com `substituir`.
+    Cada escala copiada ganha uma versão no histórico (origem "copia").
+    Retorna {"escalas": {unidade_id: escala_id}, "criadas", "puladas_ferias",
+    "sem_origem": [unidade_id, ...], "preenchidas": [unidade_id, ...]}.
+    """
+    mapa = mapa_de_dias(mes, ano, modo, ciclo)
+    mes_o, ano_o = mes_anterior(mes, ano)
+    if unidade_ids is None:
+        unidade_ids = list(Unidade.objects.order_by("id").values_list("id", flat=True))
+    unidade_ids = list(unidade_ids)
+    resultado = {"escalas": {}, "criadas": 0, "puladas_ferias": 0, "sem_origem": [], "preenchidas": []}
+
+    with transaction.atomic():
+        origens = dict(
+            Escala.objects.filter(unidade_id__in=unidade_ids, mes=mes_o, ano=ano_o).values_list("unidade_id", "id")
+        )
+        resultado["sem_origem"] = [u for u in unidade_ids if u not in origens]
+        if not origens:
+            return resultado
+
+        Escala.objects.bulk_create(
+            [Escala(unidade_id=u, mes=mes, ano=ano) for u in origens], ignore_conflicts=True,
+        )
+        escalas_destino = {
+            escala.unidade_id: escala
+            for escala in Escala.objects.select_for_update().filter(unidade_id__in=origens.keys(), mes=mes, ano=ano)
+        }
+        destinos = {unidade_id: escala.id for unidade_id, escala in escalas_destino.items()}
+        preenchidas = set(
+            AtribuicaoEscala.objects.filter(escala_id__in=destinos.values())
+            .values_list("escala__unidade_id", flat=True).distinct()
+        )
+        if substituir:
+            AtribuicaoEscala.objects.filter(escala_id__in=[destinos[u] for u in preenchidas]).delete()
+        else:
+            resultado["preenchidas"] = sorted(preenchidas)
+            origens = {u: e for u, e in origens.items() if u not in preenchidas}
+
+        # só quem continua na unidade; FE do mês anterior não se repete
+        turno_ferias = Turno.objects.filter(sigla__iexact="FE").values_list("id", flat=True).first()
+        linhas = list(
+            AtribuicaoEscala.objects.filter(escala_id__in=origens.values(), funcionario__unidade_id=F("escala__unidade_id"))
+            .exclude(tipo_turno_id=turno_ferias)
+            .order_by()
+            .values_list("escala__unidade_id", "funcionario_id", "dia", "tipo_turno_id")
+        )
+        equipe = {(u, f) for u, f, _, _ in linhas}
+        funcionario_ids = {f for _, f in equipe}
+        inicio, fim = date(ano, mes, 1), date(ano, mes, dias_no_mes(ano, mes))
+        periodos = ferias_sobrepostas(inicio, fim, funcionario_ids=funcionario_ids) if funcionario_ids else []
+        disponibilidade = DisponibilidadeMes(ano, mes, funcionario_ids, periodos)
+
+        # dia de origem -> dias de destino (no modo semana um dia pode alimentar dois)
+        destinos_do_dia = {}
+        for dia, origem in mapa.items():
+            destinos_do_dia.setdefault(origem, []).append(dia)
+
+        novas = set()
+        for unidade_id, func_id, dia_origem, turno_id in linhas:
+            for dia in destinos_do_dia.get(dia_origem, ()):
+                if disponibilidade.em_ferias(func_id, dia):
+                    resultado["puladas_ferias"] += 1
+                else:
+                    novas.add((destinos[unidade_id], func_id, dia, turno_id))
+        if turno_ferias:
+            for unidade_id, func_id in equipe:
+                for dia in disponibilidade.dias_de_ferias(func_id):
+                    novas.add((destinos[unidade_id], func_id, dia, turno_ferias))
+
+        AtribuicaoEscala.objects.bulk_create(
+            [
+                AtribuicaoEscala(escala_id=escala_id, funcionario_id=func_id, dia=dia, tipo_turno_id=turno_id)
+                for escala_id, func_id, dia, turno_id in sorted(novas)
+            ],
+            batch_size=TAMANHO_LOTE,
+        )
+        resultado["criadas"] = len(novas)
+
+        # bulk_create não dispara sinais: C.H. e grade em cache das escalas tocadas
+        resultado["escalas"] = {u: destinos[u] for u in origens}
+        recalcular_escalas(resultado["escalas"].values())
+        for unidade_id, escala_id in resultado["escalas"].items():
+            invalidar_escala(escala_id)
+            registrar_versao(escalas_destino[unidade_id], origem="copia")
+            publicar_recarga(escala_id)
+    return resultado
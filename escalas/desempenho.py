@@ -0,0 +1,245 @@
+import atexit
+import heapq
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Amostras guardadas em memória (as mais antigas saem primeiro)
+CAPACIDADE_PADRAO = 2000
+# Consultas mais lentas guardadas por amostra, com a pilha de chamadas
+CONSULTAS_LENTAS_PADRAO = 5
+# De quanto em quanto tempo (s) as amostras novas vão para o arquivo
+INTERVALO_GRAVACAO_PADRAO = 60
+# Quadros da pilha guardados por consulta (só os do projeto)
+QUADROS_PILHA = 8
+
+_amostra_atual = ContextVar("escalas_amostra_desempenho", default=None)
+
+
+def _config(nome, padrao):
+    return getattr(settings, f"ESCALAS_DESEMPENHO_{nome}", padrao)
+
+
+def _arquivo():
+    arquivo = _config("ARQUIVO", None)
+    return Path(arquivo) if arquivo else None
+
+
+class Amostra:
+    """
+    Medições de uma requisição. Os tempos são acumulados em segundos e saem em ms.
+    """
+    __slots__ = ("inicio", "consultas", "tempo_sql", "tempo_template", "lentas", "max_lentas")
+
+    def __init__(self, max_lentas):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.tempo_template = 0.0
+        self.lentas = []  # heap (duração, ordem, sql, pilha) com as max_lentas mais lentas
+        self.max_lentas = max_lentas
+
+    def registrar_consulta(self, sql, duracao):
+        self.consultas += 1
+        self.tempo_sql += duracao
+        if len(self.lentas) < self.max_lentas:
+            heapq.heappush(self.lentas, (duracao, self.consultas, sql, _pilha()))
+        elif self.max_lentas and duracao > self.lentas[0][0]:
+            # a pilha só é montada para consultas que entram na lista
+            heapq.heapreplace(self.lentas, (duracao, self.consultas, sql, _pilha()))
+
+    def como_dict(self, request, resposta, total):
+        match = getattr(request, "resolver_match", None)
+        return {
+            "quando": datetime.now().isoformat(timespec="seconds"),
+            "view": match.view_name if match else "",
+            "metodo": request.method,
+            "caminho": request.path,
+            "status": resposta.status_code,
+            "total_ms": round(total * 1000, 2),
+            "sql_ms": round(self.tempo_sql * 1000, 2),
+            "consultas": self.consultas,
+            "template_ms": round(self.tempo_template * 1000, 2),
+            "consultas_lentas": [
+                {"ms": round(duracao * 1000, 2), "sql": sql, "pilha": pilha}
+                for duracao, _, sql, pilha in sorted(self.lentas, reverse=True)
+            ],
+        }
+
+
+def _pilha():
+    """
+    Quadros do projeto na pilha atual ("arquivo:linha em função"), sem Django,
+    bibliotecas e este módulo.
+    """
+    base = str(settings.BASE_DIR)
+    quadros = [
+        f"{os.path.relpath(q.filename, base)}:{q.lineno} em {q.name}"
+        for q in traceback.extract_stack()
+        if q.filename.startswith(base) and q.filename != __file__ and "site-packages" not in q.filename
+    ]
+    return quadros[-QUADROS_PILHA:]
+
+
+class _Registro:
+    """
+    Buffer circular das amostras recentes, compartilhado pelas threads do processo.
+    As amostras novas também ficam numa lista até a próxima gravação no arquivo (JSON por linha).
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._amostras = deque(maxlen=_config("CAPACIDADE", CAPACIDADE_PADRAO))
+        self._pendentes = []
+        self._ultima_gravacao = time.monotonic()
+
+    def adicionar(self, amostra):
+        with self._trava:
+            self._amostras.append(amostra)
+            if _arquivo():
+                self._pendentes.append(amostra)
+            gravar = time.monotonic() - self._ultima_gravacao >= _config(
+                "INTERVALO_GRAVACAO", INTERVALO_GRAVACAO_PADRAO
+            )
+        if gravar:
+            self.gravar()
+
+    def gravar(self):
+        arquivo = _arquivo()
+        with self._trava:
+            pendentes, self._pendentes = self._pendentes, []
+            self._ultima_gravacao = time.monotonic()
+        if not arquivo or not pendentes:
+            return
+        arquivo.parent.mkdir(parents=True, exist_ok=True)
+        with open(arquivo, "a", encoding="utf-8") as saida:
+            for amostra in pendentes:
+                saida.write(json.dumps(amostra, ensure_ascii=False) + "\n")
+
+    def amostras(self):
+        with self._trava:
+            return list(self._amostras)
+
+    def limpar(self):
+        with self._trava:
+            self._amostras.clear()
+            self._pendentes = []
+
+
+registro = _Registro()
+# o que não chegou ao arquivo ainda vai quando o processo termina normalmente
+atexit.register(registro.gravar)
+
+
+def _medir_template(render):
+    # envolve Template.render do backend do Django: só a renderização de topo
+    # (extends/include rodam dentro dela); fora de uma amostra só repassa a chamada
+    def render_medido(self, context=None, request=None):
+        amostra = _amostra_atual.get()
+        if amostra is None:
+            return render(self, context, request)
+        _amostra_atual.set(None)
+        inicio = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            amostra.tempo_template += time.perf_counter() - inicio
+            _amostra_atual.set(amostra)
+    render_medido.medido = True
+    return render_medido
+
+
+def _instalar_medicao_template():
+    from django.template.backends.django import Template
+
+    if not getattr(Template.render, "medido", False):
+        Template.render = _medir_template(Template.render)
+
+
+class DesempenhoMiddleware:
+    """
+    Mede uma fração das requisições (ESCALAS_DESEMPENHO_AMOSTRAGEM, de 0 a 1): tempo total,
+    consultas e tempo de SQL, tempo de renderização das templates e as consultas mais lentas
+    com a pilha. Responde com Server-Timing e guarda a amostra no `registro`.
+    Com amostragem 0 o Django nem carrega o middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.taxa = float(_config("AMOSTRAGEM", 0))
+        if self.taxa <= 0:
+            raise MiddlewareNotUsed
+        self.max_lentas = _config("CONSULTAS_LENTAS", CONSULTAS_LENTAS_PADRAO)
+        _instalar_medicao_template()
+
+    def __call__(self, request):
+        if self.taxa < 1 and random.random() >= self.taxa:
+            return self.get_response(request)
+
+        amostra = Amostra(self.max_lentas)
+
+        def medir_sql(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                amostra.registrar_consulta(sql, time.perf_counter() - inicio)
+
+        token = _amostra_atual.set(amostra)
+        try:
+            with connections["default"].execute_wrapper(medir_sql):
+                resposta = self.get_response(request)
+        finally:
+            _amostra_atual.reset(token)
+        # respostas em streaming: as consultas feitas durante a iteração ficam de fora
+        total = time.perf_counter() - amostra.inicio
+        dados = amostra.como_dict(request, resposta, total)
+        resposta["Server-Timing"] = ", ".join([
+            f'sql;dur={dados["sql_ms"]};desc="{dados["consultas"]} consultas"',
+            f'tpl;dur={dados["template_ms"]}',
+            f'total;dur={dados["total_ms"]}',
+        ])
+        registro.adicionar(dados)
+        return resposta
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p * (len(valores) - 1))))]
+
+
+def resumo_por_view(amostras):
+    """
+    [{"view", "requisicoes", "mediana_ms", "p95_ms", "max_ms", "consultas_media", "sql_ms_medio",
+    "template_ms_medio"}, ...], das views mais lentas (p95) para as mais rápidas.
+    """
+    por_view = {}
+    for amostra in amostras:
+        por_view.setdefault(amostra["view"] or amostra["caminho"], []).append(amostra)
+    resumo = []
+    for view, lista in por_view.items():
+        tempos = [a["total_ms"] for a in lista]
+        resumo.append({
+            "view": view,
+            "requisicoes": len(lista),
+            "mediana_ms": round(statistics.median(tempos), 1),
+            "p95_ms": round(_percentil(tempos, 0.95), 1),
+            "max_ms": round(max(tempos), 1),
+            "consultas_media": round(statistics.mean(a["consultas"] for a in lista), 1),
+            "sql_ms_medio": round(statistics.mean(a["sql_ms"] for a in lista), 1),
+            "template_ms_medio": round(statistics.mean(a["template_ms"] for a in lista), 1),
+        })
+    resumo.sort(key=lambda r: -r["p95_ms"])
+    return resumo
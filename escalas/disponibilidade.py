@@ -0,0 +1,106 @@
+from datetime import date
+
+from django.db import connections
+from django.db.models import BooleanField, F, Func, Value
+
+from core.models import Ferias
+
+from .calendario import dias_no_mes
+
+
+class _Periodo(Func):
+    # daterange fechado nas duas pontas, a mesma expressão do índice GiST da migração 0008
+    function = "daterange"
+    template = "%(function)s(%(expressions)s, '[]')"
+
+
+class _Sobrepoe(Func):
+    arg_joiner = " && "
+    template = "%(expressions)s"
+    output_field = BooleanField()
+
+
+def ferias_sobrepostas(inicio, fim, unidade_id=None, funcionario_ids=None):
+    """
+    (funcionario_id, data_inicio, data_fim) das férias que cruzam o período, numa consulta
+    de intervalo: `&&` entre dateranges no Postgres (índice GiST), comparação das pontas
+    nos demais bancos (índice funcionario, data_inicio, data_fim).
+    """
+    ferias = Ferias.objects.all()
+    if unidade_id is not None:
+        ferias = ferias.filter(funcionario__unidade_id=unidade_id)
+    if funcionario_ids is not None:
+        ferias = ferias.filter(funcionario_id__in=funcionario_ids)
+    if connections[ferias.db].vendor == "postgresql":
+        ferias = ferias.filter(_Sobrepoe(
+            _Periodo(F("data_inicio"), F("data_fim")), _Periodo(Value(inicio), Value(fim)),
+        ))
+    else:
+        ferias = ferias.filter(data_inicio__lte=fim, data_fim__gte=inicio)
+    return ferias.order_by().values_list("funcionario_id", "data_inicio", "data_fim")
+
+
+class DisponibilidadeMes:
+    """
+    Férias do mês como um mapa de bits por funcionário: o bit d - 1 ligado quer dizer
+    "de férias no dia d". Carregado numa consulta; as perguntas por dia ou por célula
+    são feitas em memória.
+    Uso:
+        disp = DisponibilidadeMes.da_unidade(unidade_id, 2024, 3, funcionario_ids)
+        disp.em_ferias(func_id, 10); disp.disponiveis_por_dia() -> [qtd_dia1, ...]
+    """
+    __slots__ = ("ano", "mes", "num_dias", "funcionario_ids", "ausencias")
+
+    def __init__(self, ano, mes, funcionario_ids, periodos):
+        self.ano = ano
+        self.mes = mes
+        self.num_dias = dias_no_mes(ano, mes)
+        self.funcionario_ids = list(funcionario_ids)
+        self.ausencias = {}  # funcionario_id -> int (bits dos dias de férias); só quem tem férias no mês
+        inicio, fim = date(ano, mes, 1), date(ano, mes, self.num_dias)
+        for func_id, data_inicio, data_fim in periodos:
+            primeiro = max(data_inicio, inicio).day
+            ultimo = min(data_fim, fim).day
+            if primeiro > ultimo:
+                continue
+            # dias primeiro..ultimo: uma faixa de bits ligados
+            bits = ((1 << (ultimo - primeiro + 1)) - 1) << (primeiro - 1)
+            self.ausencias[func_id] = self.ausencias.get(func_id, 0) | bits
+
+    @classmethod
+    def da_unidade(cls, unidade_id, ano, mes, funcionario_ids):
+        """
+        `funcionario_ids` é a equipe considerada (quem não tem férias conta como disponível).
+        """
+        inicio, fim = date(ano, mes, 1), date(ano, mes, dias_no_mes(ano, mes))
+        return cls(ano, mes, funcionario_ids, ferias_sobrepostas(inicio, fim, unidade_id=unidade_id))
+
+    @classmethod
+    def dos_funcionarios(cls, funcionario_ids, ano, mes):
+        funcionario_ids = list(funcionario_ids)
+        inicio, fim = date(ano, mes, 1), date(ano, mes, dias_no_mes(ano, mes))
+        periodos = ferias_sobrepostas(inicio, fim, funcionario_ids=funcionario_ids) if funcionario_ids else []
+        return cls(ano, mes, funcionario_ids, periodos)
+
+    def em_ferias(self, funcionario_id, dia):
+        return bool(self.ausencias.get(funcionario_id, 0) >> (dia - 1) & 1)
+
+    def dias_de_ferias(self, funcionario_id):
+        bits = self.ausencias.get(funcionario_id, 0)
+        return [dia for dia in range(1, self.num_dias + 1) if bits >> (dia - 1) & 1]
+
+    def disponiveis_por_dia(self):
+        """
+        Funcionários fora de férias em cada dia: [qtd_dia1, ...]. Parte da equipe toda e
+        desconta só os bits ligados, então o custo é o dos dias de férias, não funcionários x dias.
+        """
+        disponiveis = [len(self.funcionario_ids)] * self.num_dias
+        equipe = set(self.funcionario_ids)
+        for func_id, bits in self.ausencias.items():
+            if func_id not in equipe:
+                continue
+            while bits:
+                menor = bits & -bits
+                disponiveis[menor.bit_length() - 1] -= 1
+                bits ^= menor
+        return disponiveis
@@ -0,0 +1,55 @@
+from django.db.models import Count, Max
+
+from core.models import Funcionario
+
+from .cache import TEMPO_CACHE, cache_escalas
+
+CAMPOS_EQUIPE = (
+    'id', 'nome_completo', 'siape', 'registro_conselho', 'cargo', 'vinculo', 'ch_semanal', 'preferencias_turno',
+)
+
+
+def _funcionarios(unidade_id, cargo):
+    funcionarios = Funcionario.objects.filter(unidade_id=unidade_id)
+    if cargo:
+        funcionarios = funcionarios.filter(cargo=cargo)
+    return funcionarios
+
+
+def estado_equipe(unidade_id, cargo=None):
+    """
+    (quantidade, última alteração) dos funcionários da unidade e do cargo, numa consulta ao banco.
+    Qualquer save muda a data (auto_now); entrada ou saída da equipe muda a quantidade.
+    """
+    estado = _funcionarios(unidade_id, cargo).aggregate(total=Count('id'), ultima=Max('atualizado_em'))
+    return estado['total'], estado['ultima']
+
+
+def _versao(unidade_id, cargo, total, ultima):
+    return f"{unidade_id}-{cargo or ''}-{total}-{ultima.timestamp() if ultima else 0}"
+
+
+def listar_equipe(unidade_id, cargo=None):
+    """
+    Funcionários da unidade (e do cargo, se informado) ordenados por nome.
+    Guardado em cache pelo estado da equipe no banco (estado_equipe), então
+    alterações feitas por qualquer processo geram uma chave nova.
+    Retorna (lista de dicts, versão).
+    """
+    versao = _versao(unidade_id, cargo, *estado_equipe(unidade_id, cargo))
+    chave = f"escalas:equipe:{versao}"
+    cache = cache_escalas()
+    equipe = cache.get(chave)
+    if equipe is None:
+        equipe = list(_funcionarios(unidade_id, cargo).order_by('nome_completo').values(*CAMPOS_EQUIPE))
+        cache.set(chave, equipe, TEMPO_CACHE)
+    return equipe, versao
+
+
+def etag_equipe(unidade_id, cargo=None):
+    return f'"equipe-{_versao(unidade_id, cargo, *estado_equipe(unidade_id, cargo))}"'
+
+
+def modificada_em(unidade_id, cargo=None):
+    # Exclusões não mudam a data; a quantidade no ETag, que tem precedência, cobre esse caso
+    return estado_equipe(unidade_id, cargo)[1]
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from core.models import AtribuicaoEscala, Turno
+
+from .totais import cobertura_dos_dias
+
+# Eventos guardados por página aberta; se ela não der conta, recebe "recarregar" no lugar
+TAMANHO_FILA = 200
+
+# Acima disso (ex.: gerador, cópia do mês) a página é mandada recarregar em vez de receber as células
+LIMITE_CELULAS_EVENTO = 500
+
+
+def canal_escala(escala_id):
+    return f"escala:{escala_id}"
+
+
+class Assinatura:
+    """
+    Uma página inscrita num canal. `proximo` espera o próximo evento (None ao fim do tempo).
+    """
+    __slots__ = ("barramento", "canal", "loop", "fila")
+
+    def __init__(self, barramento, canal, loop, fila):
+        self.barramento = barramento
+        self.canal = canal
+        self.loop = loop
+        self.fila = fila
+
+    async def proximo(self, tempo):
+        try:
+            return await asyncio.wait_for(self.fila.get(), tempo)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelar(self):
+        self.barramento._remover(self)
+
+
+def _entregar(fila, evento):
+    # roda no loop da página; fila cheia: descarta o acumulado e pede para recarregar
+    if fila.full():
+        while not fila.empty():
+            fila.get_nowait()
+        evento = {"tipo": "recarregar"}
+    fila.put_nowait(evento)
+
+
+class BarramentoLocal:
+    """
+    Pub/sub em memória do processo: quem grava publica de qualquer thread, as páginas
+    abertas (views assíncronas) recebem no próprio loop. Só alcança as páginas servidas
+    pelo mesmo processo; outro barramento (ex.: Redis) entra por ESCALAS_EVENTOS_BARRAMENTO
+    com a mesma interface: publicar, assinar e assinantes.
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._assinaturas = {}  # canal -> {Assinatura, ...}
+
+    def assinar(self, canal):
+        # chamado dentro do loop da requisição
+        assinatura = Assinatura(self, canal, asyncio.get_running_loop(), asyncio.Queue(TAMANHO_FILA))
+        with self._trava:
+            self._assinaturas.setdefault(canal, set()).add(assinatura)
+        return assinatura
+
+    def _remover(self, assinatura):
+        with self._trava:
+            assinaturas = self._assinaturas.get(assinatura.canal)
+            if assinaturas:
+                assinaturas.discard(assinatura)
+                if not assinaturas:
+                    del self._assinaturas[assinatura.canal]
+
+    def assinantes(self, canal):
+        with self._trava:
+            return len(self._assinaturas.get(canal, ()))
+
+    def publicar(self, canal, evento):
+        with self._trava:
+            assinaturas = list(self._assinaturas.get(canal, ()))
+        for assinatura in assinaturas:
+            try:
+                assinatura.loop.call_soon_threadsafe(_entregar, assinatura.fila, evento)
+            except RuntimeError:
+                # loop já encerrado (conexão caiu sem passar pelo finally)
+                assinatura.cancelar()
+
+
+_barramento = None
+_trava_barramento = threading.Lock()
+
+
+def barramento():
+    global _barramento
+    if _barramento is None:
+        with _trava_barramento:
+            if _barramento is None:
+                caminho = getattr(settings, "ESCALAS_EVENTOS_BARRAMENTO", "escalas.eventos.BarramentoLocal")
+                _barramento = import_string(caminho)()
+    return _barramento
+
+
+def _montar_eventos(escala, celulas, horas):
+    # eventos "celulas" (siglas de cada célula e C.H. das linhas) e "totais" (cobertura e nomes dos dias)
+    siglas = dict(Turno.objects.values_list("id", "sigla"))
+    dias = sorted({dia for _, dia in celulas})
+    cobertura = cobertura_dos_dias(escala, dias)
+    nomes = {dia: [] for dia in dias}
+    escalados = (
+        AtribuicaoEscala.objects.filter(escala=escala, dia__in=dias)
+        .order_by("dia", "funcionario__nome_completo").values_list("dia", "funcionario__nome_completo")
+    )
+    for dia, nome in escalados:
+        nomes[dia].append(nome)
+    return [
+        {
+            "tipo": "celulas",
+            "celulas": [
+                {"funcionario": func_id, "dia": dia, "turnos": [siglas.get(t, "") for t in turno_ids]}
+                for (func_id, dia), turno_ids in sorted(celulas.items())
+            ],
+            "horas": {str(func_id): total for func_id, total in horas.items()},
+        },
+        {
+            "tipo": "totais",
+            "dias": {str(dia): {"cobertura": cobertura[dia], "nomes": nomes[dia]} for dia in dias},
+        },
+    ]
+
+
+def publicar_alteracoes(escala, celulas, horas):
+    """
+    Publica, depois do commit, o que mudou na escala para as páginas abertas:
+    `celulas` {(funcionario_id, dia): [turno_id, ...]} (todos os turnos da célula, []
+    se ficou vazia) e `horas` {funcionario_id: C.H.}.
+    Os totais dos dias só são consultados se alguém estiver inscrito.
+    """
+    canal = canal_escala(escala.id)
+
+    def enviar():
+        destino = barramento()
+        if destino.assinantes(canal) == 0:
+            return
+        if len(celulas) > LIMITE_CELULAS_EVENTO:
+            destino.publicar(canal, {"tipo": "recarregar"})
+            return
+        for evento in _montar_eventos(escala, celulas, horas):
+            destino.publicar(canal, evento)
+
+    transaction.on_commit(enviar)
+
+
+def publicar_recarga(escala_id):
+    """
+    Pede às páginas abertas que recarreguem a escala inteira (ex.: depois da cópia do mês).
+    """
+    canal = canal_escala(escala_id)
+    transaction.on_commit(lambda: barramento().publicar(canal, {"tipo": "recarregar"}))
@@ -0,0 +1,166 @@
+import codecs
+import csv
+import tempfile
+
+from django.db.models import Q
+
+from core.models import AtribuicaoEscala
+
+from .calendario import dias_no_mes
+from .matriz import MatrizMes
+
+try:
+    import xlsxwriter
+except ImportError:  # exportação em XLSX é opcional
+    xlsxwriter = None
+
+# Linhas lidas do cursor por vez; nada além disso fica em memória
+TAMANHO_LOTE = 2000
+
+CAMPOS = (
+    "escala_id",
+    "escala__mes",
+    "escala__ano",
+    "escala__unidade__nome",
+    "funcionario_id",
+    "funcionario__siape",
+    "funcionario__nome_completo",
+    "funcionario__cargo",
+    "dia",
+    "tipo_turno_id",
+    "tipo_turno__sigla",
+    "tipo_turno__horas",
+    "tipo_turno__periodo",
+)
+
+
+def atribuicoes_da_escala(escala):
+    return AtribuicaoEscala.objects.filter(escala=escala)
+
+
+def atribuicoes_do_mes(mes, ano):
+    return AtribuicaoEscala.objects.filter(escala__mes=mes, escala__ano=ano)
+
+
+def atribuicoes_do_periodo(inicio, fim):
+    """
+    Atribuições entre as datas `inicio` e `fim` (inclusive), de todas as unidades.
+    Nos meses das pontas só entram os dias dentro do período.
+    """
+    filtro = (
+        (Q(escala__ano__gt=inicio.year) | Q(escala__ano=inicio.year, escala__mes__gte=inicio.month))
+        & (Q(escala__ano__lt=fim.year) | Q(escala__ano=fim.year, escala__mes__lte=fim.month))
+    )
+    fora = Q(escala__ano=inicio.year, escala__mes=inicio.month, dia__lt=inicio.day)
+    fora |= Q(escala__ano=fim.year, escala__mes=fim.month, dia__gt=fim.day)
+    return AtribuicaoEscala.objects.filter(filtro).exclude(fora)
+
+
+def linhas_escala(atribuicoes):
+    """
+    Percorre as atribuições com cursor no servidor (.iterator()), ordenadas por
+    escala e funcionário, montando a MatrizMes de uma escala por vez. Devolve uma
+    linha por funcionário em cada escala:
+    {"siape", "nome", "cargo", "unidade", "mes", "ano", "siglas": [sigla do dia 1, ...], "horas"}.
+    Dia com mais de um turno sai com as siglas juntas (ex.: "M6/T6") e todas as horas somadas.
+    """
+    consulta = atribuicoes.order_by(
+        "escala__ano", "escala__mes", "escala__unidade__nome", "escala_id",
+        "funcionario__nome_completo", "funcionario_id", "dia",
+    ).values_list(*CAMPOS)
+
+    matriz = cabecalho_escala = None
+    escala_atual = None
+    for (escala_id, mes, ano, unidade, func_id, siape, nome, cargo,
+         dia, turno_id, sigla, horas, periodo) in consulta.iterator(chunk_size=TAMANHO_LOTE):
+        if escala_id != escala_atual:
+            if matriz is not None:
+                yield from _linhas_da_matriz(matriz, cabecalho_escala)
+            escala_atual = escala_id
+            cabecalho_escala = {"unidade": unidade, "mes": mes, "ano": ano}
+            matriz = MatrizMes(dias_no_mes(ano, mes))
+        if 1 <= dia <= matriz.num_dias:
+            linha = matriz.adicionar_linha(func_id, (siape, nome, cargo))
+            matriz.acrescentar(linha, dia, matriz.indice_turno(turno_id, sigla, horas, periodo))
+    if matriz is not None:
+        yield from _linhas_da_matriz(matriz, cabecalho_escala)
+
+
+def _linhas_da_matriz(matriz, cabecalho_escala):
+    for linha in matriz.linhas:
+        siape, nome, cargo = linha.funcionario
+        yield {
+            "siape": siape, "nome": nome, "cargo": cargo, **cabecalho_escala,
+            "siglas": linha.dias_list, "horas": linha.total_horas,
+        }
+
+
+def cabecalho(num_dias):
+    return ["SIAPE", "Nome", "Cargo", "Unidade", "Mês", "Ano"] + [str(d) for d in range(1, num_dias + 1)] + ["Horas"]
+
+
+def _valores(linha, num_dias):
+    siglas = linha["siglas"][:num_dias]
+    return (
+        [linha["siape"], linha["nome"], linha["cargo"], linha["unidade"], linha["mes"], linha["ano"]]
+        + siglas + [""] * (num_dias - len(siglas))
+        + [linha["horas"]]
+    )
+
+
+def _formatar_horas(horas):
+    return f"{horas:g}".replace(".", ",")
+
+
+class _Eco:
+    # "Arquivo" que só devolve o que foi escrito, para o csv.writer alimentar o stream
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(atribuicoes, num_dias=31):
+    """
+    Gera o CSV pedaço a pedaço (separador ';' e BOM UTF-8 para abrir direto no Excel).
+    Uso: StreamingHttpResponse(gerar_csv(atribuicoes_do_mes(4, 2025)), content_type="text/csv")
+    """
+    escritor = csv.writer(_Eco(), delimiter=";")
+    yield codecs.BOM_UTF8.decode("utf-8") + escritor.writerow(cabecalho(num_dias))
+    for linha in linhas_escala(atribuicoes):
+        valores = _valores(linha, num_dias)
+        valores[-1] = _formatar_horas(valores[-1])
+        yield escritor.writerow(valores)
+
+
+def gerar_xlsx(atribuicoes, num_dias=31, titulo="Escala", arquivo=None):
+    """
+    Escreve a planilha em modo de memória constante (cada linha vai para o disco
+    assim que a seguinte começa) em `arquivo` ou, sem ele, num arquivo temporário,
+    e devolve o arquivo posicionado no início. Exige o pacote xlsxwriter.
+    Só a escala de uma unidade é gerada na requisição; mês e período vão para a
+    fila (tarefa "exportar_xlsx"), que grava o arquivo com gravar_artefato.
+    """
+    if xlsxwriter is None:
+        raise RuntimeError("Exportação em XLSX requer o pacote xlsxwriter.")
+    if arquivo is None:
+        arquivo = tempfile.TemporaryFile()
+    livro = xlsxwriter.Workbook(arquivo, {"constant_memory": True, "in_memory": False})
+    planilha = livro.add_worksheet(titulo[:31])
+    negrito = livro.add_format({"bold": True})
+    planilha.write_row(0, 0, cabecalho(num_dias), negrito)
+    planilha.set_column(1, 1, 40)
+    planilha.set_column(3, 3, 30)
+    planilha.set_column(6, 5 + num_dias, 5)
+    for n, linha in enumerate(linhas_escala(atribuicoes), start=1):
+        planilha.write_row(n, 0, _valores(linha, num_dias))
+    livro.close()
+    arquivo.seek(0)
+    return arquivo
+
+
+def dias_do_periodo(inicio, fim):
+    """
+    Quantidade de colunas de dia: o mês inteiro se o período cabe num mês, senão 31.
+    """
+    if (inicio.year, inicio.month) == (fim.year, fim.month):
+        return dias_no_mes(fim.year, fim.month)
+    return 31
@@ -0,0 +1,334 @@
+import random
+import re
+import time
+from array import array
+from datetime import date
+
+from core.models import Funcionario, Turno
+
+from .calendario import dias_no_mes, feriados_entre
+from .carga_horaria import meta_horas
+from .disponibilidade import DisponibilidadeMes
+from .gravacao import salvar_grade
+from .matriz import VAZIO as VAZIO_MATRIZ, MatrizMes
+from .parametros import TOLERANCIA_HORAS, minimos_da_unidade
+from .totais import PERIODOS
+
+# Pesos da função de custo da busca local
+PESO_COBERTURA = 100
+PESO_HORAS = 2
+PESO_PREFERENCIA = 1
+
+VAZIO = -1
+
+
+def _siglas_preferidas(texto):
+    return {s for s in re.split(r"[\s,;/]+", (texto or "").upper()) if s}
+
+
+class GeradorEscala:
+    """
+    Gera a escala de uma unidade no mês em duas etapas:
+
+    1. semente gulosa: preenche a cobertura mínima de cada dia/período e depois
+       completa a carga horária de quem ficou abaixo da meta;
+    2. busca local (trocar o turno de uma célula ou trocar o dia entre dois
+       funcionários) até acabar o tempo ou o custo chegar a zero.
+
+    Regras obrigatórias: um turno por dia, nada durante férias e folga no dia
+    seguinte a um plantão noturno. Cobertura, carga horária e preferências
+    entram no custo; o que não for atendido volta em `pendencias`.
+    """
+
+    def __init__(self, unidade_id, mes, ano, cobertura_minima=None, cargo=None,
+                 tempo_limite=2.0, semente=None, funcionarios=None, turnos=None, feriados=None, ferias=None):
+        self.mes = mes
+        self.ano = ano
+        self.num_dias = dias_no_mes(ano, mes)
+        self.cobertura_minima = minimos_da_unidade(unidade_id, cobertura_minima)
+        self.tempo_limite = tempo_limite
+        self.rng = random.Random(semente)
+
+        if funcionarios is None:
+            funcionarios = Funcionario.objects.filter(unidade_id=unidade_id)
+            if cargo:
+                funcionarios = funcionarios.filter(cargo=cargo)
+            funcionarios = list(funcionarios.order_by("nome_completo").only(
+                "id", "nome_completo", "ch_semanal", "preferencias_turno"
+            ))
+        if turnos is None:
+            turnos = list(Turno.objects.all().order_by("sigla"))
+        inicio, fim = date(ano, mes, 1), date(ano, mes, self.num_dias)
+        if feriados is None:
+            feriados = feriados_entre(inicio, fim)
+        if ferias is None:
+            disponibilidade = DisponibilidadeMes.dos_funcionarios([f.id for f in funcionarios], ano, mes)
+        else:
+            disponibilidade = DisponibilidadeMes(ano, mes, [f.id for f in funcionarios], ferias)
+
+        self.funcionarios = funcionarios
+        self.feriados = {d.day for d in feriados if d.year == ano and d.month == mes}
+        self._preparar_turnos(turnos)
+        self._preparar_funcionarios(disponibilidade)
+
+    # Preparação
+
+    def _preparar_turnos(self, turnos):
+        self.turnos = [t for t in turnos if (t.periodo or "").strip().lower() in PERIODOS and t.horas > 0]
+        self.periodo_turno = [PERIODOS.index(t.periodo.strip().lower()) for t in self.turnos]
+        self.horas_turno = [t.horas for t in self.turnos]
+        self.turno_ferias = next((t for t in turnos if t.sigla.upper() == "FE"), None)
+        self.minimos = [self.cobertura_minima.get(p, 0) for p in PERIODOS]
+
+    def _preparar_funcionarios(self, disponibilidade):
+        n = len(self.funcionarios)
+        self.ausente = [[False] * (self.num_dias + 2) for _ in range(n)]
+        for i, func in enumerate(self.funcionarios):
+            for d in disponibilidade.dias_de_ferias(func.id):
+                self.ausente[i][d] = True
+
+        self.meta = []
+        self.permitidos = []  # por funcionário: período -> turnos que pode receber
+        self.preferidos = []
+        dias_uteis_feriado = [d for d in self.feriados if date(self.ano, self.mes, d).weekday() < 5]
+        for i, func in enumerate(self.funcionarios):
+            disponiveis = sum(1 for d in range(1, self.num_dias + 1) if not self.ausente[i][d])
+            feriados_disponiveis = sum(1 for d in dias_uteis_feriado if not self.ausente[i][d])
+            self.meta.append(meta_horas(func.ch_semanal, disponiveis, feriados_disponiveis))
+
+            siglas = _siglas_preferidas(func.preferencias_turno)
+            preferidos = {t for t, turno in enumerate(self.turnos) if turno.sigla.upper() in siglas}
+            self.preferidos.append(preferidos)
+            por_periodo = []
+            for p in range(len(PERIODOS)):
+                do_periodo = [t for t in range(len(self.turnos)) if self.periodo_turno[t] == p]
+                escolhidos = [t for t in do_periodo if t in preferidos] or do_periodo
+                por_periodo.append(escolhidos)
+            self.permitidos.append(por_periodo)
+
+    # Estado
+
+    def _iniciar_estado(self):
+        n = len(self.funcionarios)
+        # dias 0 e num_dias + 1 são sentinelas para simplificar vizinhança
+        self.grade = [array("h", [VAZIO]) * (self.num_dias + 2) for _ in range(n)]
+        self.horas = [0.0] * n
+        self.cobertura = [[0] * len(PERIODOS) for _ in range(self.num_dias + 2)]
+
+    def _aplicar(self, i, d, t):
+        antigo = self.grade[i][d]
+        if antigo != VAZIO:
+            self.horas[i] -= self.horas_turno[antigo]
+            self.cobertura[d][self.periodo_turno[antigo]] -= 1
+        if t != VAZIO:
+            self.horas[i] += self.horas_turno[t]
+            self.cobertura[d][self.periodo_turno[t]] += 1
+        self.grade[i][d] = t
+
+    def _noturno(self, t):
+        return t != VAZIO and self.periodo_turno[t] == PERIODOS.index("noturno")
+
+    def _pode(self, i, d, t):
+        """
+        Regras obrigatórias para colocar o turno t no dia d do funcionário i.
+        """
+        if t == VAZIO:
+            return True
+        if self.ausente[i][d]:
+            return False
+        if self._noturno(self.grade[i][d - 1]):
+            return False
+        if self._noturno(t) and self.grade[i][d + 1] != VAZIO:
+            return False
+        return True
+
+    # Custo
+
+    def _custo_horas(self, i, horas):
+        return PESO_HORAS * max(0.0, abs(horas - self.meta[i]) - TOLERANCIA_HORAS)
+
+    def _custo_preferencia(self, i, t):
+        if t == VAZIO or not self.preferidos[i]:
+            return 0
+        return 0 if t in self.preferidos[i] else PESO_PREFERENCIA
+
+    def _custo_total(self):
+        custo = 0.0
+        for d in range(1, self.num_dias + 1):
+            for p, minimo in enumerate(self.minimos):
+                custo += PESO_COBERTURA * max(0, minimo - self.cobertura[d][p])
+        for i in range(len(self.funcionarios)):
+            custo += self._custo_horas(i, self.horas[i])
+            custo += sum(self._custo_preferencia(i, t) for t in self.grade[i][1:self.num_dias + 1])
+        return custo
+
+    def _delta_celula(self, i, d, t):
+        antigo = self.grade[i][d]
+        delta = 0.0
+        if antigo != VAZIO:
+            p = self.periodo_turno[antigo]
+            if self.cobertura[d][p] <= self.minimos[p]:
+                delta += PESO_COBERTURA
+        if t != VAZIO:
+            p = self.periodo_turno[t]
+            if self.cobertura[d][p] - (1 if antigo != VAZIO and self.periodo_turno[antigo] == p else 0) < self.minimos[p]:
+                delta -= PESO_COBERTURA
+        horas = self.horas[i] - (self.horas_turno[antigo] if antigo != VAZIO else 0) + (self.horas_turno[t] if t != VAZIO else 0)
+        delta += self._custo_horas(i, horas) - self._custo_horas(i, self.horas[i])
+        delta += self._custo_preferencia(i, t) - self._custo_preferencia(i, antigo)
+        return delta
+
+    # Etapas
+
+    def _semente(self):
+        n = len(self.funcionarios)
+        for d in range(1, self.num_dias + 1):
+            # primeiro o período com mais falta
+            for p in sorted(range(len(PERIODOS)), key=lambda p: self.cobertura[d][p] - self.minimos[p]):
+                falta = self.minimos[p] - self.cobertura[d][p]
+                if falta <= 0:
+                    continue
+                candidatos = [
+                    i for i in range(n)
+                    if self.grade[i][d] == VAZIO and self.permitidos[i][p]
+                    and self._pode(i, d, self.permitidos[i][p][0])
+                ]
+                candidatos.sort(key=lambda i: (
+                    not (self.preferidos[i] & set(self.permitidos[i][p])),
+                    self.horas[i] - self.meta[i],
+                    self.rng.random(),
+                ))
+                for i in candidatos[:falta]:
+                    self._aplicar(i, d, self.permitidos[i][p][0])
+
+        # completa a carga horária de quem ficou abaixo da meta
+        for i in sorted(range(n), key=lambda i: self.horas[i] - self.meta[i]):
+            progresso = True
+            while progresso and self.horas[i] < self.meta[i] - TOLERANCIA_HORAS:
+                progresso = False
+                dias = sorted(range(1, self.num_dias + 1), key=lambda d: (sum(self.cobertura[d]), self.rng.random()))
+                for d in dias:
+                    if self.grade[i][d] != VAZIO:
+                        continue
+                    opcoes = [
+                        t for p in sorted(range(len(PERIODOS)), key=lambda p: self.cobertura[d][p] - self.minimos[p])
+                        for t in self.permitidos[i][p]
+                        if self.horas[i] + self.horas_turno[t] <= self.meta[i] + TOLERANCIA_HORAS and self._pode(i, d, t)
+                    ]
+                    if opcoes:
+                        self._aplicar(i, d, opcoes[0])
+                        progresso = True
+                        break
+
+    def _busca_local(self, prazo):
+        n = len(self.funcionarios)
+        if n == 0 or not self.turnos:
+            return 0
+        iteracoes = 0
+        custo = self._custo_total()
+        opcoes_celula = [VAZIO] + list(range(len(self.turnos)))
+        while custo > 1e-6 and time.monotonic() < prazo:
+            iteracoes += 1
+            i = self.rng.randrange(n)
+            d = self.rng.randint(1, self.num_dias)
+            if self.rng.random() < 0.5:
+                # muda o turno de uma célula
+                t = self.rng.choice(opcoes_celula)
+                if t == self.grade[i][d] or not self._pode(i, d, t):
+                    continue
+                delta = self._delta_celula(i, d, t)
+                if delta <= 0:
+                    self._aplicar(i, d, t)
+                    custo += delta
+            else:
+                # troca o dia entre dois funcionários: a cobertura não muda
+                j = self.rng.randrange(n)
+                ti, tj = self.grade[i][d], self.grade[j][d]
+                if i == j or ti == tj:
+                    continue
+                if not (self._pode(i, d, tj) and self._pode(j, d, ti)):
+                    continue
+                antes = (self._custo_horas(i, self.horas[i]) + self._custo_horas(j, self.horas[j])
+                         + self._custo_preferencia(i, ti) + self._custo_preferencia(j, tj))
+                hi = self.horas[i] - (self.horas_turno[ti] if ti != VAZIO else 0) + (self.horas_turno[tj] if tj != VAZIO else 0)
+                hj = self.horas[j] - (self.horas_turno[tj] if tj != VAZIO else 0) + (self.horas_turno[ti] if ti != VAZIO else 0)
+                depois = (self._custo_horas(i, hi) + self._custo_horas(j, hj)
+                          + self._custo_preferencia(i, tj) + self._custo_preferencia(j, ti))
+                if depois <= antes:
+                    custo += depois - antes
+                    self._aplicar(i, d, VAZIO)
+                    self._aplicar(j, d, ti)
+                    self._aplicar(i, d, tj)
+        return iteracoes
+
+    def _pendencias(self):
+        pendencias = []
+        for d in range(1, self.num_dias + 1):
+            for p, periodo in enumerate(PERIODOS):
+                falta = self.minimos[p] - self.cobertura[d][p]
+                if falta > 0:
+                    pendencias.append({
+                        "tipo": "cobertura", "dia": d, "periodo": periodo, "faltam": falta,
+                        "descricao": f"Dia {d}: faltam {falta} profissional(is) no período {periodo}",
+                    })
+        for i, func in enumerate(self.funcionarios):
+            if abs(self.horas[i] - self.meta[i]) > TOLERANCIA_HORAS:
+                pendencias.append({
+                    "tipo": "carga_horaria", "funcionario": func.id, "horas": self.horas[i], "meta": round(self.meta[i], 1),
+                    "descricao": f"{func.nome_completo}: {self.horas[i]:g}h de {self.meta[i]:.0f}h previstas",
+                })
+        return pendencias
+
+    def matriz(self):
+        """
+        Estado atual como MatrizMes; dias de férias recebem o turno FE, se existir.
+        """
+        matriz = MatrizMes(self.num_dias)
+        indices = [matriz.indice_turno(t.id, t.sigla, t.horas, t.periodo) for t in self.turnos]
+        ferias = VAZIO_MATRIZ
+        if self.turno_ferias:
+            t = self.turno_ferias
+            ferias = matriz.indice_turno(t.id, t.sigla, t.horas, t.periodo)
+        for i, func in enumerate(self.funcionarios):
+            linha = matriz.adicionar_linha(func.id, func)
+            for d in range(1, self.num_dias + 1):
+                t = self.grade[i][d]
+                if t != VAZIO:
+                    matriz.definir(linha, d, indices[t])
+                elif self.ausente[i][d]:
+                    matriz.definir(linha, d, ferias)
+        return matriz
+
+    def gerar(self):
+        """
+        Retorna {"celulas": {(funcionario_id, dia): turno_id ou None}, "matriz": MatrizMes,
+        "pendencias": [...], "custo": float, "iteracoes": int, "segundos": float}.
+        """
+        inicio = time.monotonic()
+        self._iniciar_estado()
+        self._semente()
+        iteracoes = self._busca_local(inicio + self.tempo_limite)
+
+        matriz = self.matriz()
+        return {
+            "celulas": matriz.para_celulas(),
+            "matriz": matriz,
+            "pendencias": self._pendencias(),
+            "custo": self._custo_total(),
+            "iteracoes": iteracoes,
+            "segundos": time.monotonic() - inicio,
+        }
+
+
+def gerar_e_salvar(escala, cobertura_minima=None, cargo=None, tempo_limite=2.0, semente=None):
+    """
+    Gera a escala e grava o resultado de uma vez (salvar_grade).
+    Sobrescreve as células dos funcionários considerados.
+    """
+    gerador = GeradorEscala(
+        escala.unidade_id, escala.mes, escala.ano,
+        cobertura_minima=cobertura_minima, cargo=cargo, tempo_limite=tempo_limite, semente=semente,
+    )
+    resultado = gerador.gerar()
+    resultado["gravacao"] = salvar_grade(escala, resultado["celulas"], origem="gerador")
+    return resultado
@@ -0,0 +1,83 @@
+from django.utils.functional import SimpleLazyObject
+
+from core.models import AtribuicaoEscala, Escala
+
+from .cache import TEMPO_CACHE, em_cache, versao_escala
+from .calendario import dias_no_mes, mes_calendario
+from .carga_horaria import horas_mensais
+from .matriz import MatrizMes
+from .totais import totais_vazios
+
+
+def escala_do_mes(unidade_id, mes, ano):
+    """
+    Escala da unidade no mês (ou None), com a unidade na mesma consulta para o cabeçalho.
+    """
+    if not unidade_id:
+        return None
+    return Escala.objects.select_related("unidade").filter(unidade_id=unidade_id, mes=mes, ano=ano).first()
+
+
+def montar_grade(escala):
+    """
+    Monta a matriz funcionário x dia da escala e os totais por período.
+    Retorna {"funcionarios": [LinhaMatriz(funcionario, dias_list, total_horas), ...], "totals": {...}, "matriz"}.
+    O total_horas vem do resumo de C.H. (CargaHorariaMensal); quem ainda não tem
+    resumo fica com a soma dos turnos da linha.
+    """
+    num_days = dias_no_mes(escala.ano, escala.mes)
+    matriz = MatrizMes.da_escala(escala, num_days)
+    for func_id, horas in horas_mensais(escala).items():
+        linha = matriz.linha(func_id)
+        if linha is not None:
+            linha.total_horas = horas
+    return {
+        "funcionarios": matriz.linhas,
+        "totals": matriz.totais(),
+        "matriz": matriz,
+    }
+
+
+def grade_da_escala(escala, num_days):
+    """
+    Grade da escala vinda do cache (ou montada e guardada). Sem escala, grade vazia.
+    """
+    if escala is None or escala.pk is None:
+        return {"funcionarios": [], "totals": totais_vazios(num_days), "matriz": MatrizMes(num_days)}
+    return em_cache("grade", escala, lambda: montar_grade(escala))
+
+
+def contexto_grade(escala, unidade_id, mes, ano):
+    """
+    Contexto de escalas/_grade_escala.html. O corpo da tabela fica em cache de
+    fragmento pela versão da escala; funcionários e totais são preguiçosos e só
+    são lidos se o fragmento precisar ser renderizado de novo.
+    """
+    if escala is None:
+        escala = Escala(unidade_id=unidade_id, mes=mes, ano=ano)
+    calendario_mes = mes_calendario(ano, mes)
+    grade = SimpleLazyObject(lambda: grade_da_escala(escala, calendario_mes.num_dias))
+    return {
+        "dias_cabecalho": calendario_mes.dias,
+        "chave_grade": f"{unidade_id}:{mes}:{ano}:{escala.id or 0}:{versao_escala(escala)}",
+        "tempo_grade": TEMPO_CACHE,
+        "funcionarios": SimpleLazyObject(lambda: grade["funcionarios"]),
+        "totals": SimpleLazyObject(lambda: grade["totals"]),
+    }
+
+
+def montar_cobertura(escala):
+    """
+    Nomes dos profissionais escalados em cada dia: {dia: [nome, ...]}.
+    """
+    cobertura = {}
+    atribuicoes = AtribuicaoEscala.objects.filter(escala=escala).order_by("dia", "funcionario__nome_completo")
+    for dia, nome in atribuicoes.values_list("dia", "funcionario__nome_completo"):
+        cobertura.setdefault(dia, []).append(nome)
+    return cobertura
+
+
+def cobertura_da_escala(escala):
+    if escala is None or escala.pk is None:
+        return {}
+    return em_cache("cobertura", escala, lambda: montar_cobertura(escala))
@@ -0,0 +1,120 @@
+from django.db import transaction
+
+from core.models import AtribuicaoEscala, Turno
+
+from .cache import invalidar_escala
+from .carga_horaria import atualizar_funcionarios
+from .eventos import publicar_alteracoes
+from .versoes import registrar_versao
+
+
+def mapa_turnos(chave="sigla"):
+    """
+    Resolve todos os turnos numa única consulta.
+    Uso: mapa_turnos() -> {'M6': 1, 'T6': 2, ...}; mapa_turnos("id") -> {'1': 1, ...}
+    """
+    return {str(valor): turno_id for turno_id, valor in Turno.objects.values_list("id", chave)}
+
+
+def turnos_da_celula(valor):
+    """
+    Turnos de uma célula como lista sem repetição, na ordem dada: aceita um
+    turno_id, None (célula vazia) ou uma sequência de ids (mais de um turno no dia).
+    """
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return list(dict.fromkeys(t for t in valor if t))
+    return [valor] if valor else []
+
+
+def salvar_grade(escala, celulas, autor="", origem="edicao"):
+    """
+    Grava as células de uma escala comparando com o que já está no banco.
+
+    `celulas` é um dict {(funcionario_id, dia): turnos}, com turnos no formato de
+    turnos_da_celula. O valor é o conjunto completo de turnos da célula: só as
+    células presentes no dict são tocadas, e nelas só o que difere do banco muda
+    (um turno que sai e outro que entra reaproveitam o registro; registros repetidos
+    do mesmo turno são descartados). Tudo numa transação, com
+    bulk_create/bulk_update e um único delete. A C.H. mensal dos funcionários
+    afetados é atualizada na mesma transação, e o que mudou vira uma versão da
+    escala (ver escalas.versoes) em nome de `autor`; depois do commit as páginas
+    abertas recebem as células e os totais dos dias (ver escalas.eventos).
+    """
+    resultado = {"criadas": 0, "atualizadas": 0, "removidas": 0, "funcionarios": set(), "dias": set(), "horas": {}}
+    if not celulas:
+        return resultado
+
+    funcionario_ids = {func_id for func_id, _ in celulas}
+    dias = {dia for _, dia in celulas}
+
+    with transaction.atomic():
+        existentes = (
+            AtribuicaoEscala.objects.select_for_update()
+            .filter(escala=escala, funcionario_id__in=funcionario_ids, dia__in=dias)
+            .only("id", "funcionario_id", "dia", "tipo_turno_id")
+            .order_by("id")
+        )
+
+        atuais = {}
+        for atrib in existentes:
+            chave = (atrib.funcionario_id, atrib.dia)
+            if chave in celulas:
+                atuais.setdefault(chave, []).append(atrib)
+
+        criar = []
+        atualizar = []
+        remover = []
+        adicionadas, removidas = set(), set()  # (funcionario_id, dia, turno_id) para o histórico
+        finais = {}
+        for chave, valor in celulas.items():
+            desejados = turnos_da_celula(valor)
+            mantidos = set()
+            sobrando = []
+            for atrib in atuais.get(chave, ()):
+                if atrib.tipo_turno_id in desejados and atrib.tipo_turno_id not in mantidos:
+                    mantidos.add(atrib.tipo_turno_id)
+                else:
+                    sobrando.append(atrib)
+            faltando = [t for t in desejados if t not in mantidos]
+            if not sobrando and not faltando:
+                continue
+
+            for atrib in sobrando:
+                # repetido de um turno que fica: some sem entrar no histórico
+                if atrib.tipo_turno_id not in mantidos:
+                    removidas.add((*chave, atrib.tipo_turno_id))
+                if faltando:
+                    atrib.tipo_turno_id = faltando.pop(0)
+                    adicionadas.add((*chave, atrib.tipo_turno_id))
+                    atualizar.append(atrib)
+                else:
+                    remover.append(atrib.id)
+            for turno_id in faltando:
+                criar.append(AtribuicaoEscala(
+                    escala=escala, funcionario_id=chave[0], dia=chave[1], tipo_turno_id=turno_id
+                ))
+                adicionadas.add((*chave, turno_id))
+            finais[chave] = desejados
+            resultado["funcionarios"].add(chave[0])
+            resultado["dias"].add(chave[1])
+
+        if remover:
+            AtribuicaoEscala.objects.filter(id__in=remover).delete()
+        if atualizar:
+            AtribuicaoEscala.objects.bulk_update(atualizar, ["tipo_turno"])
+        if criar:
+            AtribuicaoEscala.objects.bulk_create(criar)
+
+        resultado["horas"] = atualizar_funcionarios(escala, resultado["funcionarios"])
+
+        # bulk_create/bulk_update não disparam sinais: invalida a grade explicitamente
+        if resultado["funcionarios"]:
+            invalidar_escala(escala.id)
+            registrar_versao(escala, adicionadas, removidas, autor=autor, origem=origem)
+            alteradas = {(f, d) for f, d, _ in adicionadas | removidas}
+            publicar_alteracoes(escala, {chave: finais[chave] for chave in alteradas}, resultado["horas"])
+
+    resultado["criadas"] = len(criar)
+    resultado["atualizadas"] = len(atualizar)
+    resultado["removidas"] = len(remover)
+    return resultado
@@ -0,0 +1,116 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.db import connections, transaction
+
+from core.models import Escala, Turno, Unidade
+
+from .calendario import feriados_entre, ultimo_dia
+
+def carregar_referencia(mes, ano):
+    """
+    Dados de referência comuns a todas as unidades do mês (turnos e feriados), lidos
+    uma vez por chamada de processar_unidades e repassados a cada unidade.
+    """
+    return {
+        "turnos": list(Turno.objects.all().order_by("sigla")),
+        "feriados": feriados_entre(date(ano, mes, 1), ultimo_dia(ano, mes)),
+    }
+
+
+def _iniciar_processo():
+    # necessário quando o pool usa "spawn"; com "fork" não faz nada
+    import django
+    django.setup()
+
+
+def processar_unidade(unidade_id, mes, ano, recalcular=False, cobertura_minima=None, tempo_limite=2.0,
+                      referencia=None):
+    """
+    Gera (ou só recalcula a C.H.) a escala de uma unidade numa transação própria.
+    `referencia` (de carregar_referencia) evita reler turnos e feriados a cada unidade.
+    """
+    from .carga_horaria import recalcular_escala
+    from .gerador import GeradorEscala
+    from .gravacao import salvar_grade
+
+    inicio = time.monotonic()
+    resultado = {"unidade_id": unidade_id, "pendencias": 0, "erro": ""}
+    try:
+        if recalcular:
+            with transaction.atomic():
+                escala = Escala.objects.filter(unidade_id=unidade_id, mes=mes, ano=ano).first()
+                if escala:
+                    recalcular_escala(escala)
+            resultado["escala_id"] = escala.id if escala else None
+        else:
+            # a busca roda fora da transação; só a gravação segura o banco
+            referencia = referencia or carregar_referencia(mes, ano)
+            gerado = GeradorEscala(
+                unidade_id, mes, ano, cobertura_minima=cobertura_minima, tempo_limite=tempo_limite,
+                turnos=referencia["turnos"], feriados=referencia["feriados"],
+            ).gerar()
+            with transaction.atomic():
+                escala, _ = Escala.objects.get_or_create(unidade_id=unidade_id, mes=mes, ano=ano)
+                salvar_grade(escala, gerado["celulas"], origem="gerador")
+            resultado["escala_id"] = escala.id
+            resultado["pendencias"] = len(gerado["pendencias"])
+    except Exception as exc:
+        resultado["erro"] = f"{type(exc).__name__}: {exc}"
+    resultado["segundos"] = time.monotonic() - inicio
+    return resultado
+
+
+def processar_unidades(mes, ano, unidade_ids=None, processos=None, recalcular=False,
+                       cobertura_minima=None, tempo_limite=2.0, ao_concluir=None):
+    """
+    Processa as escalas do mês de várias unidades (todas, se `unidade_ids` for None)
+    num pool de processos (em série no SQLite). `ao_concluir(resultado, feitas, total)` é chamado a cada unidade.
+    A falha de uma unidade (inclusive a queda do processo que a tratava) vai no "erro"
+    do resultado dela e não interrompe as outras.
+    Retorna {"resultados": [...], "segundos": tempo total, "segundos_somados": soma por unidade}.
+    """
+    if unidade_ids is None:
+        unidade_ids = list(Unidade.objects.order_by("id").values_list("id", flat=True))
+    inicio = time.monotonic()
+    parametros = dict(recalcular=recalcular, cobertura_minima=cobertura_minima, tempo_limite=tempo_limite)
+    if not recalcular:
+        parametros["referencia"] = carregar_referencia(mes, ano)
+    resultados = []
+
+    def concluir(resultado):
+        resultados.append(resultado)
+        if ao_concluir:
+            ao_concluir(resultado, len(resultados), len(unidade_ids))
+
+    # SQLite só aceita um escritor por vez: em paralelo as gravações falham com "database is locked"
+    em_serie = processos == 1 or len(unidade_ids) <= 1 or connections["default"].vendor == "sqlite"
+    if em_serie:
+        for unidade_id in unidade_ids:
+            concluir(processar_unidade(unidade_id, mes, ano, **parametros))
+    else:
+        # os filhos não podem herdar conexões abertas: cada um abre a sua
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as pool:
+            futuros = {
+                pool.submit(processar_unidade, unidade_id, mes, ano, **parametros): unidade_id
+                for unidade_id in unidade_ids
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    resultado = futuro.result()
+                except Exception as exc:
+                    # processar_unidade já trata os erros da unidade: aqui é o processo que caiu
+                    # ou o resultado que não voltou
+                    resultado = {
+                        "unidade_id": futuros[futuro], "pendencias": 0,
+                        "erro": f"{type(exc).__name__}: {exc}", "segundos": 0.0,
+                    }
+                concluir(resultado)
+
+    return {
+        "resultados": sorted(resultados, key=lambda r: r["unidade_id"]),
+        "segundos": time.monotonic() - inicio,
+        "segundos_somados": sum(r["segundos"] for r in resultados),
+    }
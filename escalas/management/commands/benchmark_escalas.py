@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from escalas.benchmark import TAMANHOS, comparar, executar
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede tempo e consultas das telas e APIs de escala com dados gerados em vários tamanhos, "
+        "num banco de teste descartável. Use ESCALAS_BANCO=sqlite para rodar sem Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos', default='pequeno,medio',
+            help=f"Conjuntos de dados, separados por vírgula ({', '.join(TAMANHOS)}).",
+        )
+        parser.add_argument('--repeticoes', type=int, default=5, help="Requisições medidas por caso.")
+        parser.add_argument('--saida', default='benchmark.json', help="Arquivo JSON com os resultados.")
+        parser.add_argument('--base', help="JSON de uma execução anterior para comparar.")
+        parser.add_argument(
+            '--limite', type=float, default=0.25,
+            help="Fração acima da mediana da base que conta como regressão (0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        tamanhos = [t.strip() for t in options['tamanhos'].split(',') if t.strip()]
+        desconhecidos = set(tamanhos) - set(TAMANHOS)
+        if desconhecidos:
+            raise CommandError(f"Tamanho(s) desconhecido(s): {', '.join(sorted(desconhecidos))}")
+        base = None
+        if options['base']:
+            with open(options['base'], encoding='utf-8') as arquivo:
+                base = json.load(arquivo)
+
+        def ao_medir(tamanho, nome, resultado):
+            linha = (
+                f"[{tamanho}] {nome:<24} {resultado['mediana_ms']:>9.1f}ms  "
+                f"{resultado['consultas']:>4} consulta(s)  HTTP {resultado['status']}"
+            )
+            self.stdout.write(self.style.WARNING(linha) if resultado['status'] >= 400 else linha)
+
+        # executar cria e destrói o banco de teste: os dados gerados nunca tocam o banco real
+        self.stdout.write(f"Banco: {connection.vendor}")
+        resultados = executar(tamanhos, options['repeticoes'], ao_medir)
+
+        with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados em {options['saida']}"))
+
+        if base is not None:
+            regressoes = comparar(resultados, base, options['limite'])
+            for regressao in regressoes:
+                self.stdout.write(self.style.ERROR(
+                    f"Regressão [{regressao['tamanho']}] {regressao['caso']}: {regressao['motivo']}"
+                ))
+            if regressoes:
+                raise CommandError(f"{len(regressoes)} regressão(ões) em relação a {options['base']}.")
+            self.stdout.write(self.style.SUCCESS("Sem regressões em relação à base."))
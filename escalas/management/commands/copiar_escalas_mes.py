@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from escalas.copia import CICLO_PADRAO, MODOS, SEMANA, copiar_mes
+
+
+class Command(BaseCommand):
+    help = "Abre as escalas do mês copiando as do mês anterior (todas as unidades numa transação)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('mes', type=int)
+        parser.add_argument('ano', type=int)
+        parser.add_argument('--unidades', help="IDs separados por vírgula (padrão: todas).")
+        parser.add_argument('--modo', choices=MODOS, default=SEMANA,
+                            help="semana: mesmo dia da semana; ciclo: continua o rodízio.")
+        parser.add_argument('--ciclo', type=int, default=CICLO_PADRAO, help="Dias do rodízio no modo ciclo.")
+        parser.add_argument('--substituir', action='store_true', help="Refaz escalas de destino já preenchidas.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['mes'] <= 12:
+            raise CommandError("Mês inválido")
+        unidade_ids = None
+        if options['unidades']:
+            try:
+                unidade_ids = [int(u) for u in options['unidades'].split(',') if u.strip()]
+            except ValueError:
+                raise CommandError("--unidades deve ser uma lista de IDs separados por vírgula")
+
+        inicio = time.monotonic()
+        try:
+            resultado = copiar_mes(
+                options['mes'], options['ano'], unidade_ids=unidade_ids, modo=options['modo'],
+                ciclo=options['ciclo'], substituir=options['substituir'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if resultado['sem_origem']:
+            self.stdout.write(self.style.WARNING(
+                f"Sem escala no mês anterior: {', '.join(map(str, resultado['sem_origem']))}"
+            ))
+        if resultado['preenchidas']:
+            self.stdout.write(self.style.WARNING(
+                f"Já preenchidas (use --substituir): {', '.join(map(str, resultado['preenchidas']))}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultado['escalas'])} escala(s), {resultado['criadas']} célula(s) em "
+            f"{time.monotonic() - inicio:.1f}s ({resultado['puladas_ferias']} em férias)."
+        ))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from escalas.lote import processar_unidades
+
+
+class Command(BaseCommand):
+    help = "Gera (ou recalcula) as escalas do mês de todas as unidades em paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('mes', type=int)
+        parser.add_argument('ano', type=int)
+        parser.add_argument('--unidades', help="IDs separados por vírgula (padrão: todas).")
+        parser.add_argument('--processos', type=int, default=None, help="Tamanho do pool (padrão: nº de CPUs).")
+        parser.add_argument('--recalcular', action='store_true', help="Só recalcula a C.H. das escalas existentes.")
+        parser.add_argument('--tempo-limite', type=float, default=2.0, help="Segundos de busca por unidade.")
+        parser.add_argument('--min-matutino', type=int)
+        parser.add_argument('--min-vespertino', type=int)
+        parser.add_argument('--min-noturno', type=int)
+
+    def handle(self, *args, **options):
+        if not 1 <= options['mes'] <= 12:
+            raise CommandError("Mês inválido")
+        unidade_ids = None
+        if options['unidades']:
+            try:
+                unidade_ids = [int(u) for u in options['unidades'].split(',') if u.strip()]
+            except ValueError:
+                raise CommandError("--unidades deve ser uma lista de IDs separados por vírgula")
+
+        cobertura_minima = {
+            periodo: options[f'min_{periodo}']
+            for periodo in ('matutino', 'vespertino', 'noturno')
+            if options[f'min_{periodo}'] is not None
+        }
+
+        def ao_concluir(resultado, feitas, total):
+            if resultado['erro']:
+                self.stdout.write(self.style.ERROR(
+                    f"[{feitas}/{total}] Unidade {resultado['unidade_id']}: {resultado['erro']}"
+                ))
+            else:
+                self.stdout.write(
+                    f"[{feitas}/{total}] Unidade {resultado['unidade_id']}: {resultado['segundos']:.1f}s, "
+                    f"{resultado['pendencias']} pendência(s)"
+                )
+
+        relatorio = processar_unidades(
+            options['mes'], options['ano'], unidade_ids=unidade_ids, processos=options['processos'],
+            recalcular=options['recalcular'], cobertura_minima=cobertura_minima,
+            tempo_limite=options['tempo_limite'], ao_concluir=ao_concluir,
+        )
+
+        resultados = relatorio['resultados']
+        erros = sum(1 for r in resultados if r['erro'])
+        ganho = relatorio['segundos_somados'] / relatorio['segundos'] if relatorio['segundos'] else 0
+        estilo = self.style.ERROR if erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{len(resultados)} unidade(s) em {relatorio['segundos']:.1f}s "
+            f"(soma por unidade {relatorio['segundos_somados']:.1f}s, ganho {ganho:.1f}x), {erros} com erro."
+        ))
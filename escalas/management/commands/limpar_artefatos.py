@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from escalas.artefatos import limpar_artefatos
+
+
+class Command(BaseCommand):
+    help = "Remove do disco os arquivos gerados (PDFs das escalas) que não são usados há algum tempo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help="Remove arquivos sem acesso há mais de N dias.")
+
+    def handle(self, *args, **options):
+        removidos = limpar_artefatos(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f"{removidos} arquivo(s) removido(s)."))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from escalas.tarefas import executar, liberar_presas, nome_trabalhador, pegar_proxima
+
+
+class Command(BaseCommand):
+    help = "Executa as tarefas da fila (geração de escalas, recálculo de C.H., geração do mês em lote, exportações em XLSX)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help="Processa o que estiver na fila e sai.")
+        parser.add_argument('--intervalo', type=float, default=2.0, help="Segundos entre consultas à fila vazia.")
+        parser.add_argument('--max-tarefas', type=int, default=0, help="Sai depois de N tarefas (0 = sem limite).")
+        parser.add_argument(
+            '--liberar-apos', type=int, default=30,
+            help="Minutos sem progresso para considerar uma tarefa 'executando' abandonada e devolvê-la à fila.",
+        )
+
+    def handle(self, *args, **options):
+        trabalhador = nome_trabalhador()
+        processadas = 0
+        self.stdout.write(f"Trabalhador {trabalhador} aguardando tarefas...")
+
+        while True:
+            close_old_connections()
+            liberadas = liberar_presas(options['liberar_apos'])
+            if liberadas:
+                self.stdout.write(self.style.WARNING(f"{liberadas} tarefa(s) abandonada(s) devolvida(s) à fila"))
+
+            tarefa = pegar_proxima(trabalhador)
+            if tarefa is None:
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.monotonic()
+            executar(tarefa)
+            processadas += 1
+            estilo = self.style.SUCCESS if tarefa.status == tarefa.CONCLUIDA else self.style.ERROR
+            self.stdout.write(estilo(f"{tarefa} em {time.monotonic() - inicio:.1f}s"))
+
+            if options['max_tarefas'] and processadas >= options['max_tarefas']:
+                break
+
+        self.stdout.write(f"{processadas} tarefa(s) processada(s).")
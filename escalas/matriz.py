@@ -0,0 +1,210 @@
+from array import array
+
+from core.models import AtribuicaoEscala
+
+from .totais import PERIODOS, totais_vazios
+
+# Índice 0 da tabela de turnos: célula sem atribuição
+VAZIO = 0
+
+# Entre as siglas de uma célula com mais de um turno no dia (ex.: "M6/T6")
+SEPARADOR_SIGLAS = "/"
+
+
+class TurnoInfo:
+    # Só o que a grade, os totais e as exportações leem de um Turno
+    __slots__ = ("id", "sigla", "horas", "periodo")
+
+    def __init__(self, id, sigla, horas, periodo):
+        self.id = id
+        self.sigla = sigla
+        self.horas = horas or 0
+        periodo = (periodo or "").strip().lower()
+        self.periodo = PERIODOS.index(periodo) if periodo in PERIODOS else None
+
+
+class LinhaMatriz:
+    """
+    Um funcionário da matriz. `funcionario` é o que foi passado a adicionar_linha
+    (objeto Funcionario nas telas, tupla de valores nas exportações).
+    """
+    __slots__ = ("matriz", "indice", "funcionario", "funcionario_id", "total_horas")
+
+    def __init__(self, matriz, indice, funcionario_id, funcionario):
+        self.matriz = matriz
+        self.indice = indice
+        self.funcionario_id = funcionario_id
+        self.funcionario = funcionario
+        self.total_horas = 0
+
+    @property
+    def dias_list(self):
+        # siglas dia a dia ("" nos dias vazios), como as templates esperam
+        return self.matriz.siglas(self.indice)
+
+    @property
+    def turnos_dias(self):
+        return self.matriz.turno_ids(self.indice)
+
+    @property
+    def celulas_dias(self):
+        # (primeiro turno_id, [ids dos demais turnos]) dia a dia, para o formulário
+        matriz = self.matriz
+        return [
+            (turno_id, [matriz.turnos[t].id for t in matriz.extras_da_celula(self, dia)])
+            for dia, turno_id in enumerate(self.turnos_dias, start=1)
+        ]
+
+
+class MatrizMes:
+    """
+    Escala do mês como matriz densa funcionário x dia. Cada célula guarda o índice
+    (pequeno) do turno em `turnos`, a tabela lateral com os dados de cada Turno.
+    Um segundo turno no mesmo dia (duas atribuições na célula) vai para `extras`,
+    {posição: [índice, ...]}, e conta nas horas da linha, nos totais e nas siglas.
+    Uso:
+        matriz = MatrizMes.da_escala(escala)
+        for linha in matriz.linhas: linha.funcionario, linha.dias_list
+        matriz.totais() -> {"matutino": [...], ...}
+    """
+    __slots__ = ("num_dias", "turnos", "linhas", "celulas", "extras", "_indice_turno", "_indice_linha")
+
+    def __init__(self, num_dias):
+        self.num_dias = num_dias
+        self.turnos = [None]
+        self.linhas = []
+        self.celulas = array("H")
+        self.extras = {}
+        self._indice_turno = {}
+        self._indice_linha = {}
+
+    # Construção
+
+    def indice_turno(self, turno_id, sigla="", horas=0, periodo=""):
+        indice = self._indice_turno.get(turno_id)
+        if indice is None:
+            indice = self._indice_turno[turno_id] = len(self.turnos)
+            self.turnos.append(TurnoInfo(turno_id, sigla, horas, periodo))
+        return indice
+
+    def adicionar_linha(self, funcionario_id, funcionario=None):
+        linha = self._indice_linha.get(funcionario_id)
+        if linha is None:
+            linha = LinhaMatriz(self, len(self.linhas), funcionario_id, funcionario)
+            self._indice_linha[funcionario_id] = linha
+            self.linhas.append(linha)
+            self.celulas.extend(array("H", bytes(2 * self.num_dias)))
+        return linha
+
+    def definir(self, linha, dia, turno):
+        """
+        Põe o turno (índice de `turnos`, ou VAZIO) no dia de uma linha, no lugar de tudo
+        o que havia na célula, e ajusta as horas dela.
+        """
+        posicao = linha.indice * self.num_dias + dia - 1
+        antigo = self.celulas[posicao]
+        if antigo:
+            linha.total_horas -= self.turnos[antigo].horas
+        for extra in self.extras.pop(posicao, ()):
+            linha.total_horas -= self.turnos[extra].horas
+        if turno:
+            linha.total_horas += self.turnos[turno].horas
+        self.celulas[posicao] = turno
+
+    def acrescentar(self, linha, dia, turno):
+        """
+        Como definir, mas numa célula já ocupada o turno entra em `extras` em vez de
+        substituir o anterior. É o que se usa ao ler atribuições do banco.
+        """
+        posicao = linha.indice * self.num_dias + dia - 1
+        if not self.celulas[posicao]:
+            self.definir(linha, dia, turno)
+        elif turno:
+            self.extras.setdefault(posicao, []).append(turno)
+            linha.total_horas += self.turnos[turno].horas
+
+    @classmethod
+    def da_escala(cls, escala, num_dias):
+        """
+        Monta a matriz numa passada sobre as atribuições (uma consulta), com os
+        campos de Funcionario usados nas telas.
+        """
+        matriz = cls(num_dias)
+        atribuicoes = (
+            AtribuicaoEscala.objects.filter(escala=escala)
+            .select_related("funcionario", "tipo_turno")
+            .only(
+                "dia", "funcionario__nome_completo", "funcionario__siape", "funcionario__registro_conselho",
+                "funcionario__cargo", "funcionario__vinculo", "funcionario__ch_semanal",
+                "tipo_turno__sigla", "tipo_turno__horas", "tipo_turno__periodo",
+            )
+            .order_by("funcionario__nome_completo", "funcionario_id", "dia")
+        )
+        for atrib in atribuicoes:
+            if not 1 <= atrib.dia <= num_dias:
+                continue
+            turno = atrib.tipo_turno
+            linha = matriz.adicionar_linha(atrib.funcionario_id, atrib.funcionario)
+            matriz.acrescentar(linha, atrib.dia, matriz.indice_turno(turno.id, turno.sigla, turno.horas, turno.periodo))
+        return matriz
+
+    # Leitura
+
+    def linha(self, funcionario_id):
+        return self._indice_linha.get(funcionario_id)
+
+    def _faixa(self, indice):
+        inicio = indice * self.num_dias
+        return self.celulas[inicio:inicio + self.num_dias]
+
+    def extras_da_celula(self, linha, dia):
+        # índices dos turnos além do primeiro no dia ([] na célula comum)
+        return self.extras.get(linha.indice * self.num_dias + dia - 1, [])
+
+    def siglas(self, indice):
+        turnos = self.turnos
+        siglas = [turnos[t].sigla if t else "" for t in self._faixa(indice)]
+        if self.extras:
+            inicio = indice * self.num_dias
+            for dia in range(self.num_dias):
+                extras = self.extras.get(inicio + dia)
+                if extras:
+                    siglas[dia] = SEPARADOR_SIGLAS.join([siglas[dia]] + [turnos[t].sigla for t in extras])
+        return siglas
+
+    def turno_ids(self, indice):
+        # um turno por dia (o primeiro); os demais estão em extras_da_celula
+        turnos = self.turnos
+        return [turnos[t].id if t else None for t in self._faixa(indice)]
+
+    def totais(self):
+        """
+        Profissionais por dia em cada período: {"matutino": [qtd_dia1, ...], ...}.
+        Conta cada atribuição, inclusive as de `extras`, como cobertura_dos_dias.
+        """
+        totals = totais_vazios(self.num_dias)
+        por_periodo = [totals[p] for p in PERIODOS]
+        periodo_turno = [None] + [t.periodo for t in self.turnos[1:]]
+        num_dias = self.num_dias
+        for posicao, t in enumerate(self.celulas):
+            if t:
+                p = periodo_turno[t]
+                if p is not None:
+                    por_periodo[p][posicao % num_dias] += 1
+        for posicao, extras in self.extras.items():
+            for t in extras:
+                p = periodo_turno[t]
+                if p is not None:
+                    por_periodo[p][posicao % num_dias] += 1
+        return totals
+
+    def para_celulas(self):
+        """
+        {(funcionario_id, dia): turno_id ou None}, no formato de salvar_grade; um dia
+        com mais de um turno vai como a lista dos ids.
+        """
+        celulas = {}
+        for linha in self.linhas:
+            for dia, (turno_id, extras) in enumerate(linha.celulas_dias, start=1):
+                celulas[(linha.funcionario_id, dia)] = [turno_id, *extras] if extras else turno_id
+        return celulas
@@ -0,0 +1,20 @@
+from core.models import Unidade
+
+# Parâmetros comuns ao gerador, às regras de validação e às análises
+
+# Mínimo de profissionais por período quando a unidade não informa
+COBERTURA_MINIMA_PADRAO = {"matutino": 2, "vespertino": 2, "noturno": 2}
+
+# Folga (em horas) aceita acima ou abaixo da carga horária do mês
+TOLERANCIA_HORAS = 6
+
+
+def minimos_da_unidade(unidade_id=None, informada=None):
+    """
+    Mínimos por período: os `informada` (ex.: do formulário do gerador), depois os
+    cadastrados na unidade e, para o que faltar, COBERTURA_MINIMA_PADRAO.
+    """
+    da_unidade = {}
+    if unidade_id is not None:
+        da_unidade = Unidade.objects.filter(id=unidade_id).values_list("cobertura_minima", flat=True).first() or {}
+    return {**COBERTURA_MINIMA_PADRAO, **da_unidade, **(informada or {})}
@@ -0,0 +1,138 @@
+import io
+
+from django.utils.html import escape
+
+from .artefatos import chave_artefato, obter_artefato
+from .cache import versao_escala, versao_feriados
+from .calendario import mes_calendario
+from .grade import grade_da_escala
+from .totais import PERIODOS
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:  # PDF é opcional
+    colors = None
+
+# Mudou o desenho da página? Incremente para não servir PDFs antigos do disco
+VERSAO_LAYOUT = 2
+
+COLUNAS_FIXAS = ("NOME COMPLETO", "SIAPE", "CARGO", "VÍNCULO", "C.H.")
+COR_CABECALHO = "#4CAF50"
+COR_TOTAIS = "#ffff99"
+COR_FIM_DE_SEMANA = "#e0e0e0"
+COR_FERIADO = "#f4c7c3"
+
+
+def pdf_disponivel():
+    return colors is not None
+
+
+def _tabela(escala, grade, calendario_mes):
+    dias = calendario_mes.dias
+    num_dias = calendario_mes.num_dias
+    linhas = [
+        list(COLUNAS_FIXAS) + [str(d.numero) for d in dias] + ["TOTAL"],
+        [""] * len(COLUNAS_FIXAS) + [d.sigla for d in dias] + [""],
+    ]
+    for linha in grade["funcionarios"]:
+        func = linha.funcionario
+        linhas.append(
+            [func.nome_completo, func.siape, func.cargo, func.vinculo, f"{func.ch_semanal}h"]
+            + linha.dias_list
+            + [f"{linha.total_horas:g}h"]
+        )
+    inicio_totais = len(linhas)
+    for periodo in PERIODOS:
+        linhas.append([f"TOTAL {periodo.upper()}"] + [""] * (len(COLUNAS_FIXAS) - 1) + grade["totals"][periodo] + [""])
+
+    fixas = len(COLUNAS_FIXAS)
+    estilo = [
+        ("FONT", (0, 0), (-1, -1), "Helvetica", 6),
+        ("FONT", (0, 0), (-1, 1), "Helvetica-Bold", 6),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
+        ("ALIGN", (1, 0), (-1, -1), "CENTER"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("BACKGROUND", (0, 0), (-1, 1), colors.HexColor(COR_CABECALHO)),
+        ("TEXTCOLOR", (0, 0), (-1, 1), colors.white),
+        ("TOPPADDING", (0, 0), (-1, -1), 1),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
+        ("LEFTPADDING", (0, 0), (-1, -1), 1),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 1),
+        ("BACKGROUND", (0, inicio_totais), (-1, -1), colors.HexColor(COR_TOTAIS)),
+        ("FONT", (0, inicio_totais), (-1, -1), "Helvetica-Bold", 6),
+    ]
+    for n in range(inicio_totais, len(linhas)):
+        estilo.append(("SPAN", (0, n), (fixas - 1, n)))
+    for d in dias:
+        if d.feriado or d.fim_de_semana:
+            coluna = fixas + d.numero - 1
+            cor = COR_FERIADO if d.feriado else COR_FIM_DE_SEMANA
+            estilo.append(("BACKGROUND", (coluna, 2), (coluna, inicio_totais - 1), colors.HexColor(cor)))
+
+    largura_util = landscape(A4)[0] - 20 * mm
+    largura_dia = 6.2 * mm
+    larguras_fixas = [58 * mm, 16 * mm, 10 * mm, 14 * mm, 9 * mm]
+    largura_total = largura_util - sum(larguras_fixas) - num_dias * largura_dia
+    tabela = Table(
+        linhas, colWidths=larguras_fixas + [largura_dia] * num_dias + [max(largura_total, 10 * mm)], repeatRows=2
+    )
+    tabela.setStyle(TableStyle(estilo))
+    return tabela
+
+
+def renderizar_pdf(escala):
+    """
+    Escala do mês em A4 paisagem: cabeçalho com unidade e portaria, grade
+    funcionário x dia, totais por período e observações. Retorna os bytes do PDF.
+    """
+    if not pdf_disponivel():
+        raise RuntimeError("Geração de PDF requer o pacote reportlab.")
+    calendario_mes = mes_calendario(escala.ano, escala.mes)
+    grade = grade_da_escala(escala, calendario_mes.num_dias)
+    unidade = escala.unidade
+    estilos = getSampleStyleSheet()
+
+    saida = io.BytesIO()
+    documento = SimpleDocTemplate(
+        saida, pagesize=landscape(A4), leftMargin=10 * mm, rightMargin=10 * mm, topMargin=10 * mm, bottomMargin=10 * mm,
+        title=f"Escala {escala.mes:02d}/{escala.ano} - {unidade.nome}",
+    )
+    conteudo = [
+        Paragraph(f"<b>DIVISÃO/SETOR/UNIDADE:</b> {escape(unidade.nome)}", estilos["Normal"]),
+        Paragraph(
+            f"<b>MÊS:</b> {escala.mes:02d} &nbsp;&nbsp; <b>ANO:</b> {escala.ano}"
+            f" &nbsp;&nbsp; <b>PORTARIA:</b> {escape(unidade.portaria or '-')}",
+            estilos["Normal"],
+        ),
+        Spacer(1, 3 * mm),
+        _tabela(escala, grade, calendario_mes),
+    ]
+    if escala.observacoes:
+        conteudo.append(Spacer(1, 3 * mm))
+        conteudo.append(Paragraph("<b>OBSERVAÇÕES</b>", estilos["Normal"]))
+        for linha in escala.observacoes.splitlines():
+            if linha.strip():
+                conteudo.append(Paragraph(escape(linha), estilos["Normal"]))
+    documento.build(conteudo)
+    return saida.getvalue()
+
+
+def chave_pdf(escala):
+    # Tudo vem do banco: as versões (core.VersaoCache) mudam a cada alteração da escala, dos
+    # funcionários/unidade, dos turnos ou dos feriados, feita por qualquer processo; gerada_em
+    # separa escalas que reaproveitam o id (banco recriado) e cujas versões recomeçam do zero.
+    return chave_artefato(
+        "pdf", VERSAO_LAYOUT, escala.id, escala.gerada_em.isoformat(), versao_escala(escala), versao_feriados(),
+    )
+
+
+def pdf_da_escala(escala, chave=None):
+    """
+    Caminho do PDF da escala no disco; só renderiza se a versão atual ainda não existe.
+    """
+    chave = chave or chave_pdf(escala)
+    return obter_artefato(chave, "pdf", lambda: renderizar_pdf(escala))
@@ -0,0 +1,261 @@
+from django.db.models import Q
+
+from core.models import AtribuicaoEscala, Funcionario, Turno
+
+from .calendario import mes_calendario
+from .carga_horaria import meta_horas
+from .disponibilidade import DisponibilidadeMes
+from .matriz import MatrizMes
+from .parametros import TOLERANCIA_HORAS, minimos_da_unidade
+from .totais import PERIODOS, cobertura_dos_dias
+
+ERRO = "erro"
+AVISO = "aviso"
+
+# O que cada regra olha: uma célula (e vizinhas), a linha inteira do funcionário ou a coluna do dia
+CELULA = "celula"
+LINHA = "linha"
+DIA = "dia"
+
+NOTURNO = PERIODOS.index("noturno")
+
+# código -> Regra
+REGRAS = {}
+
+
+class Regra:
+    """
+    Uma regra registrada. `janela` (só em regras de CELULA) são os deslocamentos de
+    dia que a verificação lê a partir da célula: (0, 1) lê o próprio dia e o seguinte.
+    """
+    __slots__ = ("codigo", "alcance", "janela", "gravidade", "verificar")
+
+    def __init__(self, codigo, alcance, janela, gravidade, verificar):
+        self.codigo = codigo
+        self.alcance = alcance
+        self.janela = janela
+        self.gravidade = gravidade
+        self.verificar = verificar
+
+
+def regra(codigo, alcance=CELULA, janela=(0, 0), gravidade=ERRO):
+    """
+    Registra uma regra. A função recebe o contexto e a posição e devolve (ou gera)
+    pares (dias, mensagem) para cada violação.
+    Uso:
+        @regra("sem_turno_no_domingo", janela=(0, 0))
+        def sem_turno_no_domingo(ctx, linha, dia): ...
+        @regra("horas_do_mes", alcance=LINHA)
+        def horas_do_mes(ctx, linha): ...
+        @regra("cobertura_minima", alcance=DIA)
+        def cobertura_minima(ctx, dia): ...
+    """
+    def registrar(funcao):
+        REGRAS[codigo] = Regra(codigo, alcance, janela, gravidade, funcao)
+        return funcao
+    return registrar
+
+
+class ContextoRegras:
+    """
+    O que as regras leem da escala: a MatrizMes (com os turnos extras das células com
+    mais de uma atribuição), dias de férias, a cobertura por dia e os mínimos dela.
+    Com `funcionario_ids` só essas linhas são carregadas (validação incremental) e a
+    cobertura dos `dias` vem do banco, a menos que já venha pronta em `cobertura`.
+    `cobertura_minima` ({período: qtd}) completa os mínimos da unidade da escala.
+    """
+
+    def __init__(self, escala, funcionario_ids=None, dias=None, cobertura=None, cobertura_minima=None):
+        self.escala = escala
+        self.cobertura_minima = minimos_da_unidade(escala.unidade_id, cobertura_minima)
+        self.mes = mes_calendario(escala.ano, escala.mes)
+        self.num_dias = self.mes.num_dias
+        self.matriz = MatrizMes(self.num_dias)
+        self.ferias = {}  # funcionario_id -> {dia, ...}
+        self.parcial = funcionario_ids is not None
+        self._carregar(funcionario_ids)
+        self._cobertura = cobertura if cobertura is not None else self._carregar_cobertura(dias)
+
+    def _carregar(self, funcionario_ids):
+        escala = self.escala
+        atribuicoes = AtribuicaoEscala.objects.filter(escala=escala)
+        if funcionario_ids is None:
+            # a equipe da unidade e quem já está na escala (transferidos continuam na grade)
+            funcionarios = Funcionario.objects.filter(
+                Q(unidade_id=escala.unidade_id) | Q(id__in=atribuicoes.values("funcionario_id"))
+            )
+        else:
+            funcionarios = Funcionario.objects.filter(id__in=funcionario_ids)
+            atribuicoes = atribuicoes.filter(funcionario_id__in=funcionario_ids)
+        for func in funcionarios.order_by("nome_completo").only("id", "nome_completo", "ch_semanal"):
+            self.matriz.adicionar_linha(func.id, func)
+
+        for turno in Turno.objects.only("id", "sigla", "horas", "periodo"):
+            self.matriz.indice_turno(turno.id, turno.sigla, turno.horas, turno.periodo)
+        for func_id, dia, turno_id in atribuicoes.order_by("id").values_list("funcionario_id", "dia", "tipo_turno_id"):
+            linha = self.matriz.linha(func_id)
+            if linha is None or not 1 <= dia <= self.num_dias:
+                continue
+            self.matriz.acrescentar(linha, dia, self.matriz.indice_turno(turno_id))
+
+        disponibilidade = DisponibilidadeMes.dos_funcionarios(
+            [linha.funcionario_id for linha in self.matriz.linhas], escala.ano, escala.mes,
+        )
+        for func_id in disponibilidade.ausencias:
+            self.ferias[func_id] = set(disponibilidade.dias_de_ferias(func_id))
+
+    def _carregar_cobertura(self, dias):
+        if not self.parcial:
+            totais = self.matriz.totais()
+            return {dia: {p: totais[p][dia - 1] for p in PERIODOS} for dia in range(1, self.num_dias + 1)}
+        # só parte das linhas está na matriz: a cobertura dos dias vem do banco
+        return cobertura_dos_dias(self.escala, sorted(dias or []))
+
+    # Leitura para as regras
+
+    def turno(self, linha, dia):
+        """
+        Índice do turno (0 = vazio) da célula; fora do mês, vazio.
+        """
+        if not 1 <= dia <= self.num_dias:
+            return 0
+        return self.matriz.celulas[linha.indice * self.num_dias + dia - 1]
+
+    def info(self, turno):
+        return self.matriz.turnos[turno]
+
+    def trabalha(self, turno):
+        # folga (FO), férias (FE) e afins não têm período de trabalho
+        return bool(turno) and self.info(turno).periodo is not None and self.info(turno).horas > 0
+
+    def cobertura(self, dia):
+        return self._cobertura.get(dia, {p: 0 for p in PERIODOS})
+
+
+# Regras
+
+@regra("descanso_apos_noturno", janela=(0, 1))
+def descanso_apos_noturno(ctx, linha, dia):
+    noturno = ctx.turno(linha, dia)
+    seguinte = ctx.turno(linha, dia + 1)
+    if ctx.trabalha(noturno) and ctx.info(noturno).periodo == NOTURNO and ctx.trabalha(seguinte):
+        yield [dia, dia + 1], (
+            f"{ctx.info(seguinte).sigla} no dia {dia + 1} logo após o plantão noturno "
+            f"{ctx.info(noturno).sigla} do dia {dia}"
+        )
+
+
+@regra("turno_nas_ferias")
+def turno_nas_ferias(ctx, linha, dia):
+    turno = ctx.turno(linha, dia)
+    if ctx.trabalha(turno) and dia in ctx.ferias.get(linha.funcionario_id, ()):
+        yield [dia], f"{ctx.info(turno).sigla} no dia {dia}, durante as férias"
+
+
+@regra("dois_turnos_no_dia")
+def dois_turnos_no_dia(ctx, linha, dia):
+    extras = ctx.matriz.extras_da_celula(linha, dia)
+    if extras:
+        siglas = ", ".join(ctx.info(t).sigla for t in [ctx.turno(linha, dia)] + extras)
+        yield [dia], f"Mais de um turno no dia {dia}: {siglas}"
+
+
+@regra("horas_do_mes", alcance=LINHA, gravidade=AVISO)
+def horas_do_mes(ctx, linha):
+    ferias = ctx.ferias.get(linha.funcionario_id, set())
+    disponiveis = ctx.num_dias - len(ferias)
+    feriados_uteis = sum(1 for d in ctx.mes.feriados if d not in ferias and not ctx.mes.dia(d).fim_de_semana)
+    meta = meta_horas(linha.funcionario.ch_semanal, disponiveis, feriados_uteis)
+    horas = linha.total_horas
+    if abs(horas - meta) > TOLERANCIA_HORAS:
+        yield [], f"{horas:g}h no mês para {meta:.0f}h esperadas ({linha.funcionario.ch_semanal}h semanais)"
+
+
+@regra("cobertura_minima", alcance=DIA, gravidade=AVISO)
+def cobertura_minima(ctx, dia):
+    cobertura = ctx.cobertura(dia)
+    for periodo in PERIODOS:
+        minimo = ctx.cobertura_minima.get(periodo, 0)
+        if cobertura[periodo] < minimo:
+            yield [dia], f"{cobertura[periodo]} profissional(is) no {periodo} do dia {dia} (mínimo {minimo})"
+
+
+# Avaliação
+
+def _violacao(regra_, funcionario_id, ancora, dias, mensagem):
+    # `alcance` e `ancora` (dia da célula/coluna avaliada) dizem a qual escopo a violação pertence
+    return {
+        "regra": regra_.codigo,
+        "gravidade": regra_.gravidade,
+        "alcance": regra_.alcance,
+        "funcionario": funcionario_id,
+        "ancora": ancora,
+        "dias": dias,
+        "mensagem": mensagem,
+    }
+
+
+def _avaliar(ctx, celulas=None, linhas=None, dias=None):
+    """
+    Roda as regras nas posições pedidas (None = todas): `celulas` {(funcionario_id, dia)}
+    para regras de CELULA, `linhas` {funcionario_id} e `dias` {dia}.
+    """
+    violacoes = []
+    todas_linhas = ctx.matriz.linhas
+    for r in REGRAS.values():
+        if r.alcance == CELULA:
+            if celulas is None:
+                alvos = ((linha, dia) for linha in todas_linhas for dia in range(1, ctx.num_dias + 1))
+            else:
+                alvos = ((ctx.matriz.linha(f), dia) for f, dia in sorted(celulas) if ctx.matriz.linha(f))
+            for linha, dia in alvos:
+                for dias_, mensagem in r.verificar(ctx, linha, dia):
+                    violacoes.append(_violacao(r, linha.funcionario_id, dia, dias_, mensagem))
+        elif r.alcance == LINHA:
+            alvos = todas_linhas if linhas is None else [ctx.matriz.linha(f) for f in sorted(linhas) if ctx.matriz.linha(f)]
+            for linha in alvos:
+                for dias_, mensagem in r.verificar(ctx, linha):
+                    violacoes.append(_violacao(r, linha.funcionario_id, None, dias_, mensagem))
+        elif r.alcance == DIA:
+            for dia in (range(1, ctx.num_dias + 1) if dias is None else sorted(dias)):
+                for dias_, mensagem in r.verificar(ctx, dia):
+                    violacoes.append(_violacao(r, None, dia, dias_, mensagem))
+    return violacoes
+
+
+def validar_escala(escala, cobertura_minima=None):
+    """
+    Todas as violações da escala numa passada: [{"regra", "gravidade" (erro/aviso),
+    "alcance", "funcionario" (None nas regras do dia), "ancora", "dias", "mensagem"}, ...].
+    """
+    if escala is None or escala.pk is None:
+        return []
+    return _avaliar(ContextoRegras(escala, cobertura_minima=cobertura_minima))
+
+
+def validar_alteracoes(escala, alteradas, cobertura=None, cobertura_minima=None):
+    """
+    Reavalia só o que as células alteradas {(funcionario_id, dia)} podem ter mudado: as
+    células cuja janela as cobre, as linhas dos funcionários e as colunas dos dias.
+    `cobertura` ({dia: {período: qtd}}, de cobertura_dos_dias) evita consultá-la de novo.
+    Retorna {"violacoes": [...], "escopo": {"celulas", "funcionarios", "dias"}}; quem
+    mostra a grade troca as marcações do escopo pelas novas violações.
+    """
+    funcionario_ids = {f for f, _ in alteradas}
+    dias = {d for _, d in alteradas}
+    ctx = ContextoRegras(escala, funcionario_ids, dias, cobertura, cobertura_minima)
+    celulas = set()
+    for r in REGRAS.values():
+        if r.alcance == CELULA:
+            antes, depois = r.janela
+            for f, d in alteradas:
+                # células x cuja verificação lê x + antes .. x + depois e, portanto, o dia d
+                celulas.update((f, x) for x in range(d - depois, d - antes + 1) if 1 <= x <= ctx.num_dias)
+    return {
+        "violacoes": _avaliar(ctx, celulas, funcionario_ids, dias),
+        "escopo": {
+            "celulas": sorted([f, d] for f, d in celulas),
+            "funcionarios": sorted(funcionario_ids),
+            "dias": sorted(dias),
+        },
+    }
@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import AtribuicaoEscala, Escala, Feriado, Funcionario, Turno, Unidade
+
+from .cache import invalidar_escala, invalidar_feriados, invalidar_tudo, invalidar_unidade
+from .carga_horaria import recalcular_escalas
+
+
+@receiver(pre_save, sender=Turno)
+def guardar_horas_anteriores(sender, instance, **kwargs):
+    instance._horas_anteriores = None
+    if instance.pk:
+        instance._horas_anteriores = Turno.objects.filter(pk=instance.pk).values_list('horas', flat=True).first()
+
+
+@receiver(post_save, sender=Turno)
+def recalcular_ch_do_turno(sender, instance, created, **kwargs):
+    # Só as horas do turno entram na C.H.: mudar sigla ou descrição não recalcula nada
+    anteriores = getattr(instance, '_horas_anteriores', None)
+    if created or anteriores is None or anteriores == instance.horas:
+        return
+    escala_ids = AtribuicaoEscala.objects.filter(tipo_turno=instance).values_list('escala_id', flat=True).distinct()
+    recalcular_escalas(escala_ids)
+
+
+# Invalidação das grades em cache
+
+@receiver([post_save, post_delete], sender=AtribuicaoEscala)
+def invalidar_cache_atribuicao(sender, instance, **kwargs):
+    invalidar_escala(instance.escala_id)
+
+
+@receiver([post_save, post_delete], sender=Escala)
+def invalidar_cache_escala(sender, instance, **kwargs):
+    invalidar_escala(instance.id)
+
+
+@receiver(pre_save, sender=Funcionario)
+def guardar_unidade_anterior(sender, instance, **kwargs):
+    # Numa transferência as duas unidades precisam ser invalidadas
+    instance._unidade_anterior_id = None
+    if instance.pk:
+        instance._unidade_anterior_id = (
+            Funcionario.objects.filter(pk=instance.pk).values_list('unidade_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Funcionario)
+def invalidar_cache_funcionario(sender, instance, **kwargs):
+    invalidar_unidade(instance.unidade_id)
+    anterior = getattr(instance, '_unidade_anterior_id', None)
+    if anterior and anterior != instance.unidade_id:
+        invalidar_unidade(anterior)
+
+
+@receiver([post_save, post_delete], sender=Turno)
+def invalidar_cache_turno(sender, instance, **kwargs):
+    invalidar_tudo()
+
+
+@receiver([post_save, post_delete], sender=Unidade)
+def invalidar_cache_unidade(sender, instance, **kwargs):
+    # nome e portaria aparecem no cabeçalho das escalas impressas
+    invalidar_unidade(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Feriado)
+def invalidar_cache_feriado(sender, instance, **kwargs):
+    # meses do calendario (cabeçalhos, gerador, análises) e PDFs marcam os feriados
+    invalidar_feriados()
@@ -0,0 +1,217 @@
+import logging
+import os
+import socket
+import traceback
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Escala, Tarefa
+
+logger = logging.getLogger(__name__)
+
+# tipo -> função(tarefa, **parametros) que devolve o resultado (serializável em JSON)
+TIPOS = {}
+
+
+def tipo_tarefa(nome):
+    """
+    Registra a função que executa um tipo de tarefa.
+    Uso:
+        @tipo_tarefa("recalcular_ch")
+        def recalcular_ch(tarefa, escala_id): ...
+    """
+    def registrar(funcao):
+        TIPOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def enfileirar(tipo, **parametros):
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    return Tarefa.objects.create(tipo=tipo, parametros=parametros)
+
+
+def _desta_execucao(tarefa):
+    # a tarefa como este trabalhador a reservou: se liberar_presas a devolveu à fila
+    # (e outro a pegou), iniciada_em mudou e o update não encontra a linha
+    return Tarefa.objects.filter(id=tarefa.id, status=Tarefa.EXECUTANDO, iniciada_em=tarefa.iniciada_em)
+
+
+def informar_progresso(tarefa, progresso, mensagem=""):
+    # update direto: não sobrescreve os outros campos da tarefa; também é o sinal de vida
+    # que liberar_presas confere
+    tarefa.progresso = max(0, min(100, int(progresso)))
+    tarefa.mensagem = mensagem[:200]
+    tarefa.atualizada_em = timezone.now()
+    _desta_execucao(tarefa).update(
+        progresso=tarefa.progresso, mensagem=tarefa.mensagem, atualizada_em=tarefa.atualizada_em
+    )
+
+
+def nome_trabalhador():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def pegar_proxima(trabalhador=None):
+    """
+    Reserva a próxima tarefa pendente. Usa SELECT ... FOR UPDATE SKIP LOCKED
+    onde o banco suporta e, em todo caso, só fica com a tarefa se o UPDATE
+    condicional de status mudar a linha (vários trabalhadores podem disputar).
+    """
+    trabalhador = trabalhador or nome_trabalhador()
+    with transaction.atomic():
+        tarefa = (
+            Tarefa.objects.select_for_update(skip_locked=True)
+            .filter(status=Tarefa.PENDENTE)
+            .order_by("criada_em", "id")
+            .first()
+        )
+        if tarefa is None:
+            return None
+        agora = timezone.now()
+        reservada = Tarefa.objects.filter(id=tarefa.id, status=Tarefa.PENDENTE).update(
+            status=Tarefa.EXECUTANDO, iniciada_em=agora, atualizada_em=agora, trabalhador=trabalhador[:100]
+        )
+    if not reservada:
+        return None
+    tarefa.status = Tarefa.EXECUTANDO
+    tarefa.iniciada_em = agora
+    tarefa.atualizada_em = agora
+    tarefa.trabalhador = trabalhador[:100]
+    return tarefa
+
+
+def executar(tarefa):
+    funcao = TIPOS.get(tarefa.tipo)
+    try:
+        if funcao is None:
+            raise ValueError(f"Tipo de tarefa desconhecido: {tarefa.tipo}")
+        resultado = funcao(tarefa, **tarefa.parametros)
+    except Exception:
+        logger.exception("Tarefa %s falhou", tarefa.id)
+        tarefa.status = Tarefa.FALHOU
+        tarefa.erro = traceback.format_exc()
+        tarefa.resultado = None
+    else:
+        tarefa.status = Tarefa.CONCLUIDA
+        tarefa.progresso = 100
+        tarefa.resultado = resultado
+    tarefa.concluida_em = tarefa.atualizada_em = timezone.now()
+    gravada = _desta_execucao(tarefa).update(
+        status=tarefa.status, progresso=tarefa.progresso, resultado=tarefa.resultado, erro=tarefa.erro,
+        concluida_em=tarefa.concluida_em, atualizada_em=tarefa.atualizada_em,
+    )
+    if not gravada:
+        # devolvida à fila enquanto rodava: o resultado fica com a execução que a reservou de novo
+        logger.warning("Tarefa %s foi devolvida à fila durante a execução; resultado descartado", tarefa.id)
+    return tarefa
+
+
+def liberar_presas(minutos):
+    """
+    Devolve para a fila tarefas 'executando' sem sinal de vida (atualizada_em, renovado
+    por informar_progresso) há mais de `minutos`: o trabalhador morreu.
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return Tarefa.objects.filter(status=Tarefa.EXECUTANDO, atualizada_em__lt=limite).update(
+        status=Tarefa.PENDENTE, trabalhador="", mensagem="Reiniciada após trabalhador parado"
+    )
+
+
+def dados_tarefa(tarefa):
+    return {
+        "id": tarefa.id,
+        "tipo": tarefa.tipo,
+        "status": tarefa.status,
+        "progresso": tarefa.progresso,
+        "mensagem": tarefa.mensagem,
+        "resultado": tarefa.resultado,
+        "erro": tarefa.erro.strip().splitlines()[-1] if tarefa.erro else "",
+        "criada_em": tarefa.criada_em.isoformat() if tarefa.criada_em else None,
+        "iniciada_em": tarefa.iniciada_em.isoformat() if tarefa.iniciada_em else None,
+        "atualizada_em": tarefa.atualizada_em.isoformat() if tarefa.atualizada_em else None,
+        "concluida_em": tarefa.concluida_em.isoformat() if tarefa.concluida_em else None,
+    }
+
+
+# Tipos de tarefa
+
+@tipo_tarefa("gerar_escala")
+def gerar_escala(tarefa, unidade_id, mes, ano, cobertura_minima=None, cargo=None, tempo_limite=5.0):
+    from .gerador import gerar_e_salvar
+
+    informar_progresso(tarefa, 5, "Carregando equipe, férias e feriados")
+    escala, _ = Escala.objects.get_or_create(unidade_id=unidade_id, mes=mes, ano=ano)
+    resultado = gerar_e_salvar(escala, cobertura_minima=cobertura_minima, cargo=cargo, tempo_limite=tempo_limite)
+    informar_progresso(tarefa, 95, "Escala gravada")
+    return {
+        "escala_id": escala.id,
+        "segundos": round(resultado["segundos"], 2),
+        "pendencias": [p["descricao"] for p in resultado["pendencias"]],
+    }
+
+
+# Escalas por chamada de recalcular_escalas no recálculo de todas (uma consulta e um lote cada)
+ESCALAS_POR_RECALCULO = 200
+
+
+@tipo_tarefa("recalcular_ch")
+def recalcular_ch(tarefa, escala_id=None):
+    from .carga_horaria import recalcular_escalas
+
+    escalas = Escala.objects.all() if escala_id is None else Escala.objects.filter(id=escala_id)
+    escala_ids = list(escalas.order_by("id").values_list("id", flat=True))
+    total = len(escala_ids)
+    for inicio in range(0, total, ESCALAS_POR_RECALCULO):
+        with transaction.atomic():
+            recalcular_escalas(escala_ids[inicio:inicio + ESCALAS_POR_RECALCULO])
+        feitas = min(inicio + ESCALAS_POR_RECALCULO, total)
+        informar_progresso(tarefa, 100 * feitas / total, f"{feitas}/{total} escalas")
+    return {"escalas": total}
+
+
+@tipo_tarefa("gerar_escalas_mes")
+def gerar_escalas_mes(tarefa, mes, ano, unidade_ids=None, processos=None, recalcular=False,
+                      cobertura_minima=None, tempo_limite=2.0):
+    from .lote import processar_unidades
+
+    def ao_concluir(resultado, feitas, total):
+        informar_progresso(tarefa, 100 * feitas / max(total, 1), f"{feitas}/{total} unidades")
+
+    relatorio = processar_unidades(
+        mes, ano, unidade_ids=unidade_ids, processos=processos, recalcular=recalcular,
+        cobertura_minima=cobertura_minima, tempo_limite=tempo_limite, ao_concluir=ao_concluir,
+    )
+    return {
+        "segundos": round(relatorio["segundos"], 2),
+        "segundos_somados": round(relatorio["segundos_somados"], 2),
+        "unidades": [
+            {k: (round(v, 2) if k == "segundos" else v) for k, v in r.items()} for r in relatorio["resultados"]
+        ],
+    }
+
+
+@tipo_tarefa("exportar_xlsx")
+def exportar_xlsx(tarefa, nome, mes=None, ano=None, inicio=None, fim=None):
+    """
+    Planilha de todas as unidades no mês (mes/ano) ou no período (inicio/fim em AAAA-MM-DD),
+    gravada no diretório de artefatos; o resultado traz o link de download.
+    """
+    from .artefatos import chave_artefato, gravar_artefato
+    from .calendario import dias_no_mes
+    from .exportacao import atribuicoes_do_mes, atribuicoes_do_periodo, dias_do_periodo, gerar_xlsx
+
+    if mes is not None:
+        atribuicoes, num_dias = atribuicoes_do_mes(mes, ano), dias_no_mes(ano, mes)
+    else:
+        inicio, fim = date.fromisoformat(inicio), date.fromisoformat(fim)
+        atribuicoes, num_dias = atribuicoes_do_periodo(inicio, fim), dias_do_periodo(inicio, fim)
+
+    informar_progresso(tarefa, 5, "Escrevendo a planilha")
+    chave = chave_artefato("xlsx", tarefa.id, nome)
+    gravar_artefato(chave, "xlsx", lambda arquivo: gerar_xlsx(atribuicoes, num_dias, titulo=nome, arquivo=arquivo))
+    return {"chave": chave, "nome": f"{nome}.xlsx", "url": reverse("baixar_exportacao", args=[tarefa.id])}
@@ -2,6 +2,8 @@
 from django import template
 from datetime import date
 
+from escalas.calendario import mes_calendario
+
 register = template.Library()
 
 @register.filter
@@ -28,17 +30,18 @@ def day_number(value):
     return '1'
 
 @register.filter
-def weekday(value, mes):
+def weekday(value, mes_ano=None):
     """
-    Calcula o dia da semana (0=dom, 6=sáb) para um dia do mês.
-    Uso: {{ "1"|weekday:mes_atual }} -> 0 (se for domingo)
+    Dia da semana (0=dom, 6=sáb) de uma data ou de um dia do mês "mes/ano".
+    Uso: {{ dia.data|weekday }} ou {{ "1"|weekday:"4/2025" }} -> 2 (terça)
     """
     try:
-        dia = int(value)
-        mes = int(mes)
-        ano = date.today().year  # Use o ano atual; ajuste se necessário para ano variável
-        dia_semana = date(ano, mes, dia).weekday()
-        return dia_semana
+        if isinstance(value, date):
+            dia_semana = value.weekday()
+        else:
+            mes, ano = str(mes_ano).split('/')
+            dia_semana = mes_calendario(int(ano), int(mes)).dia(int(value)).dia_semana
+        return (dia_semana + 1) % 7
     except (ValueError, IndexError):
         return 0
 
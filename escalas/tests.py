@@ -1,3 +1,955 @@
-from django.test import TestCase
+import asyncio
+import calendar
+import re
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import (
+    AtribuicaoEscala, CargaHorariaMensal, Escala, Feriado, Ferias, Funcionario, Tarefa, Turno, Unidade, VersaoCache,
+    VersaoEscala,
+)
+
+from . import eventos, gravacao
+from .analise import analisar, analise_disponivel
+from .artefatos import obter_artefato
+from .cache import versao_escala, versao_feriados
+from .calendario import _montar_mes, feriados_entre, mes_calendario
+from .copia import CICLO, SEMANA, copiar_mes, mapa_de_dias
+from .desempenho import DesempenhoMiddleware, registro
+from .disponibilidade import DisponibilidadeMes
+from .eventos import TAMANHO_FILA, BarramentoLocal, canal_escala
+from .exportacao import atribuicoes_da_escala, linhas_escala
+from .gerador import GeradorEscala, gerar_e_salvar
+from .grade import montar_grade
+from .gravacao import salvar_grade
+from .lote import processar_unidades
+from .pdf import chave_pdf, pdf_disponivel
+from .regras import validar_alteracoes, validar_escala
+from .tarefas import enfileirar, executar, informar_progresso, liberar_presas, pegar_proxima
+from .totais import PERIODOS, cobertura_dos_dias
+from .versoes import VERSOES_POR_BASE, comparar_versoes, grade_atual, grade_na_versao, registrar_versao
+
+MES, ANO = 4, 2025
+
+
+def criar_unidade(nome, num_funcionarios, turnos):
+    """
+    Unidade com `num_funcionarios` e uma escala de MES/ANO com todos os dias preenchidos.
+    """
+    unidade = Unidade.objects.create(nome=nome, portaria="1/2025")
+    funcionarios = Funcionario.objects.bulk_create([
+        Funcionario(
+            nome_completo=f"{nome} {n:04d}", siape=str(n), cargo="TE", vinculo="EBSERH",
+            ch_semanal=36, unidade=unidade,
+        )
+        for n in range(num_funcionarios)
+    ])
+    escala = Escala.objects.create(unidade=unidade, mes=MES, ano=ANO)
+    num_dias = calendar.monthrange(ANO, MES)[1]
+    AtribuicaoEscala.objects.bulk_create([
+        AtribuicaoEscala(escala=escala, funcionario=func, dia=dia, tipo_turno=turnos[(n + dia) % len(turnos)])
+        for n, func in enumerate(funcionarios)
+        for dia in range(1, num_dias + 1)
+    ])
+    return unidade
+
+
+def trincas(lista):
+    # [f, d, t, f, d, t, ...] de VersaoEscala -> {(f, d, t), ...}
+    return {tuple(lista[i:i + 3]) for i in range(0, len(lista), 3)}
+
+
+class ConsultasPorViewTest(TestCase):
+    """
+    O número de consultas de cada tela não pode crescer com o tamanho da unidade:
+    um mês com ~2.000 atribuições custa o mesmo que um com poucas dezenas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turnos = [
+            Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino"),
+            Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino"),
+            Turno.objects.create(sigla="N12", descricao="Noturno", horas=12, periodo="noturno"),
+        ]
+        cls.pequena = criar_unidade("Pequena", 1, turnos)
+        cls.grande = criar_unidade("Grande", 70, turnos)
+
+    def contar_consultas(self, metodo, url, dados=None):
+        # cache vazio: mede a montagem completa, não a leitura do cache
+        cache.clear()
+        _montar_mes.cache_clear()
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = getattr(self.client, metodo)(url, dados or {})
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas)
+
+    def assertConsultasFixas(self, metodo, url, dados_por_unidade):
+        pequena = self.contar_consultas(metodo, url(self.pequena), dados_por_unidade(self.pequena))
+        grande = self.contar_consultas(metodo, url(self.grande), dados_por_unidade(self.grande))
+        self.assertEqual(pequena, grande, f"{url(self.grande)}: {pequena} consultas com 1 funcionário, {grande} com 70")
+
+    def test_cobertura(self):
+        self.assertConsultasFixas(
+            "post", lambda u: "/escalas/cobertura/", lambda u: {"mes": MES, "ano": ANO, "unidade": u.id}
+        )
+
+    def test_ver_escalas(self):
+        self.assertConsultasFixas(
+            "post", lambda u: "/escalas/ver_escalas/", lambda u: {"mes": MES, "ano": ANO, "unidade": u.id}
+        )
+
+    def test_escala_detalhe(self):
+        self.assertConsultasFixas("get", lambda u: f"/escalas/escala/{u.id}/{MES}/{ANO}/", lambda u: {})
+
+    def test_exportacao_csv(self):
+        def consultas(unidade):
+            escala = Escala.objects.get(unidade=unidade)
+            with CaptureQueriesContext(connection) as capturadas:
+                resposta = self.client.get(f"/escalas/exportar/escala/{escala.id}.csv")
+                b"".join(resposta.streaming_content)
+            return len(capturadas)
+
+        self.assertEqual(consultas(self.pequena), consultas(self.grande))
+
+
+class RecalculoPorTurnoTest(TestCase):
+    """
+    A C.H. mensal só é refeita quando as horas do turno mudam, e de uma vez para todas as escalas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        criar_unidade("A", 2, [cls.turno])
+        criar_unidade("B", 2, [cls.turno])
+
+    def test_descricao_nao_recalcula(self):
+        self.turno.descricao = "Manhã"
+        with CaptureQueriesContext(connection) as consultas:
+            self.turno.save()
+        self.assertFalse(any("cargahorariamensal" in c["sql"].lower() for c in consultas))
+
+    def test_horas_recalcula_todas_as_escalas(self):
+        self.turno.horas = 7
+        self.turno.save()
+        num_dias = calendar.monthrange(ANO, MES)[1]
+        horas = set(CargaHorariaMensal.objects.values_list("horas", flat=True))
+        self.assertEqual(horas, {7.0 * num_dias})
+        self.assertEqual(CargaHorariaMensal.objects.count(), 4)
+
+
+# Cache próprio, como o de um comando ou do trabalhador da fila rodando em outro processo
+OUTRO_PROCESSO = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "outro-processo"}}
+
+
+class VersaoCacheEntreProcessosTest(TestCase):
+    """
+    A grade em cache muda quando outro processo (aqui, um comando com o próprio cache
+    em memória) grava na escala: as versões que a invalidam vêm do banco.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.unidade = criar_unidade("Origem", 2, [turno])
+        cls.destino = Escala.objects.create(unidade=cls.unidade, mes=MES + 1, ano=ANO)
+
+    def setUp(self):
+        # o cache não volta com o rollback dos outros testes (ids se repetem)
+        cache.clear()
+
+    def test_copia_por_comando_invalida_grade(self):
+        url = f"/escalas/escala/{self.unidade.id}/{MES + 1}/{ANO}/"
+        antes = self.client.get(url)
+        self.assertNotContains(antes, '<td data-dia="1">M6</td>')
+
+        with override_settings(CACHES=OUTRO_PROCESSO), self.captureOnCommitCallbacks(execute=True):
+            call_command("copiar_escalas_mes", MES + 1, ANO, "--substituir", stdout=StringIO())
+
+        depois = self.client.get(url)
+        self.assertContains(depois, '<td data-dia="1">M6</td>', count=2)
+
+    def test_chave_pdf_muda_com_gravacao_de_outro_processo(self):
+        antes = chave_pdf(self.destino)
+        self.assertEqual(chave_pdf(Escala.objects.get(id=self.destino.id)), antes)
+
+        with override_settings(CACHES=OUTRO_PROCESSO), self.captureOnCommitCallbacks(execute=True):
+            call_command("copiar_escalas_mes", MES + 1, ANO, "--substituir", stdout=StringIO())
+
+        self.assertNotEqual(chave_pdf(self.destino), antes)
+
+
+def gerador_em_memoria(num_funcionarios, ferias=(), **kwargs):
+    # equipe e turnos sem banco: o gerador só lê os atributos
+    funcionarios = [
+        Funcionario(id=n, nome_completo=f"Func {n:03d}", ch_semanal=36, preferencias_turno="")
+        for n in range(1, num_funcionarios + 1)
+    ]
+    turnos = [
+        Turno(id=1, sigla="M6", horas=6, periodo="matutino"),
+        Turno(id=2, sigla="T6", horas=6, periodo="vespertino"),
+        Turno(id=3, sigla="N12", horas=12, periodo="noturno"),
+        Turno(id=4, sigla="FE", horas=0, periodo="ferias"),
+    ]
+    kwargs.setdefault("tempo_limite", 0.1)
+    return GeradorEscala(
+        None, MES, ANO, funcionarios=funcionarios, turnos=turnos, feriados=[], ferias=list(ferias), semente=1, **kwargs
+    )
+
+
+class GeradorEscalaTest(TestCase):
+    """
+    Regras obrigatórias do gerador, pendências do que não coube e o que gerar_e_salvar regrava.
+    """
+
+    def test_ferias_viram_fe(self):
+        gerado = gerador_em_memoria(8, ferias=[(1, date(ANO, MES, 10), date(ANO, MES, 20))]).gerar()
+        for dia in range(1, 31):
+            turno = gerado["celulas"][(1, dia)]
+            if 10 <= dia <= 20:
+                self.assertEqual(turno, 4, dia)
+            else:
+                self.assertNotEqual(turno, 4, dia)
+
+    def test_folga_depois_do_noturno(self):
+        gerado = gerador_em_memoria(8, tempo_limite=0.3).gerar()
+        celulas = gerado["celulas"]
+        noturnos = [(f, d) for (f, d), turno in celulas.items() if turno == 3]
+        self.assertTrue(noturnos)
+        for func_id, dia in noturnos:
+            self.assertIn(celulas.get((func_id, dia + 1)), (None, 4), (func_id, dia))
+
+    def test_minimo_impossivel_vira_pendencia(self):
+        # 3 pessoas não cobrem 2 por período todos os dias
+        gerado = gerador_em_memoria(3).gerar()
+        faltas = [p for p in gerado["pendencias"] if p["tipo"] == "cobertura"]
+        self.assertTrue(faltas)
+        matriz = gerado["matriz"].totais()
+        for falta in faltas:
+            self.assertEqual(matriz[falta["periodo"]][falta["dia"] - 1] + falta["faltam"], 2)
+
+    def test_cem_funcionarios_no_tempo(self):
+        # meta de tamanho: uma unidade de ~100 pessoas sai no tempo pedido, com a cobertura atendida
+        inicio = time.monotonic()
+        gerado = gerador_em_memoria(100, tempo_limite=0.5).gerar()
+        self.assertLess(time.monotonic() - inicio, 3)
+        self.assertEqual([p for p in gerado["pendencias"] if p["tipo"] == "cobertura"], [])
+
+    def test_gerar_e_salvar_regrava_so_o_cargo(self):
+        manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        tarde = Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino")
+        escala = Escala.objects.get(unidade=criar_unidade("Gerada", 6, [manha]))
+        enfermeira = Funcionario.objects.filter(unidade=escala.unidade).first()
+        Funcionario.objects.filter(id=enfermeira.id).update(cargo="ENF")
+        outro = Funcionario.objects.filter(unidade=escala.unidade, cargo="TE").first()
+        AtribuicaoEscala.objects.create(escala=escala, funcionario=outro, dia=1, tipo_turno=tarde)
+        antes = set(AtribuicaoEscala.objects.filter(escala=escala, funcionario=enfermeira)
+                    .values_list("dia", "tipo_turno_id"))
+
+        gerar_e_salvar(escala, cargo="TE", tempo_limite=0.1, semente=1)
+        # quem não é do cargo fica como estava
+        self.assertEqual(
+            set(AtribuicaoEscala.objects.filter(escala=escala, funcionario=enfermeira).values_list("dia", "tipo_turno_id")),
+            antes,
+        )
+        # cada célula de quem é do cargo passa a ser a gerada, sem sobras (como o M6/T6 do dia 1)
+        grade = montar_grade(escala)["matriz"]
+        for linha in grade.linhas:
+            if linha.funcionario_id != enfermeira.id:
+                self.assertFalse(any(grade.extras_da_celula(linha, dia) for dia in range(1, 31)))
+
+
+class GeracaoNaFilaTest(TestCase):
+    """
+    O POST de geração só enfileira a tarefa; a página acompanha e mostra o resultado ao fim.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.unidade = criar_unidade("Fila", 2, [turno])
+
+    def test_post_enfileira_e_redireciona(self):
+        url = f"/escalas/escala/{self.unidade.id}/{MES + 1}/{ANO}/"
+        resposta = self.client.post(url, {"min_matutino": "1"})
+        tarefa = Tarefa.objects.get()
+        self.assertRedirects(resposta, f"{url}?tarefa={tarefa.id}")
+        self.assertEqual(tarefa.status, Tarefa.PENDENTE)
+        self.assertEqual(tarefa.parametros["cobertura_minima"], {"matutino": 1})
+        self.assertFalse(Escala.objects.filter(unidade=self.unidade, mes=MES + 1).exists())
+
+        Tarefa.objects.filter(id=tarefa.id).update(parametros={**tarefa.parametros, "tempo_limite": 0.2})
+        executar(pegar_proxima())
+        self.assertContains(self.client.get(f"{url}?tarefa={tarefa.id}"), "Escala gerada em")
+
+    def test_liberar_presas_pelo_sinal_de_vida(self):
+        enfileirar("recalcular_ch", escala_id=Escala.objects.get(unidade=self.unidade).id)
+        tarefa = pegar_proxima("antigo")
+        # começou há uma hora mas deu sinal agora: continua com o trabalhador
+        Tarefa.objects.filter(id=tarefa.id).update(iniciada_em=tarefa.iniciada_em - timedelta(hours=1))
+        tarefa.iniciada_em -= timedelta(hours=1)
+        informar_progresso(tarefa, 50)
+        self.assertEqual(liberar_presas(30), 0)
+
+        Tarefa.objects.filter(id=tarefa.id).update(atualizada_em=tarefa.atualizada_em - timedelta(hours=1))
+        self.assertEqual(liberar_presas(30), 1)
+        nova = pegar_proxima("novo")
+        # o trabalhador antigo termina depois: não sobrescreve a execução nova
+        executar(tarefa)
+        nova.refresh_from_db()
+        self.assertEqual((nova.status, nova.trabalhador), (Tarefa.EXECUTANDO, "novo"))
+        self.assertEqual(executar(nova).status, Tarefa.CONCLUIDA)
+        nova.refresh_from_db()
+        self.assertEqual(nova.status, Tarefa.CONCLUIDA)
+
+
+class LoteDoMesTest(TestCase):
+    """
+    Na geração do mês em lote a falha de uma unidade fica no resultado dela; as outras são gravadas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.boa = criar_unidade("Lote Boa", 2, [turno])
+        cls.ruim = criar_unidade("Lote Ruim", 2, [turno])
+
+    def test_falha_isolada_em_serie(self):
+        original = gravacao.salvar_grade
+
+        def salvar(escala, celulas, **kwargs):
+            if escala.unidade_id == self.ruim.id:
+                raise RuntimeError("disco cheio")
+            return original(escala, celulas, **kwargs)
+
+        concluidas = []
+        with mock.patch.object(gravacao, "salvar_grade", salvar):
+            lote = processar_unidades(
+                MES + 1, ANO, [self.ruim.id, self.boa.id], tempo_limite=0.1,
+                ao_concluir=lambda resultado, feitas, total: concluidas.append((feitas, total)),
+            )
+        ruim, boa = sorted(lote["resultados"], key=lambda r: r["unidade_id"] != self.ruim.id)
+        self.assertEqual(ruim["erro"], "RuntimeError: disco cheio")
+        self.assertEqual(boa["erro"], "")
+        self.assertEqual(concluidas, [(1, 2), (2, 2)])
+        # a unidade que falhou não deixa escala pela metade
+        self.assertFalse(Escala.objects.filter(unidade=self.ruim, mes=MES + 1).exists())
+        self.assertTrue(AtribuicaoEscala.objects.filter(escala_id=boa["escala_id"]).exists())
+
+
+class ExportacaoXlsxNaFilaTest(TestCase):
+    """
+    XLSX de todas as unidades vai para a fila e é baixado pelo link do resultado.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        criar_unidade("Planilha", 2, [turno])
+
+    def test_mes_em_xlsx_enfileira(self):
+        with tempfile.TemporaryDirectory() as diretorio, self.settings(ESCALAS_ARTEFATOS_DIR=diretorio):
+            self.assertEqual(self.client.get(f"/escalas/exportar/{MES}/{ANO}.xlsx").status_code, 405)
+            resposta = self.client.post(f"/escalas/exportar/{MES}/{ANO}.xlsx")
+            self.assertEqual(resposta.status_code, 202)
+            tarefa = Tarefa.objects.get(id=resposta.json()["id"])
+            self.assertEqual(self.client.get(f"/escalas/exportar/tarefa/{tarefa.id}.xlsx").status_code, 404)
+
+            tarefa = executar(pegar_proxima())
+            self.assertEqual(tarefa.status, Tarefa.CONCLUIDA, tarefa.erro)
+            download = self.client.get(tarefa.resultado["url"])
+            self.assertEqual(download.status_code, 200)
+            self.assertTrue(b"".join(download.streaming_content).startswith(b"PK"))
+
+
+class PdfDaEscalaTest(TestCase):
+    """
+    O PDF é gerado uma vez por versão da escala e o navegador revalida pelo ETag.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.tarde = Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino")
+        cls.escala = Escala.objects.get(unidade=criar_unidade("Impressa", 2, [cls.manha]))
+
+    def setUp(self):
+        cache.clear()
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(ESCALAS_ARTEFATOS_DIR=diretorio.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def test_gera_uma_vez_por_chave(self):
+        geracoes = []
+
+        def gerar():
+            geracoes.append(1)
+            return b"%PDF-"
+
+        primeiro = obter_artefato("a" * 64, "pdf", gerar)
+        self.assertEqual(obter_artefato("a" * 64, "pdf", gerar), primeiro)
+        self.assertEqual((len(geracoes), primeiro.read_bytes()), (1, b"%PDF-"))
+
+    @skipUnless(pdf_disponivel(), "PDF requer reportlab")
+    def test_etag_acompanha_a_escala(self):
+        url = f"/escalas/escala/{self.escala.id}/pdf/"
+        primeira = self.client.get(url)
+        self.assertEqual(primeira.status_code, 200)
+        etag = primeira["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"outra", {etag}').status_code, 304)
+
+        funcionario = Funcionario.objects.filter(unidade=self.escala.unidade).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            salvar_grade(self.escala, {(funcionario.id, 1): self.tarde.id})
+        depois = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(depois.status_code, 200)
+        self.assertNotEqual(depois["ETag"], etag)
+        # um ETag que só contém o atual como parte do texto não vale
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=depois["ETag"][:-1] + 'x"').status_code, 200)
+
+
+@skipUnless(analise_disponivel(), "análises requerem numpy")
+class AnaliseTest(TestCase):
+    """
+    Formato e contas do relatório de cobertura e horas do período.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.unidade = criar_unidade("Analisada", 2, [turno])
+
+    def test_relatorio_do_mes(self):
+        inicio, fim = date(ANO, MES, 1), date(ANO, MES, 30)
+        relatorio = analisar(inicio, fim, [self.unidade.id], {"matutino": 3, "vespertino": 0, "noturno": 0})
+        self.assertEqual(
+            set(relatorio), {"inicio", "fim", "atribuicoes", "unidades", "lacunas", "total_lacunas", "funcionarios"},
+        )
+        self.assertEqual((relatorio["inicio"], relatorio["fim"], relatorio["atribuicoes"]), ("2025-04-01", "2025-04-30", 60))
+
+        unidade, = relatorio["unidades"]
+        self.assertEqual(unidade, {
+            "id": self.unidade.id, "nome": "Analisada", "dias_descobertos": 30, "profissionais_faltando": 30,
+            "funcionarios": 2, "horas_acima_do_contrato": round(2 * (180 - 36 * 30 / 7), 1),
+        })
+        self.assertEqual(relatorio["total_lacunas"], 30)
+        self.assertEqual(relatorio["lacunas"][0], {
+            "unidade_id": self.unidade.id, "data": "2025-04-01", "periodo": "matutino", "escalados": 2, "minimo": 3,
+        })
+
+        funcionario = relatorio["funcionarios"][0]
+        self.assertEqual(set(funcionario), {
+            "id", "nome", "cargo", "unidade_id", "horas", "contrato", "saldo", "meses_acima_do_contrato",
+            "turnos", "noturnos", "fins_de_semana", "feriados",
+        })
+        # abril de 2025: 8 dias de fim de semana, nenhum feriado cadastrado
+        self.assertEqual(
+            (funcionario["horas"], funcionario["turnos"], funcionario["noturnos"], funcionario["fins_de_semana"],
+             funcionario["feriados"], funcionario["meses_acima_do_contrato"]),
+            (180, 30, 0, 8, 0, 1),
+        )
+
+
+@override_settings(ESCALAS_DESEMPENHO_AMOSTRAGEM=1, ESCALAS_DESEMPENHO_ARQUIVO=None)
+class DesempenhoMiddlewareTest(TestCase):
+    """
+    As requisições medidas saem com Server-Timing e viram amostra; a amostragem decide quais.
+    """
+
+    def setUp(self):
+        registro.limpar()
+        self.addCleanup(registro.limpar)
+
+    def test_server_timing_e_amostra(self):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        unidade = criar_unidade("Medida", 2, [turno])
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(f"/escalas/escala/api/funcionarios/?unidade={unidade.id}&cargo=TE")
+        self.assertRegex(
+            resposta["Server-Timing"],
+            rf'^sql;dur=[\d.]+;desc="{len(consultas)} consultas", tpl;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        amostra, = registro.amostras()
+        self.assertEqual((amostra["metodo"], amostra["status"], amostra["consultas"]), ("GET", 200, len(consultas)))
+        self.assertEqual(amostra["view"], resposta.resolver_match.view_name)
+        self.assertLessEqual(len(amostra["consultas_lentas"]), 5)
+
+    def test_amostragem(self):
+        pedido = RequestFactory().get("/qualquer/")
+        with override_settings(ESCALAS_DESEMPENHO_AMOSTRAGEM=0):
+            with self.assertRaises(MiddlewareNotUsed):
+                DesempenhoMiddleware(lambda request: HttpResponse())
+        with override_settings(ESCALAS_DESEMPENHO_AMOSTRAGEM=0.5):
+            middleware = DesempenhoMiddleware(lambda request: HttpResponse())
+        with mock.patch("escalas.desempenho.random.random", return_value=0.9):
+            self.assertNotIn("Server-Timing", middleware(pedido))
+        with mock.patch("escalas.desempenho.random.random", return_value=0.1):
+            self.assertIn("Server-Timing", middleware(pedido))
+        self.assertEqual(len(registro.amostras()), 1)
+
+
+class CalendarioTest(TestCase):
+    """
+    O mês memorizado acompanha os feriados cadastrados.
+    """
+
+    def setUp(self):
+        cache.clear()
+        _montar_mes.cache_clear()
+
+    def test_feriado_novo_muda_o_mes(self):
+        antes = mes_calendario(ANO, MES)
+        self.assertIs(mes_calendario(ANO, MES), antes)
+        self.assertEqual((antes.num_dias, antes.dia(1).sigla, antes.semanas[0][0]), (30, "TER", date(ANO, 3, 30)))
+        with self.assertRaises(IndexError):
+            antes.dia(31)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Feriado.objects.create(data=date(ANO, MES, 21), tipo="FD")
+        depois = mes_calendario(ANO, MES)
+        self.assertNotIn(21, antes.feriados)
+        self.assertEqual(depois.feriados, {21})
+        self.assertTrue(depois.dia(21).feriado)
+        self.assertEqual(feriados_entre(date(ANO, MES - 1, 15), date(ANO, MES + 1, 15)), [date(ANO, MES, 21)])
+
+
+class DisponibilidadeMesTest(TestCase):
+    """
+    Férias que atravessam a virada do mês entram só com os dias do mês consultado.
+    """
+
+    def test_bordas_do_mes(self):
+        unidade = Unidade.objects.create(nome="Ferias", portaria="1/2024")
+        f1, f2, f3, f4 = Funcionario.objects.bulk_create([
+            Funcionario(nome_completo=f"Ferias {n}", siape=str(n), cargo="TE", vinculo="EBSERH", ch_semanal=36,
+                        unidade=unidade)
+            for n in range(4)
+        ])
+        Ferias.objects.bulk_create([
+            Ferias(funcionario=f1, data_inicio=date(2024, 1, 25), data_fim=date(2024, 2, 3)),
+            Ferias(funcionario=f2, data_inicio=date(2024, 2, 27), data_fim=date(2024, 3, 5)),
+            Ferias(funcionario=f3, data_inicio=date(2024, 1, 1), data_fim=date(2024, 12, 31)),
+            Ferias(funcionario=f4, data_inicio=date(2024, 3, 1), data_fim=date(2024, 3, 10)),
+        ])
+        # fevereiro de 2024 tem 29 dias
+        disponibilidade = DisponibilidadeMes.dos_funcionarios([f1.id, f2.id, f3.id, f4.id], 2024, 2)
+        self.assertEqual(disponibilidade.dias_de_ferias(f1.id), [1, 2, 3])
+        self.assertEqual(disponibilidade.dias_de_ferias(f2.id), [27, 28, 29])
+        self.assertEqual(disponibilidade.dias_de_ferias(f3.id), list(range(1, 30)))
+        self.assertEqual(disponibilidade.dias_de_ferias(f4.id), [])
+        self.assertEqual(set(disponibilidade.ausencias), {f1.id, f2.id, f3.id})
+        self.assertTrue(disponibilidade.em_ferias(f2.id, 29))
+        self.assertFalse(disponibilidade.em_ferias(f1.id, 4))
+
+        por_dia = disponibilidade.disponiveis_por_dia()
+        self.assertEqual(len(por_dia), 29)
+        self.assertEqual((por_dia[0], por_dia[3], por_dia[26], por_dia[28]), (2, 3, 2, 2))
+
+
+class DoisTurnosNoDiaTest(TestCase):
+    """
+    Duas atribuições no mesmo dia não se sobrepõem: grade, exportação e totais contam as duas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.tarde = Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino")
+        unidade = criar_unidade("Dobra", 1, [cls.manha])
+        cls.escala = Escala.objects.get(unidade=unidade)
+        cls.funcionario = Funcionario.objects.get(unidade=unidade)
+        AtribuicaoEscala.objects.create(escala=cls.escala, funcionario=cls.funcionario, dia=1, tipo_turno=cls.tarde)
+
+    def test_grade_e_exportacao_somam_o_turno_extra(self):
+        num_dias = calendar.monthrange(ANO, MES)[1]
+        matriz = montar_grade(self.escala)["matriz"]
+        linha = matriz.linha(self.funcionario.id)
+        self.assertEqual(linha.total_horas, 6 * num_dias + 6)
+        self.assertEqual(linha.dias_list[0], "M6/T6")
+        totais = matriz.totais()
+        self.assertEqual((totais["matutino"][0], totais["vespertino"][0]), (1, 1))
+        cobertura = cobertura_dos_dias(self.escala, range(1, num_dias + 1))
+        self.assertEqual(totais, {p: [cobertura[dia][p] for dia in range(1, num_dias + 1)] for p in PERIODOS})
+
+        exportada, = linhas_escala(atribuicoes_da_escala(self.escala))
+        self.assertEqual(exportada["horas"], 6 * num_dias + 6)
+        self.assertEqual(exportada["siglas"][0], "M6/T6")
+
+        duplicadas = [v for v in validar_escala(self.escala) if v["regra"] == "dois_turnos_no_dia"]
+        self.assertEqual([v["dias"] for v in duplicadas], [[1]])
+
+    def test_total_da_grade_vem_do_resumo(self):
+        CargaHorariaMensal.objects.create(escala=self.escala, funcionario=self.funcionario, horas=99)
+        linha = montar_grade(self.escala)["matriz"].linha(self.funcionario.id)
+        self.assertEqual(linha.total_horas, 99)
+
+
+class GerarFuncionariosTest(TestCase):
+    """
+    As escalas gravadas em massa pelo comando entram no histórico como as da tela.
+    """
+
+    def test_cada_escala_ganha_a_primeira_versao(self):
+        # ids de escala se repetem entre testes: nada de versões guardadas por outro teste
+        cache.clear()
+        call_command("gerar_funcionarios", "--unidades", 1, "--funcionarios", 3, "--anos", 1, stdout=StringIO())
+        escalas = list(Escala.objects.all())
+        self.assertEqual(len(escalas), 12)
+        self.assertEqual(VersaoEscala.objects.filter(numero=1).count(), 12)
+        for escala in escalas:
+            self.assertEqual(grade_na_versao(escala.id, 1), grade_atual(escala.id))
+
+
+class InvalidacaoPorSinaisTest(TestCase):
+    """
+    Saves e deletes pelo ORM (admin, shell) mudam a versão que invalida os caches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.escala = Escala.objects.get(unidade=criar_unidade("Sinais", 2, [cls.turno]))
+
+    def assertMudaVersao(self, alterar, versao=None):
+        versao = versao or (lambda: versao_escala(self.escala))
+        antes = versao()
+        with self.captureOnCommitCallbacks(execute=True):
+            alterar()
+        self.assertNotEqual(versao(), antes)
+
+    def test_atribuicao(self):
+        atribuicao = AtribuicaoEscala.objects.filter(escala=self.escala).first()
+        self.assertMudaVersao(atribuicao.delete)
+
+    def test_funcionario(self):
+        funcionario = Funcionario.objects.filter(unidade=self.escala.unidade).first()
+        funcionario.nome_completo = "Outro Nome"
+        self.assertMudaVersao(funcionario.save)
+
+    def test_turno(self):
+        self.turno.descricao = "Manhã"
+        self.assertMudaVersao(self.turno.save)
+
+    def test_feriado(self):
+        self.assertMudaVersao(lambda: Feriado.objects.create(data=date(ANO, MES, 21), tipo="FD"), versao_feriados)
+
+    def test_um_incremento_por_transacao(self):
+        # muitas linhas no mesmo commit geram um incremento só por chave
+        chave = f"escala:{self.escala.id}"
+        with self.captureOnCommitCallbacks(execute=True):
+            AtribuicaoEscala.objects.filter(escala=self.escala, dia=1).delete()
+            for atribuicao in AtribuicaoEscala.objects.filter(escala=self.escala, dia=2):
+                atribuicao.delete()
+        self.assertEqual(VersaoCache.objects.get(chave=chave).numero, 1)
+
+
+class GetCondicionalTest(TestCase):
+    """
+    A equipe responde 304 enquanto nada muda e 200 depois de qualquer alteração.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        turno = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.unidade = criar_unidade("Condicional", 3, [turno])
+        cls.url = f"/escalas/escala/api/funcionarios/?unidade={cls.unidade.id}&cargo=TE"
+
+    def test_304_ate_a_equipe_mudar(self):
+        primeira = self.client.get(self.url)
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual(len(primeira.json()), 3)
+        etag = primeira["ETag"]
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Funcionario.objects.filter(unidade=self.unidade).first().delete()
+        depois = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(depois.status_code, 200)
+        self.assertEqual(len(depois.json()), 2)
+
+
+class SalvarGradeTest(TestCase):
+    """
+    salvar_grade só toca as células enviadas e registra exatamente o que mudou.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.tarde = Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino")
+        cls.escala = Escala.objects.get(unidade=criar_unidade("Diff", 2, [cls.manha]))
+        cls.f1, cls.f2 = Funcionario.objects.filter(unidade=cls.escala.unidade).order_by("id")
+
+    def test_diff(self):
+        registrar_versao(self.escala, origem="teste")
+        AtribuicaoEscala.objects.filter(escala=self.escala, funcionario=self.f2, dia=3).delete()
+        resultado = salvar_grade(self.escala, {
+            (self.f1.id, 1): self.tarde.id,  # troca
+            (self.f1.id, 2): self.manha.id,  # igual: não conta
+            (self.f1.id, 3): None,  # remove
+            (self.f2.id, 3): self.tarde.id,  # cria
+        })
+        self.assertEqual((resultado["criadas"], resultado["atualizadas"], resultado["removidas"]), (1, 1, 1))
+        self.assertEqual(resultado["funcionarios"], {self.f1.id, self.f2.id})
+        self.assertEqual(resultado["dias"], {1, 3})
+
+        versao = VersaoEscala.objects.get(escala=self.escala, numero=2)
+        self.assertEqual(trincas(versao.adicionadas), {(self.f1.id, 1, self.tarde.id), (self.f2.id, 3, self.tarde.id)})
+        self.assertEqual(trincas(versao.removidas), {(self.f1.id, 1, self.manha.id), (self.f1.id, 3, self.manha.id)})
+        self.assertEqual(
+            CargaHorariaMensal.objects.get(escala=self.escala, funcionario=self.f1).horas,
+            6 * (calendar.monthrange(ANO, MES)[1] - 1),
+        )
+
+    def test_sem_mudanca_nao_grava(self):
+        resultado = salvar_grade(self.escala, {(self.f1.id, 1): self.manha.id})
+        self.assertEqual(resultado["funcionarios"], set())
+        self.assertFalse(VersaoEscala.objects.filter(escala=self.escala).exists())
+
+    def test_dois_turnos_sobrevivem_ao_formulario(self):
+        # o formulário reenvia a grade inteira: a célula M6/T6 tem que voltar igual
+        AtribuicaoEscala.objects.create(escala=self.escala, funcionario=self.f1, dia=4, tipo_turno=self.tarde)
+        cache.clear()
+        url = f"{reverse('cadastrar_escala')}?unidade={self.escala.unidade_id}&mes={MES}&ano={ANO}"
+        html = self.client.get(url).content.decode()
+        dados = {"unidade": self.escala.unidade_id, "mes": MES, "ano": ANO}
+        for nome, opcoes in re.findall(r'<select name="(turno_\d+_\d+)"(.*?)</select>', html, re.S):
+            dados[nome] = re.findall(r'<option value="(\d+)"[^>]*selected', opcoes)
+        for nome, valor in re.findall(r'<input type="hidden" name="(turno_\d+_\d+)" value="(\d+)">', html):
+            dados[nome].append(valor)
+        self.assertEqual(sorted(dados[f"turno_{self.f1.id}_4"]), sorted([str(self.manha.id), str(self.tarde.id)]))
+
+        self.client.post(reverse("cadastrar_escala"), dados)
+        self.assertEqual(
+            set(AtribuicaoEscala.objects.filter(escala=self.escala, funcionario=self.f1, dia=4)
+                .values_list("tipo_turno_id", flat=True)),
+            {self.manha.id, self.tarde.id},
+        )
+        self.assertFalse(VersaoEscala.objects.filter(escala=self.escala).exists())
+
+    def test_celula_com_varios_turnos(self):
+        resultado = salvar_grade(self.escala, {(self.f1.id, 5): [self.manha.id, self.tarde.id]})
+        self.assertEqual((resultado["criadas"], resultado["atualizadas"], resultado["removidas"]), (1, 0, 0))
+        # sai o M6 e fica o T6: o registro do M6 é removido, o do T6 não muda
+        resultado = salvar_grade(self.escala, {(self.f1.id, 5): [self.tarde.id]})
+        self.assertEqual((resultado["criadas"], resultado["atualizadas"], resultado["removidas"]), (0, 0, 1))
+        self.assertEqual(
+            list(AtribuicaoEscala.objects.filter(escala=self.escala, funcionario=self.f1, dia=5)
+                 .values_list("tipo_turno_id", flat=True)),
+            [self.tarde.id],
+        )
+
+
+
+class VersoesTest(TestCase):
+    """
+    Qualquer versão do histórico é reconstruída igual à grade do momento em que foi registrada.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.tarde = Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino")
+        cls.escala = Escala.objects.get(unidade=criar_unidade("Historico", 2, [cls.manha]))
+        cls.funcionario = Funcionario.objects.filter(unidade=cls.escala.unidade).first()
+
+    def test_ida_e_volta(self):
+        cache.clear()
+        registrar_versao(self.escala)
+        grades = {1: grade_atual(self.escala.id)}
+        # passa de uma versão-base (a cada VERSOES_POR_BASE) e volta a diffs
+        for numero in range(2, VERSOES_POR_BASE + 4):
+            celulas = {(self.funcionario.id, 10): (self.tarde if numero % 2 == 0 else self.manha).id}
+            if numero == 2:
+                celulas[(self.funcionario.id, 30)] = None
+            salvar_grade(self.escala, celulas)
+            grades[numero] = grade_atual(self.escala.id)
+        self.assertEqual(VersaoEscala.objects.filter(escala=self.escala).count(), len(grades))
+        self.assertEqual(VersaoEscala.objects.filter(escala=self.escala, grade__isnull=False).count(), 2)
+
+        cache.clear()
+        for numero, grade in grades.items():
+            self.assertEqual(grade_na_versao(self.escala.id, numero), grade, f"versão {numero}")
+        self.assertIsNone(grade_na_versao(self.escala.id, len(grades) + 1))
+
+        diferencas = comparar_versoes(self.escala.id, 1, 2)
+        self.assertEqual(
+            [(d["dia"], d["antes"], d["depois"], d["tipo"]) for d in diferencas],
+            [(10, ["M6"], ["T6"], "alterada"), (30, ["M6"], [], "removida")],
+        )
+
+
+class CopiaDoMesTest(TestCase):
+    """
+    A cópia do mês anterior leva cada célula para o dia certo do novo mês.
+    """
+
+    def test_mapa_pelo_dia_da_semana(self):
+        mapa = mapa_de_dias(MES + 1, ANO, SEMANA)
+        self.assertEqual(sorted(mapa), list(range(1, 32)))
+        for dia, origem in mapa.items():
+            self.assertTrue(1 <= origem <= 30)
+            self.assertEqual(date(ANO, MES + 1, dia).weekday(), date(ANO, MES, origem).weekday(), dia)
+
+    def test_mapa_continuando_o_rodizio(self):
+        # 12x36: o dia 1 de maio segue o ciclo de 2 dias que terminou em 30 de abril
+        mapa = mapa_de_dias(MES + 1, ANO, CICLO, ciclo=2)
+        self.assertEqual((mapa[1], mapa[2], mapa[31]), (29, 30, 29))
+        for dia, origem in mapa.items():
+            self.assertEqual((30 + dia - origem) % 2, 0)
+        with self.assertRaises(ValueError):
+            mapa_de_dias(MES + 1, ANO, CICLO, ciclo=31)
+
+    def test_copia_segue_o_mapa(self):
+        turnos = [
+            Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino"),
+            Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino"),
+            Turno.objects.create(sigla="N12", descricao="Noturno", horas=12, periodo="noturno"),
+        ]
+        unidade = criar_unidade("Copia", 2, turnos)
+        resultado = copiar_mes(MES + 1, ANO, [unidade.id])
+        self.assertEqual(resultado["criadas"], 2 * 31)
+
+        origem = dict(((f, d), t) for f, d, t in grade_atual(Escala.objects.get(unidade=unidade, mes=MES).id))
+        destino = grade_atual(resultado["escalas"][unidade.id])
+        mapa = mapa_de_dias(MES + 1, ANO, SEMANA)
+        self.assertEqual(destino, {(f, d, origem[(f, mapa[d])]) for f, _ in origem for d in mapa})
+
+        versao = VersaoEscala.objects.get(escala_id=resultado["escalas"][unidade.id])
+        self.assertEqual((versao.numero, versao.origem), (1, "copia"))
+        self.assertEqual(grade_na_versao(versao.escala_id, 1), destino)
+
+
+class ValidarAlteracoesTest(TestCase):
+    """
+    A validação incremental reavalia as células cuja janela alcança a alteração, a linha
+    do funcionário e a coluna do dia, e nada além disso.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.noite = Turno.objects.create(sigla="N12", descricao="Noturno", horas=12, periodo="noturno")
+        cls.escala = Escala.objects.get(unidade=criar_unidade("Validar", 3, [cls.manha]))
+        cls.f1, cls.f2, _ = Funcionario.objects.filter(unidade=cls.escala.unidade).order_by("id")
+        # f2 já tem uma violação fora do escopo (noturno no dia 20 seguido de M6)
+        AtribuicaoEscala.objects.filter(escala=cls.escala, funcionario=cls.f2, dia=20).update(tipo_turno=cls.noite)
+        AtribuicaoEscala.objects.filter(escala=cls.escala, funcionario=cls.f1, dia=9).update(tipo_turno=cls.noite)
+
+    def test_escopo(self):
+        resultado = validar_alteracoes(self.escala, {(self.f1.id, 10)})
+        self.assertEqual(resultado["escopo"]["celulas"], [[self.f1.id, 9], [self.f1.id, 10]])
+        self.assertEqual(resultado["escopo"]["funcionarios"], [self.f1.id])
+        self.assertEqual(resultado["escopo"]["dias"], [10])
+
+        violacoes = resultado["violacoes"]
+        self.assertIn(("descanso_apos_noturno", self.f1.id, 9), [(v["regra"], v["funcionario"], v["ancora"]) for v in violacoes])
+        self.assertTrue(all(v["funcionario"] in (self.f1.id, None) for v in violacoes))
+        self.assertTrue(all(v["ancora"] == 10 for v in violacoes if v["funcionario"] is None))
+
+        completa = validar_escala(self.escala)
+        self.assertIn("descanso_apos_noturno", [v["regra"] for v in completa if v["funcionario"] == self.f2.id])
+
+    def test_minimos_da_unidade(self):
+        # 3 profissionais de manhã por dia: abaixo do mínimo só se a unidade pedir mais
+        def faltas(**kwargs):
+            return [v for v in validar_escala(self.escala, **kwargs) if v["regra"] == "cobertura_minima"]
+
+        self.assertNotIn("matutino do dia 1 ", " ".join(v["mensagem"] for v in faltas()))
+        Unidade.objects.filter(id=self.escala.unidade_id).update(cobertura_minima={"matutino": 4})
+        self.assertIn("3 profissional(is) no matutino do dia 1 (mínimo 4)", [v["mensagem"] for v in faltas()])
+        # o informado na chamada vale sobre o da unidade
+        self.assertNotIn("matutino do dia 1 ", " ".join(v["mensagem"] for v in faltas(cobertura_minima={"matutino": 3})))
+
+
+class BarramentoGravado(BarramentoLocal):
+    # sempre com uma página inscrita; guarda o que seria entregue
+    def __init__(self):
+        super().__init__()
+        self.publicados = []
+
+    def assinantes(self, canal):
+        return 1
+
+    def publicar(self, canal, evento):
+        self.publicados.append((canal, evento))
+
+
+class EventosAoVivoTest(TestCase):
+    """
+    As páginas abertas só recebem o que foi gravado, e uma página lenta é mandada recarregar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manha = Turno.objects.create(sigla="M6", descricao="Matutino", horas=6, periodo="matutino")
+        cls.tarde = Turno.objects.create(sigla="T6", descricao="Vespertino", horas=6, periodo="vespertino")
+        cls.escala = Escala.objects.get(unidade=criar_unidade("Eventos", 1, [cls.manha]))
+        cls.funcionario = Funcionario.objects.get(unidade=cls.escala.unidade)
+
+    def test_publica_depois_do_commit(self):
+        gravado = BarramentoGravado()
+        with mock.patch.object(eventos, "_barramento", gravado):
+            with self.captureOnCommitCallbacks(execute=True):
+                salvar_grade(self.escala, {(self.funcionario.id, 5): self.tarde.id})
+                self.assertEqual(gravado.publicados, [])
+        canais = {canal for canal, _ in gravado.publicados}
+        self.assertEqual(canais, {canal_escala(self.escala.id)})
+        celulas = [evento for _, evento in gravado.publicados if evento["tipo"] == "celulas"]
+        self.assertEqual(celulas[0]["celulas"], [{"funcionario": self.funcionario.id, "dia": 5, "turnos": ["T6"]}])
+
+    def test_celula_com_dois_turnos_vai_inteira(self):
+        gravado = BarramentoGravado()
+        with mock.patch.object(eventos, "_barramento", gravado):
+            with self.captureOnCommitCallbacks(execute=True):
+                salvar_grade(self.escala, {(self.funcionario.id, 5): [self.manha.id, self.tarde.id]})
+        celulas = [evento for _, evento in gravado.publicados if evento["tipo"] == "celulas"]
+        self.assertEqual(celulas[0]["celulas"], [{"funcionario": self.funcionario.id, "dia": 5, "turnos": ["M6", "T6"]}])
+
+    def test_transacao_desfeita_nao_publica(self):
+        gravado = BarramentoGravado()
+        with mock.patch.object(eventos, "_barramento", gravado):
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        salvar_grade(self.escala, {(self.funcionario.id, 5): self.tarde.id})
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.assertEqual(gravado.publicados, [])
+
+    def test_fila_cheia_vira_recarregar(self):
+        async def cenario():
+            local = BarramentoLocal()
+            assinatura = local.assinar("escala:1")
+            for n in range(TAMANHO_FILA + 1):
+                local.publicar("escala:1", {"tipo": "celulas", "n": n})
+            await asyncio.sleep(0)
+            recebidos = [await assinatura.proximo(0.1)]
+            recebidos.append(await assinatura.proximo(0.01))
+            assinatura.cancelar()
+            return recebidos, local.assinantes("escala:1")
+
+        recebidos, assinantes = asyncio.run(cenario())
+        self.assertEqual(recebidos, [{"tipo": "recarregar"}, None])
+        self.assertEqual(assinantes, 0)
+
+    def test_wsgi_responde_501(self):
+        resposta = self.client.get(f"/escalas/escala/{self.escala.id}/eventos/")
+        self.assertEqual(resposta.status_code, 501)
+        self.assertEqual(resposta.json()["status"], "error")
@@ -0,0 +1,30 @@
+from django.db.models import Count
+
+from core.models import AtribuicaoEscala
+
+# Períodos que aparecem nas linhas de totais das escalas
+PERIODOS = ("matutino", "vespertino", "noturno")
+
+
+def totais_vazios(num_dias):
+    return {periodo: [0] * num_dias for periodo in PERIODOS}
+
+
+def cobertura_dos_dias(escala, dias):
+    """
+    Totais por período só dos dias informados, numa consulta agrupada.
+    Retorna {dia: {"matutino": qtd, "vespertino": qtd, "noturno": qtd}}.
+    """
+    cobertura = {dia: {periodo: 0 for periodo in PERIODOS} for dia in dias}
+    linhas = (
+        AtribuicaoEscala.objects.filter(escala=escala, dia__in=dias)
+        .values("dia", "tipo_turno__periodo")
+        .annotate(qtd=Count("id"))
+        .order_by()
+    )
+    for linha in linhas:
+        periodo = (linha["tipo_turno__periodo"] or "").strip().lower()
+        if periodo in PERIODOS:
+            cobertura[linha["dia"]][periodo] += linha["qtd"]
+    return cobertura
+
@@ -5,12 +5,29 @@ urlpatterns = [
     path('escala/<int:unidade_id>/<int:mes>/<int:ano>/', views.gerar_escala, name='gerar_escala'),
     #path('cadastrar/', views.cadastrar_escala, name='cadastrar_escala'),
     path('escala/<int:unidade_id>/<int:mes>/<int:ano>/', views.gerar_escala, name='escala_detalhe'),
-    path('escala/api/funcionarios/', views.get_funcionarios, name='get_funcionarios'),
+    path('escala/api/funcionarios/', views.api_funcionarios, name='get_funcionarios'),
     path('cobertura/', views.cobertura, name='cobertura'),
     path('ver_escalas/', views.ver_escalas, name='ver_escalas'),
 
     path('escalas/escala/cadastrar/', views.EscalaCreateView.as_view(), name='cadastrar_escala'),
     path('escalas/escala/api/funcionarios/', views.api_funcionarios, name='api_funcionarios'),
+    path('escala/api/<int:unidade_id>/<int:mes>/<int:ano>/celulas/', views.api_salvar_celulas, name='api_salvar_celulas'),
+    path('escala/api/<int:unidade_id>/<int:mes>/<int:ano>/validar/', views.api_validar_escala, name='api_validar_escala'),
+    path('escala/<int:unidade_id>/<int:mes>/<int:ano>/copiar/', views.copiar_escala, name='copiar_escala'),
+    path('escala/api/<int:unidade_id>/<int:mes>/<int:ano>/gerar/', views.api_enfileirar_geracao, name='api_enfileirar_geracao'),
+    path('escala/api/<int:escala_id>/recalcular/', views.api_enfileirar_recalculo, name='api_enfileirar_recalculo'),
+    path('tarefas/<int:tarefa_id>/', views.api_tarefa, name='api_tarefa'),
+    path('exportar/escala/<int:escala_id>.<str:formato>', views.exportar_escala, name='exportar_escala'),
+    path('exportar/<int:mes>/<int:ano>.<str:formato>', views.exportar_mes, name='exportar_mes'),
+    path('analise/', views.painel_analise, name='painel_analise'),
+    path('analise/api/', views.api_analise, name='api_analise'),
+    path('desempenho/', views.painel_desempenho, name='painel_desempenho'),
+    path('escala/<int:escala_id>/pdf/', views.escala_pdf, name='escala_pdf'),
+    path('escala/<int:escala_id>/eventos/', views.eventos_escala, name='eventos_escala'),
+    path('escala/<int:escala_id>/historico/', views.historico_escala, name='historico_escala'),
+    path('escala/api/<int:escala_id>/versoes/<int:numero>/', views.api_versao_escala, name='api_versao_escala'),
+    path('exportar/periodo.<str:formato>', views.exportar_periodo, name='exportar_periodo'),
+    path('exportar/tarefa/<int:tarefa_id>.xlsx', views.baixar_exportacao, name='baixar_exportacao'),
     
     
 ]
\ No newline at end of file
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Subquery
+
+from core.models import AtribuicaoEscala, Escala, Turno, VersaoEscala
+
+from .cache import TEMPO_CACHE, cache_escalas
+
+# A cada K versões a grade inteira é guardada: abrir qualquer versão aplica no máximo K - 1 diffs
+VERSOES_POR_BASE = getattr(settings, "ESCALAS_VERSOES_POR_BASE", 20)
+
+
+def _achatar(celulas):
+    # {(funcionario_id, dia, turno_id), ...} -> [f, d, t, f, d, t, ...] ordenado
+    return [valor for celula in sorted(celulas) for valor in celula]
+
+
+def _celulas(lista):
+    return {tuple(lista[i:i + 3]) for i in range(0, len(lista or []), 3)}
+
+
+def grade_atual(escala_id):
+    return set(AtribuicaoEscala.objects.filter(escala_id=escala_id).order_by().values_list(
+        "funcionario_id", "dia", "tipo_turno_id"
+    ))
+
+
+def registrar_versao(escala, adicionadas=None, removidas=None, autor="", origem=""):
+    """
+    Registra uma versão da escala depois de uma gravação. Quem já sabe o que mudou
+    (salvar_grade) passa `adicionadas`/`removidas` como {(funcionario_id, dia, turno_id)};
+    sem elas o diff sai da comparação da grade no banco com a última versão.
+    A primeira versão e cada K-ésima seguinte guardam a grade inteira, o que também
+    corrige qualquer alteração feita por fora (admin). Retorna a VersaoEscala ou None
+    se nada mudou.
+    """
+    with transaction.atomic():
+        # uma gravação por vez numera as versões da escala
+        list(Escala.objects.select_for_update().filter(id=escala.id).values_list("id"))
+        numeros = VersaoEscala.objects.filter(escala_id=escala.id).aggregate(
+            ultima=Max("numero"), base=Max("numero", filter=Q(grade__isnull=False)),
+        )
+        ultima = numeros["ultima"] or 0
+        numero = ultima + 1
+        com_grade = not ultima or numero - (numeros["base"] or 0) >= VERSOES_POR_BASE
+
+        atual = None
+        if adicionadas is None:
+            atual = grade_atual(escala.id)
+            anterior = grade_na_versao(escala.id, ultima) if ultima else set()
+            adicionadas, removidas = atual - anterior, anterior - atual
+        adicionadas, removidas = set(adicionadas), set(removidas or ())
+        if ultima and not adicionadas and not removidas:
+            return None
+        if com_grade and atual is None:
+            atual = grade_atual(escala.id)
+
+        return VersaoEscala.objects.create(
+            escala_id=escala.id, numero=numero, autor=autor[:150], origem=origem[:30],
+            adicionadas=_achatar(adicionadas), removidas=_achatar(removidas),
+            grade=_achatar(atual) if com_grade else None,
+        )
+
+
+def grade_na_versao(escala_id, numero):
+    """
+    Células {(funcionario_id, dia, turno_id)} da escala na versão `numero`: a última
+    versão-base até ela mais os diffs seguintes, numa consulta. Versões não mudam, então
+    o resultado fica em cache. None se a versão não existe.
+    """
+    chave = f"escalas:versao_grade:{escala_id}:{numero}"
+    cache = cache_escalas()
+    achatada = cache.get(chave)
+    if achatada is not None:
+        return _celulas(achatada)
+
+    base = (
+        VersaoEscala.objects.filter(escala_id=escala_id, numero__lte=numero, grade__isnull=False)
+        .order_by("-numero").values("numero")[:1]
+    )
+    versoes = list(
+        VersaoEscala.objects.filter(escala_id=escala_id, numero__gte=Subquery(base), numero__lte=numero)
+        .order_by("numero").values_list("numero", "adicionadas", "removidas", "grade")
+    )
+    if not versoes or versoes[-1][0] != numero:
+        return None
+    celulas = _celulas(versoes[0][3])
+    for _, adicionadas, removidas, _ in versoes[1:]:
+        celulas -= _celulas(removidas)
+        celulas |= _celulas(adicionadas)
+    cache.set(chave, _achatar(celulas), TEMPO_CACHE)
+    return celulas
+
+
+def versao_em(escala_id, quando):
+    """
+    Número da versão vigente no instante `quando` (a última criada até ele), ou None.
+    """
+    return (
+        VersaoEscala.objects.filter(escala_id=escala_id, criada_em__lte=quando)
+        .order_by("-numero").values_list("numero", flat=True).first()
+    )
+
+
+def _por_celula(celulas):
+    agrupadas = {}
+    for func_id, dia, turno_id in celulas:
+        agrupadas.setdefault((func_id, dia), set()).add(turno_id)
+    return agrupadas
+
+
+def comparar_versoes(escala_id, numero_a, numero_b):
+    """
+    Diferenças da versão A para a B, por célula, em ordem de funcionário e dia:
+    [{"funcionario", "dia", "antes": [siglas], "depois": [siglas], "tipo": adicionada/removida/alterada}].
+    None se uma das versões não existe.
+    """
+    grade_a = grade_na_versao(escala_id, numero_a)
+    grade_b = grade_na_versao(escala_id, numero_b)
+    if grade_a is None or grade_b is None:
+        return None
+    antes, depois = _por_celula(grade_a - grade_b), _por_celula(grade_b - grade_a)
+    # só as células que mudaram; o que sobrou igual nelas entra nas duas listas de siglas
+    iguais = _por_celula(grade_a & grade_b)
+    siglas = dict(Turno.objects.values_list("id", "sigla"))
+    diferencas = []
+    for func_id, dia in sorted(set(antes) | set(depois)):
+        mantidos = iguais.get((func_id, dia), set())
+        turnos_antes = antes.get((func_id, dia), set()) | mantidos
+        turnos_depois = depois.get((func_id, dia), set()) | mantidos
+        diferencas.append({
+            "funcionario": func_id,
+            "dia": dia,
+            "antes": sorted(siglas.get(t, "?") for t in turnos_antes),
+            "depois": sorted(siglas.get(t, "?") for t in turnos_depois),
+            "tipo": "adicionada" if not turnos_antes else "removida" if not turnos_depois else "alterada",
+        })
+    return diferencas
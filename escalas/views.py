@@ -1,19 +1,43 @@
-from django.shortcuts import render, redirect
-from core.models import Escala, AtribuicaoEscala, Funcionario, Turno, Unidade
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.contrib import messages
-from django.shortcuts import render, get_object_or_404
-from django.http import Http404
-import calendar
-from datetime import datetime, date, timedelta
-
-
+import json
+from datetime import date, datetime, time
 
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse, Http404, JsonResponse, QueryDict, StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition, require_POST
 from django.views.generic import View
-from django.http import JsonResponse
-from django.views.decorators.cache import cache_page
-from datetime import date, datetime
+
+from core.models import Escala, Funcionario, Tarefa, Turno, Unidade, VersaoEscala
+
+from .analise import analisar, analise_disponivel
+from .artefatos import caminho_artefato
+from .calendario import dias_no_mes, mes_calendario, ultimo_dia
+from .carga_horaria import horas_mensais, recalcular_escala
+from .copia import CICLO_PADRAO, SEMANA, copiar_mes
+from .desempenho import registro, resumo_por_view
+from .disponibilidade import DisponibilidadeMes
+from .equipe import etag_equipe, listar_equipe, modificada_em
+from .eventos import barramento, canal_escala
+from .exportacao import (
+    atribuicoes_da_escala, atribuicoes_do_mes, atribuicoes_do_periodo, dias_do_periodo, gerar_csv, gerar_xlsx,
+    xlsxwriter,
+)
+from .grade import cobertura_da_escala, contexto_grade, escala_do_mes, grade_da_escala
+from .gravacao import mapa_turnos, salvar_grade
+from .pdf import chave_pdf, pdf_da_escala, pdf_disponivel
+from .regras import ERRO, validar_alteracoes, validar_escala
+from .tarefas import dados_tarefa, enfileirar
+from .totais import PERIODOS, cobertura_dos_dias
+from .versoes import comparar_versoes, grade_na_versao, versao_em
 
 
 class EscalaCreateView(View):
@@ -27,133 +51,142 @@ class EscalaCreateView(View):
         unidade_id = request.GET.get('unidade')
         cargo = request.GET.get('cargo')
 
-        funcionarios = []
+        mes_atual, ano_atual = int(mes_atual), int(ano_atual)
+        total_dias = dias_no_mes(ano_atual, mes_atual)
+        escala = None
         if unidade_id:
-            funcionarios = Funcionario.objects.all().order_by('nome_completo')
-            funcionarios = funcionarios.filter(unidade_id=unidade_id)
-        
-        if cargo:
-            funcionarios = funcionarios.filter(cargo=cargo)
-
-        # Gerar dias do mês
-        total_dias = (datetime(int(ano_atual), int(mes_atual) + 1, 1) - datetime(int(ano_atual), int(mes_atual), 1)).days
-        dias = [f"{str(d).zfill(2)}/{str(mes_atual).zfill(2)}" for d in range(1, total_dias + 1)]
-        dias_numericos = [str(d) for d in range(1, total_dias + 1)]  # Para depuração
-
+            escala = escala_do_mes(unidade_id, mes_atual, ano_atual)
+
+        def funcionarios_com_turnos():
+            if not unidade_id:
+                return []
+            funcionarios = Funcionario.objects.filter(unidade_id=unidade_id).order_by('nome_completo')
+            if cargo:
+                funcionarios = funcionarios.filter(cargo=cargo)
+            # Preenche a grade com o que já está salvo, para o reenvio não apagar células
+            funcionarios = list(funcionarios)
+            matriz = grade_da_escala(escala, total_dias)["matriz"]
+            for func in funcionarios:
+                linha = matriz.linha(func.id)
+                # o primeiro turno vai no select, os demais do dia em campos ocultos
+                func.celulas_dias = linha.celulas_dias if linha else [(None, [])] * total_dias
+            return funcionarios
+
+        grade = contexto_grade(escala, unidade_id, mes_atual, ano_atual)
         context = {
             'unidades': unidades,
             'turnos': turnos,
-            'funcionarios': funcionarios,
-            'mes_atual': int(mes_atual),
-            'ano_atual': int(ano_atual),
-            'dias': dias,
-            'dias_numericos': dias_numericos,
+            # só consultado se o fragmento das linhas não estiver em cache
+            'funcionarios': SimpleLazyObject(funcionarios_com_turnos),
+            'mes_atual': mes_atual,
+            'ano_atual': ano_atual,
+            'dias_cabecalho': grade['dias_cabecalho'],
+            'chave_grade': f"{grade['chave_grade']}:{cargo or ''}",
+            'tempo_grade': grade['tempo_grade'],
             'cargo': cargo,
+            'unidade_id': unidade_id,
+            'escala': escala,
         }
         return render(request, self.template_name, context)
 
     def post(self, request):
-        observacoes = request.POST.get('observacoes')
-        unidade_id = request.GET.get('unidade')
-        mes = int(request.GET.get('mes', date.today().month))
-        ano = int(request.GET.get('ano', date.today().year))
-        total_dias = (datetime(ano, mes + 1, 1) - datetime(ano, mes, 1)).days
-
-        # Criar escala
-        escala = Escala.objects.create(
-            data_inicio=date(ano, mes, 1),
-            data_fim=date(ano, mes, total_dias),
-            observacoes=observacoes
+        observacoes = request.POST.get('observacoes', '')
+        unidade_id = request.POST.get('unidade') or request.GET.get('unidade')
+        mes = int(request.POST.get('mes') or request.GET.get('mes') or date.today().month)
+        ano = int(request.POST.get('ano') or request.GET.get('ano') or date.today().year)
+        total_dias = dias_no_mes(ano, mes)
+        unidade = get_object_or_404(Unidade, id=unidade_id)
+
+        # Processar alocações: cada célula envia o id de todos os seus turnos
+        # (o select e, num dia com mais de um turno, os campos ocultos)
+        turnos = mapa_turnos("id")
+        celulas = {}
+        for key, values in request.POST.lists():
+            if key.startswith('turno_'):
+                parts = key.split('_')
+                if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+                    dia = int(parts[2])
+                    if 1 <= dia <= total_dias:
+                        celulas[(int(parts[1]), dia)] = [turnos.get(value) for value in values]
+
+        escala, criada = Escala.objects.get_or_create(
+            unidade=unidade, mes=mes, ano=ano, defaults={'observacoes': observacoes}
         )
+        if not criada and observacoes and observacoes != escala.observacoes:
+            escala.observacoes = observacoes
+            escala.save(update_fields=['observacoes'])
 
-        # Processar alocações
-        for key, value in request.POST.items():
-            if key.startswith('turno_') and value:
-                parts = key.split('_')
-                if len(parts) == 3:
-                    _, func_id, dia_str = parts
-                    dia = int(dia_str)
-                    turno = Turno.objects.get(id=value)
-                    AtribuicaoEscala.objects.create(
-                        escala=escala,
-                        funcionario_id=func_id,
-                        turno=turno,
-                        data=date(ano, mes, dia),
-                        duracao=turno.horas
-                    )
+        salvar_grade(escala, celulas, autor=request.user.get_username())
 
         messages.success(request, 'Escala salva com sucesso!')
-        return redirect('cadastrar_escala')
+        return redirect(f"{reverse('cadastrar_escala')}?unidade={unidade.id}&mes={mes}&ano={ano}&cargo={request.POST.get('cargo', '')}")
 
-@cache_page(60 * 15)
-def api_funcionarios(request):
-    unidade_id = request.GET.get('unidade')
-    cargo = request.GET.get('cargo')
+def _unidade_e_cargo(request):
+    return request.GET.get('unidade'), request.GET.get('cargo') or None
 
-    queryset = Funcionario.objects.filter(unidade_id=unidade_id)
-    if cargo:
-        queryset = queryset.filter(cargo=cargo)
 
-    funcionarios = list(queryset.values('id', 'nome_completo', 'siape', 'registro_conselho', 'cargo', 'vinculo', 'ch_semanal'))
-    return JsonResponse(funcionarios, safe=False)
+def _etag_funcionarios(request):
+    unidade_id, cargo = _unidade_e_cargo(request)
+    return etag_equipe(unidade_id, cargo) if unidade_id else None
 
 
-def gerar_escala(request, unidade_id, mes, ano):
-    
-    try:
-        unidade = Unidade.objects.get(id=unidade_id)
-    except Unidade.DoesNotExist:
-        raise Http404("A unidade solicitada não existe. Por favor, adicione uma unidade com ID {} no admin.".format(unidade_id))
+def _ultima_alteracao_funcionarios(request):
+    unidade_id, cargo = _unidade_e_cargo(request)
+    return modificada_em(unidade_id, cargo) if unidade_id else None
 
-    escala = get_object_or_404(Escala, unidade_id=unidade_id, mes=mes, ano=ano)
-    atribuicoes = AtribuicaoEscala.objects.filter(escala=escala).select_related("funcionario", "tipo_turno")
 
-    num_days = calendar.monthrange(ano, mes)[1]
-    days = [date(ano, mes, d) for d in range(1, num_days + 1)]
+@condition(etag_func=_etag_funcionarios, last_modified_func=_ultima_alteracao_funcionarios)
+def api_funcionarios(request):
+    """
+    Equipe da unidade (filtrada por cargo) para montar a grade.
+    Responde 304 quando o navegador já tem a versão atual.
+    """
+    unidade_id, cargo = _unidade_e_cargo(request)
+    if not unidade_id:
+        return JsonResponse({'error': 'Unidade não especificada'}, status=400)
 
-    # Monta estrutura por funcionário
-    funcionarios_dict = {}
-    for atrib in atribuicoes:
-        func = atrib.funcionario
-        
-        if func.id not in funcionarios_dict:
-            funcionarios_dict[func.id] = {
-                "funcionario": func,
-                "dias": {d.day: "" for d in days},  # todos os dias em branco
-                "total_horas": 0,
-            }
+    funcionarios, _ = listar_equipe(unidade_id, cargo)
+    response = JsonResponse(funcionarios, safe=False)
+    # o navegador guarda, mas sempre revalida (ETag/Last-Modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-        funcionarios_dict[func.id]["dias"][atrib.dia] = atrib.tipo_turno.codigo
 
-        funcionarios_dict[func.id]["dias_list"] = [
-            funcionarios_dict[func.id]["dias"][d.day] for d in days
-        ]
-        
-        if hasattr(atrib.tipo_turno, "duracao_horas"):
-            funcionarios_dict[func.id]["total_horas"] += int(atrib.tipo_turno.duracao_horas)
+# Quantas pendências do gerador aparecem como mensagem
+MAX_PENDENCIAS_EXIBIDAS = 15
 
-    funcionarios = list(funcionarios_dict.values())
 
+def gerar_escala(request, unidade_id, mes, ano):
     
+    try:
+        unidade = Unidade.objects.get(id=unidade_id)
+    except Unidade.DoesNotExist:
+        raise Http404("A unidade solicitada não existe. Por favor, adicione uma unidade com ID {} no admin.".format(unidade_id))
 
-    # totais por turno (igual já tínhamos)
-    totals = {"matutino": [], "vespertino": [], "noturno": []}
-    for day in days:
-        totals["matutino"].append(
-            atribuicoes.filter(dia=day.day, tipo_turno__codigo__startswith="M").count()
-        )
-        totals["vespertino"].append(
-            atribuicoes.filter(dia=day.day, tipo_turno__codigo__startswith="T").count()
-        )
-        totals["noturno"].append(
-            atribuicoes.filter(dia=day.day, tipo_turno__codigo__startswith="N").count()
-        )
+    if request.method == 'POST':
+        # A geração roda na fila (processar_tarefas); a página acompanha a tarefa e recarrega ao fim
+        tarefa = _enfileirar_geracao(request, unidade_id, mes, ano)
+        return redirect(f"{reverse('escala_detalhe', args=[unidade_id, mes, ano])}?tarefa={tarefa.id}")
+
+    tarefa = None
+    tarefa_id = request.GET.get('tarefa', '')
+    if tarefa_id.isdigit():
+        tarefa = Tarefa.objects.filter(id=tarefa_id, tipo='gerar_escala').first()
+    if tarefa is not None and tarefa.status == Tarefa.CONCLUIDA:
+        _mensagens_da_geracao(request, tarefa.resultado)
+        tarefa = None
+    elif tarefa is not None and tarefa.status == Tarefa.FALHOU:
+        messages.warning(request, f"A geração falhou: {dados_tarefa(tarefa)['erro']}")
+        tarefa = None
+
+    # Sem escala cadastrada mostra a grade vazia, com a opção de gerar
+    escala = escala_do_mes(unidade_id, mes, ano) or Escala(unidade=unidade, mes=mes, ano=ano)
 
     context = {
         "escala": escala,
-        "days": days,
-        "funcionarios": funcionarios,  # <- agora passamos estruturado
-        "totals": totals,
+        "tarefa": dados_tarefa(tarefa) if tarefa else None,
+        "url_tarefa": reverse('api_tarefa', args=[tarefa.id]) if tarefa else "",
+        **contexto_grade(escala, unidade_id, mes, ano),
     }
     return render(request, "escalas/escala_detalhe.html", context)
 
@@ -164,7 +197,7 @@ def cadastrar_escala(request):
 
     mes_atual = 4  # Abril como exemplo
     ano_atual = 2025
-    dias = range(1, calendar.monthrange(ano_atual, mes_atual)[1] + 1)
+    dias = range(1, dias_no_mes(ano_atual, mes_atual) + 1)
     
     cargos_unicos = Funcionario.objects.values_list('cargo', flat=True).distinct()
 
@@ -173,7 +206,7 @@ def cadastrar_escala(request):
         cargo = request.POST.get('cargo')
         mes = int(request.POST.get('mes', mes_atual))
         ano = int(request.POST.get('ano', ano_atual))
-        dias = range(1, calendar.monthrange(ano, mes)[1] + 1)
+        dias = range(1, dias_no_mes(ano, mes) + 1)
 
         unidade = Unidade.objects.get(id=unidade_id)
 
@@ -186,14 +219,16 @@ def cadastrar_escala(request):
         if cargo:
             funcionarios = funcionarios.filter(cargo=cargo)
 
-        for func in funcionarios:
-            print(func.nome_completo)
+        turnos = mapa_turnos()
+        celulas = {}
+        for func_id in funcionarios.values_list('id', flat=True):
             for dia in dias:
-                turno_codigo = request.POST.get(f'turno_{func.id}_{dia}')
+                turno_codigo = request.POST.get(f'turno_{func_id}_{dia}')
+                if turno_codigo is None or (turno_codigo and turno_codigo not in turnos):
+                    continue  # célula não enviada ou sigla desconhecida: não mexe
+                celulas[(func_id, dia)] = turnos.get(turno_codigo) if turno_codigo else None
 
-                if turno_codigo:
-                    tipo_turno = Turno.objects.get(sigla=turno_codigo)
-                    AtribuicaoEscala.objects.create(escala=escala, funcionario=func, dia=dia, tipo_turno=tipo_turno, ch_mensal=0)
+        salvar_grade(escala, celulas, autor=request.user.get_username())
 
         messages.success(request, "Escala cadastrada com sucesso!")
         return redirect('escala_detalhe', unidade_id=unidade_id, mes=mes, ano=ano)
@@ -207,187 +242,454 @@ def cadastrar_escala(request):
         'cargos_unicos': cargos_unicos
     })
 
-def calcular_ch_mensal(request, escala_id):
-    if request.method == 'POST':
-        escala = Escala.objects.get(id=escala_id)
-        atribuicoes = AtribuicaoEscala.objects.filter(escala=escala)
-        for atribuicao in atribuicoes:
-            total_horas = sum(a.tipo_turno.duracao_horas for a in atribuicoes.filter(funcionario=atribuicao.funcionario))
-            atribuicao.ch_mensal = total_horas
-            atribuicao.save()
-        return JsonResponse({'status': 'success', 'total_horas': total_horas})
-    return JsonResponse({'status': 'error'})
+# Limite de células por lote do salvamento automático
+MAX_CELULAS_POR_LOTE = 200
 
-def obter_dias_mes_completo(ano, mes):
-    # Número de dias no mês atual
-    num_days = calendar.monthrange(ano, mes)[1]
-    # Primeiro dia do mês
-    primeiro_dia = date(ano, mes, 1)
-    # Dia da semana do primeiro dia do mês (0=segunda-feira, 6=domingo)
-    primeiro_dia_semana = primeiro_dia.weekday()
-    
-    # Início da semana anterior (domingo)
-    inicio_semana = primeiro_dia - timedelta(days=(primeiro_dia_semana + 1) % 7)
-    
-    # Lista de listas (semanas)
-    semanas = []
-    semana_atual = []
-    dia_atual = inicio_semana
-
-    while dia_atual.month == mes or (dia_atual < primeiro_dia and dia_atual.weekday() != 6):
-        semana_atual.append({
-            'data': dia_atual,
-            'nomes': []  # Substitua pela lógica adequada para obter os nomes do plantão se necessário
-        })
-        if dia_atual.weekday() == 6:  # fim da semana (sábado)
-            semanas.append(semana_atual)
-            semana_atual = []
-        
-        dia_atual += timedelta(days=1)
-    
-    # Garantir que após o loop finalizemos a última semana
-    if semana_atual:
-        semanas.append(semana_atual)
-    
-    return semanas
-
-def obter_dias_mes(ano, mes):
-    # Número de dias no mês
-    num_days = calendar.monthrange(ano, mes)[1]
-    # Primeiro dia do mês
-    primeiro_dia = date(ano, mes, 1)
-    # Dia da semana do primeiro dia do mês (0=segunda-feira, 6=domingo)
-    dia_da_semana = primeiro_dia.weekday()
-    
-    # Calcular o número de dias a adicionar do mês anterior
-    inicio_semana = primeiro_dia - timedelta(days=(dia_da_semana + 1) % 7)
-    
-    # Lista completa de dias incluindo dias do mês anterior ou posterior
-    days = []
-    current_day = inicio_semana
 
-    while current_day.month == mes or (current_day.month == mes - 1 or (mes == 1 and current_day.month == 12)):
-        days.append(current_day)
-        current_day += timedelta(days=1)
-    
-    # Preencher até o final da semana, se necessário
-    while current_day.weekday() != 6:
-        days.append(current_day)
-        current_day += timedelta(days=1)
-    
-    return days
-
-@csrf_exempt
-def get_funcionarios(request):
-
-    unidade_id = request.GET.get('unidade')
-    cargo = request.GET.get('cargo')
-    if not unidade_id:
-        return JsonResponse({'error': 'Unidade não especificada'}, status=400)
-    
-    funcionarios = Funcionario.objects.filter(unidade_id=unidade_id).order_by('nome_completo')
-    if cargo:
-        funcionarios = funcionarios.filter(cargo=cargo)
-
-    data = [{
-        'id': f.id,
-        'nome_completo': f.nome_completo,
-        'siape': f.siape,
-        'registro_conselho': f.registro_conselho,
-        'cargo': f.cargo,
-        'vinculo': f.vinculo,
-        'ch_semanal': f.ch_semanal,
-        'preferencias_turno': f.preferencias_turno
-    } for f in funcionarios]
-        
-    return JsonResponse(data, safe=False)
-
-def cobertura1(request):
-    import datetime
+@require_POST
+def api_salvar_celulas(request, unidade_id, mes, ano):
+    """
+    Salvamento automático da grade: recebe um lote pequeno de células
+    {"alteracoes": [{"funcionario": 1, "dia": 3, "turno": "M6"}, ...]} (turno vazio remove).
+    `turno` também pode ser a lista de siglas da célula (["M6", "T6"]); o que vier
+    substitui todos os turnos do dia.
+    e devolve a C.H. das linhas afetadas e a cobertura dos dias afetados.
+    """
+    try:
+        alteracoes = json.loads(request.body or b'{}').get('alteracoes', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'erros': ['JSON inválido']}, status=400)
+    if not isinstance(alteracoes, list) or not alteracoes:
+        return JsonResponse({'status': 'error', 'erros': ['Nenhuma alteração enviada']}, status=400)
+    if len(alteracoes) > MAX_CELULAS_POR_LOTE:
+        return JsonResponse({'status': 'error', 'erros': [f'Máximo de {MAX_CELULAS_POR_LOTE} células por lote']}, status=400)
+    if not 1 <= mes <= 12:
+        raise Http404("Mês inválido")
+
+    unidade = get_object_or_404(Unidade, id=unidade_id)
+    total_dias = dias_no_mes(ano, mes)
+    turnos = mapa_turnos()
+
+    celulas = {}
+    erros = []
+    for i, alteracao in enumerate(alteracoes):
+        try:
+            func_id = int(alteracao['funcionario'])
+            dia = int(alteracao['dia'])
+            turno = alteracao.get('turno') or []
+            siglas = [sigla.strip() for sigla in ([turno] if isinstance(turno, str) else turno)]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            erros.append(f'Alteração {i}: campos funcionario, dia e turno são obrigatórios')
+            continue
+        siglas = [sigla for sigla in siglas if sigla]
+        desconhecidas = [sigla for sigla in siglas if sigla not in turnos]
+        if not 1 <= dia <= total_dias:
+            erros.append(f'Alteração {i}: dia {dia} fora do mês')
+        elif desconhecidas:
+            erros.append(f'Alteração {i}: turno {", ".join(desconhecidas)} não cadastrado')
+        else:
+            celulas[(func_id, dia)] = [turnos[sigla] for sigla in siglas]
+
+    funcionario_ids = {func_id for func_id, _ in celulas}
+    da_unidade = set(
+        Funcionario.objects.filter(unidade=unidade, id__in=funcionario_ids).values_list('id', flat=True)
+    )
+    for func_id in sorted(funcionario_ids - da_unidade):
+        erros.append(f'Funcionário {func_id} não pertence à unidade')
+    if erros:
+        return JsonResponse({'status': 'error', 'erros': erros}, status=400)
+
+    escala, _ = Escala.objects.get_or_create(unidade=unidade, mes=mes, ano=ano)
+    salvar_grade(escala, celulas, autor=request.user.get_username())
+
+    dias = sorted({dia for _, dia in celulas})
+    horas = horas_mensais(escala, funcionario_ids)
+    cobertura = cobertura_dos_dias(escala, dias)
+    return JsonResponse({
+        'status': 'success',
+        'escala': escala.id,
+        'totais_funcionarios': {str(func_id): total for func_id, total in horas.items()},
+        'cobertura': {str(dia): totais for dia, totais in cobertura.items()},
+        # só o que as células alteradas podem ter mudado; a grade troca as marcações do escopo
+        'validacao': validar_alteracoes(escala, set(celulas), cobertura),
+    })
 
-    # Pega mês e ano do POST ou atual
-    mes = int(request.POST.get("mes", datetime.datetime.now().month))
-    ano = int(request.POST.get("ano", datetime.datetime.now().year))
 
-    # Unidade selecionada
-    unidade_selecionada = request.POST.get("unidade")
-    unidades = Unidade.objects.all()
-
-    # Pegar a escala do mês/ano/unidade
-    escala = None
-    nome_unidade = ""
-    if unidade_selecionada:
-        escala = Escala.objects.filter(mes=mes, ano=ano, unidade_id=unidade_selecionada).first()
-        if escala:
-            nome_unidade = escala.unidade.nome
+def api_validar_escala(request, unidade_id, mes, ano):
+    """
+    Violações das regras trabalhistas na escala inteira (ver escalas.regras).
+    """
+    if not 1 <= mes <= 12:
+        raise Http404("Mês inválido")
+    escala = escala_do_mes(unidade_id, mes, ano)
+    violacoes = validar_escala(escala)
+    return JsonResponse({
+        'status': 'success',
+        'escala': escala.id if escala else None,
+        'erros': sum(1 for v in violacoes if v['gravidade'] == ERRO),
+        'violacoes': violacoes,
+    })
 
-    # Número de dias do mês
-    num_days = calendar.monthrange(ano, mes)[1]
+@require_POST
+def copiar_escala(request, unidade_id, mes, ano):
+    """
+    Preenche a escala do mês copiando a do mês anterior (ver escalas.copia).
+    """
+    get_object_or_404(Unidade, id=unidade_id)
+    if not 1 <= mes <= 12:
+        raise Http404("Mês inválido")
+    modo = request.POST.get('modo', SEMANA)
+    ciclo = request.POST.get('ciclo', '')
+    try:
+        resultado = copiar_mes(
+            mes, ano, [unidade_id], modo=modo, ciclo=int(ciclo) if ciclo.isdigit() else CICLO_PADRAO,
+            substituir=bool(request.POST.get('substituir')),
+        )
+    except ValueError as exc:
+        messages.warning(request, str(exc))
+        return redirect('escala_detalhe', unidade_id=unidade_id, mes=mes, ano=ano)
 
-    # Lista de dias do mês
-    days = [date(ano, mes, d) for d in range(1, num_days + 1)]
+    if resultado['sem_origem']:
+        messages.warning(request, "Não há escala do mês anterior para copiar.")
+    elif resultado['preenchidas']:
+        messages.warning(request, "A escala já tem células; marque \"substituir\" para copiar por cima.")
+    else:
+        texto = f"{resultado['criadas']} célula(s) copiadas do mês anterior."
+        if resultado['puladas_ferias']:
+            texto += f" {resultado['puladas_ferias']} caíram em férias e não foram copiadas."
+        messages.success(request, texto)
+    return redirect('escala_detalhe', unidade_id=unidade_id, mes=mes, ano=ano)
+
+
+def _enfileirar_geracao(request, unidade_id, mes, ano):
+    # mínimos por período e cargo vêm do formulário de geração
+    cobertura_minima = {}
+    for periodo in PERIODOS:
+        valor = request.POST.get(f'min_{periodo}', '')
+        if valor.isdigit():
+            cobertura_minima[periodo] = int(valor)
+    return enfileirar(
+        'gerar_escala', unidade_id=unidade_id, mes=mes, ano=ano,
+        cobertura_minima=cobertura_minima, cargo=request.POST.get('cargo') or None,
+    )
+
+
+def _mensagens_da_geracao(request, resultado):
+    resultado = resultado or {}
+    messages.success(request, f"Escala gerada em {resultado.get('segundos', 0):.1f}s.")
+    pendencias = resultado.get('pendencias', [])
+    for pendencia in pendencias[:MAX_PENDENCIAS_EXIBIDAS]:
+        messages.warning(request, pendencia)
+    if len(pendencias) > MAX_PENDENCIAS_EXIBIDAS:
+        messages.warning(request, f"... e mais {len(pendencias) - MAX_PENDENCIAS_EXIBIDAS} pendência(s).")
+
+
+@require_POST
+def api_enfileirar_geracao(request, unidade_id, mes, ano):
+    """
+    Coloca a geração da escala na fila; o andamento é consultado em api_tarefa.
+    """
+    get_object_or_404(Unidade, id=unidade_id)
+    tarefa = _enfileirar_geracao(request, unidade_id, mes, ano)
+    return JsonResponse({**dados_tarefa(tarefa), 'url': reverse('api_tarefa', args=[tarefa.id])}, status=202)
+
+
+@require_POST
+def api_enfileirar_recalculo(request, escala_id):
+    escala = get_object_or_404(Escala, id=escala_id)
+    tarefa = enfileirar('recalcular_ch', escala_id=escala.id)
+    return JsonResponse({**dados_tarefa(tarefa), 'url': reverse('api_tarefa', args=[tarefa.id])}, status=202)
+
+
+def api_tarefa(request, tarefa_id):
+    tarefa = get_object_or_404(Tarefa, id=tarefa_id)
+    return JsonResponse(dados_tarefa(tarefa))
+
+def _resposta_exportacao(atribuicoes, formato, nome_arquivo, num_dias=31):
+    if formato == 'csv':
+        resposta = StreamingHttpResponse(gerar_csv(atribuicoes, num_dias), content_type='text/csv; charset=utf-8')
+        resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.csv"'
+        return resposta
+    if formato == 'xlsx':
+        if xlsxwriter is None:
+            return JsonResponse({'status': 'error', 'message': 'Exportação em XLSX indisponível (instale xlsxwriter).'}, status=501)
+        return FileResponse(
+            gerar_xlsx(atribuicoes, num_dias, titulo=nome_arquivo), as_attachment=True, filename=f'{nome_arquivo}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    return JsonResponse({'status': 'error', 'message': 'Formato deve ser csv ou xlsx.'}, status=400)
 
-    days = obter_dias_mes_completo(ano, mes)
 
-    # Dias da semana em português
-    dias_semana_pt = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+def exportar_escala(request, escala_id, formato):
+    escala = get_object_or_404(Escala, id=escala_id)
+    num_dias = dias_no_mes(escala.ano, escala.mes)
+    nome = f'escala_{escala.unidade_id}_{escala.ano}_{escala.mes:02d}'
+    return _resposta_exportacao(atribuicoes_da_escala(escala), formato, nome, num_dias)
 
-    # Preparando dias com nome do dia e funcionários
-    dias_mes = []
-    semana_atual = []
-    for day in days:
-        nomes = []
-        if escala:
-            atribuicoes = AtribuicaoEscala.objects.filter(escala=escala, dia=day.day)
-            nomes = [a.funcionario.nome_completo for a in atribuicoes]
 
-        # Cria objeto simples para template
-        dia_obj = type('Dia', (), {})()
-        dia_obj.data = day
-        dia_obj.nome_dia = dias_semana_pt[day.weekday()]
-        dia_obj.nomes = nomes
+def _enfileirar_exportacao(request, nome, **parametros):
+    # XLSX de todas as unidades vai para a fila: a planilha inteira é escrita antes do primeiro byte
+    if request.method != 'POST':
+        return JsonResponse(
+            {'status': 'error', 'message': 'A exportação em XLSX de todas as unidades é enfileirada: use POST.'},
+            status=405,
+        )
+    if xlsxwriter is None:
+        return JsonResponse({'status': 'error', 'message': 'Exportação em XLSX indisponível (instale xlsxwriter).'}, status=501)
+    tarefa = enfileirar('exportar_xlsx', nome=nome, **parametros)
+    return JsonResponse({**dados_tarefa(tarefa), 'url': reverse('api_tarefa', args=[tarefa.id])}, status=202)
+
+
+def exportar_mes(request, mes, ano, formato):
+    """
+    Todas as unidades no mês, uma linha por funcionário em cada escala.
+    Em XLSX responde 202 com a tarefa; o link de download sai no resultado dela.
+    """
+    if not 1 <= mes <= 12:
+        raise Http404
+    if formato == 'xlsx':
+        return _enfileirar_exportacao(request, f'escalas_{ano}_{mes:02d}', mes=mes, ano=ano)
+    num_dias = dias_no_mes(ano, mes)
+    return _resposta_exportacao(atribuicoes_do_mes(mes, ano), formato, f'escalas_{ano}_{mes:02d}', num_dias)
+
+
+def exportar_periodo(request, formato):
+    """
+    Todas as unidades entre ?inicio=AAAA-MM-DD e ?fim=AAAA-MM-DD (inclusive).
+    Em XLSX (POST) responde 202 com a tarefa, como exportar_mes.
+    """
+    try:
+        inicio = date.fromisoformat(request.GET.get('inicio', ''))
+        fim = date.fromisoformat(request.GET.get('fim', ''))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Informe inicio e fim no formato AAAA-MM-DD.'}, status=400)
+    if inicio > fim:
+        return JsonResponse({'status': 'error', 'message': 'O início deve ser anterior ao fim.'}, status=400)
+    nome = f'escalas_{inicio:%Y%m%d}_{fim:%Y%m%d}'
+    if formato == 'xlsx':
+        return _enfileirar_exportacao(request, nome, inicio=inicio.isoformat(), fim=fim.isoformat())
+    return _resposta_exportacao(atribuicoes_do_periodo(inicio, fim), formato, nome, dias_do_periodo(inicio, fim))
+
+def baixar_exportacao(request, tarefa_id):
+    """
+    Planilha gerada pela tarefa "exportar_xlsx" (404 enquanto não termina).
+    """
+    tarefa = get_object_or_404(Tarefa, id=tarefa_id, tipo='exportar_xlsx', status=Tarefa.CONCLUIDA)
+    caminho = caminho_artefato(tarefa.resultado['chave'], 'xlsx')
+    if not caminho.exists():
+        raise Http404("O arquivo da exportação já foi removido; exporte de novo.")
+    return FileResponse(
+        open(caminho, 'rb'), as_attachment=True, filename=tarefa.resultado['nome'],
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+def escala_pdf(request, escala_id):
+    """
+    PDF da escala para impressão, servido do disco enquanto a escala não muda.
+    """
+    escala = get_object_or_404(Escala.objects.select_related('unidade'), id=escala_id)
+    if not pdf_disponivel():
+        return JsonResponse({'status': 'error', 'message': 'Geração de PDF indisponível (instale reportlab).'}, status=501)
+    chave = chave_pdf(escala)
+    etag = f'"{chave}"'
+    # If-None-Match com lista, W/ ou *: a comparação fica com o Django
+    resposta = get_conditional_response(request, etag=etag)
+    if resposta is None:
+        nome = f'escala_{escala.unidade_id}_{escala.ano}_{escala.mes:02d}.pdf'
+        resposta = FileResponse(
+            open(pdf_da_escala(escala, chave), 'rb'), filename=nome, content_type='application/pdf',
+            as_attachment=request.GET.get('baixar') == '1',
+        )
+    resposta['ETag'] = etag
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
+
+def historico_escala(request, escala_id):
+    """
+    Versões da escala e comparação entre duas (?a=3&b=7). ?em=AAAA-MM-DD escolhe como B
+    a versão vigente no fim daquele dia; sem A, compara com a versão anterior a B.
+    """
+    escala = get_object_or_404(Escala.objects.select_related('unidade'), id=escala_id)
+    versoes = list(VersaoEscala.objects.filter(escala=escala).defer('grade').order_by('-numero'))
+    numero_b = request.GET.get('b', '')
+    numero_b = int(numero_b) if numero_b.isdigit() else (versoes[0].numero if versoes else None)
+    if request.GET.get('em'):
+        try:
+            dia = date.fromisoformat(request.GET['em'])
+        except ValueError:
+            messages.warning(request, 'Data inválida; use AAAA-MM-DD.')
+        else:
+            numero_b = versao_em(escala.id, timezone.make_aware(datetime.combine(dia, time.max)))
+            if numero_b is None:
+                messages.warning(request, f'A escala ainda não tinha versões em {dia:%d/%m/%Y}.')
+    numero_a = request.GET.get('a', '')
+    numero_a = int(numero_a) if numero_a.isdigit() else (numero_b - 1 if numero_b and numero_b > 1 else None)
+
+    diferencas = None
+    if numero_a and numero_b:
+        diferencas = comparar_versoes(escala.id, numero_a, numero_b)
+        if diferencas is None:
+            messages.warning(request, 'Versão não encontrada.')
+        else:
+            nomes = dict(Funcionario.objects.filter(
+                id__in={d['funcionario'] for d in diferencas}
+            ).values_list('id', 'nome_completo'))
+            for diferenca in diferencas:
+                diferenca['nome'] = nomes.get(diferenca['funcionario'], f"#{diferenca['funcionario']}")
+
+    return render(request, 'escalas/historico_escala.html', {
+        'escala': escala,
+        'versoes': [
+            {
+                'numero': v.numero, 'criada_em': v.criada_em, 'autor': v.autor, 'origem': v.origem,
+                'adicionadas': len(v.adicionadas) // 3, 'removidas': len(v.removidas) // 3,
+                'base': v.grade is not None,
+            }
+            for v in versoes
+        ],
+        'numero_a': numero_a,
+        'numero_b': numero_b,
+        'diferencas': diferencas,
+    })
 
-        semana_atual.append(dia_obj)
 
-        # Quebra semana a cada domingo
-        if day.weekday() == 6:
-            dias_mes.append(semana_atual)
-            semana_atual = []
+def api_versao_escala(request, escala_id, numero):
+    """
+    Grade da escala como estava na versão `numero`.
+    """
+    escala = get_object_or_404(Escala, id=escala_id)
+    celulas = grade_na_versao(escala.id, numero)
+    if celulas is None:
+        return JsonResponse({'status': 'error', 'message': 'Versão não encontrada.'}, status=404)
+    siglas = dict(Turno.objects.values_list('id', 'sigla'))
+    return JsonResponse({
+        'status': 'success',
+        'escala': escala.id,
+        'versao': numero,
+        'celulas': [
+            {'funcionario': func_id, 'dia': dia, 'turno': siglas.get(turno_id, '?')}
+            for func_id, dia, turno_id in sorted(celulas)
+        ],
+    })
 
-    # Adiciona última semana se tiver dias restantes
-    if semana_atual:
-        dias_mes.append(semana_atual)
 
-    # Meses e anos para filtros
-    meses = [(i, calendar.month_name[i]) for i in range(1, 13)]
-    anos = [ano-1, ano, ano+1]
+# Comentário enviado quando não há eventos, para proxies não derrubarem a conexão
+PULSO_EVENTOS = 25
 
-    MESES_PT = [
-        "", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
-        "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"
-    ]
-    meses = [(i, MESES_PT[i]) for i in range(1, 13)]
 
-   
+async def eventos_escala(request, escala_id):
+    """
+    Server-sent events da escala para as páginas abertas (cobertura, ver_escala):
+    "celulas", "totais" e "recarregar" (ver escalas.eventos). Precisa do servidor
+    ASGI (escala_trabalho.asgi); no WSGI a resposta de streaming nunca terminaria.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'status': 'error', 'message': 'Eventos ao vivo exigem o servidor ASGI (escala_trabalho.asgi).'}, status=501
+        )
+    if not await Escala.objects.filter(id=escala_id).aexists():
+        raise Http404("Escala não encontrada")
 
-    context = {
-        "dias_mes": dias_mes,
-        "mes": mes,
-        "ano": ano,
-        "meses": meses,
-        "anos": anos,
-        "unidades": unidades,
-        "unidade_selecionada": int(unidade_selecionada) if unidade_selecionada else None,
-        "nome_unidade": nome_unidade,
+    async def fluxo():
+        assinatura = barramento().assinar(canal_escala(escala_id))
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                evento = await assinatura.proximo(PULSO_EVENTOS)
+                if evento is None:
+                    yield ': pulso\n\n'
+                else:
+                    yield f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            assinatura.cancelar()
+
+    resposta = StreamingHttpResponse(fluxo(), content_type='text/event-stream')
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'  # nginx: não segurar os eventos no buffer
+    return resposta
+
+
+def _parametros_analise(parametros):
+    """
+    Período (?inicio=&fim=, padrão: trimestre atual), unidades (?unidade=1&unidade=2)
+    e mínimos (?min_matutino=...) da análise.
+    """
+    hoje = date.today()
+    inicio_trimestre = date(hoje.year, 3 * ((hoje.month - 1) // 3) + 1, 1)
+    fim_trimestre = ultimo_dia(hoje.year, inicio_trimestre.month + 2)
+    inicio = date.fromisoformat(parametros.get('inicio') or inicio_trimestre.isoformat())
+    fim = date.fromisoformat(parametros.get('fim') or fim_trimestre.isoformat())
+    if inicio > fim:
+        raise ValueError('O início deve ser anterior ao fim.')
+    unidade_ids = [int(u) for u in parametros.getlist('unidade') if u.isdigit()]
+    cobertura_minima = {}
+    for periodo in PERIODOS:
+        valor = parametros.get(f'min_{periodo}', '')
+        if valor.isdigit():
+            cobertura_minima[periodo] = int(valor)
+    return inicio, fim, unidade_ids, cobertura_minima
+
+
+def api_analise(request):
+    if not analise_disponivel():
+        return JsonResponse({'status': 'error', 'message': 'Análises indisponíveis (instale numpy).'}, status=501)
+    try:
+        inicio, fim, unidade_ids, cobertura_minima = _parametros_analise(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+    return JsonResponse(analisar(inicio, fim, unidade_ids, cobertura_minima))
+
+
+def painel_analise(request):
+    """
+    Painel com lacunas de cobertura, horas x contrato e distribuição de noturnos,
+    fins de semana e feriados de todas as unidades no período.
+    """
+    contexto = {'unidades': Unidade.objects.all(), 'disponivel': analise_disponivel()}
+    try:
+        inicio, fim, unidade_ids, cobertura_minima = _parametros_analise(request.GET)
+    except ValueError as exc:
+        messages.warning(request, f'Período inválido: {exc}')
+        inicio, fim, unidade_ids, cobertura_minima = _parametros_analise(QueryDict())
+    contexto.update({'inicio': inicio, 'fim': fim, 'unidades_selecionadas': unidade_ids})
+    if contexto['disponivel']:
+        contexto['analise'] = analisar(inicio, fim, unidade_ids, cobertura_minima)
+    return render(request, 'escalas/analise.html', contexto)
+
+@staff_member_required
+def painel_desempenho(request):
+    """
+    Amostras recentes do DesempenhoMiddleware neste processo: resumo por view e as
+    requisições mais lentas com as consultas que pesaram (?view= filtra uma view).
+    """
+    amostras = registro.amostras()
+    view = request.GET.get('view')
+    if view:
+        amostras = [a for a in amostras if a['view'] == view]
+    contexto = {
+        'ativo': 'escalas.desempenho.DesempenhoMiddleware' in settings.MIDDLEWARE
+                 and getattr(settings, 'ESCALAS_DESEMPENHO_AMOSTRAGEM', 0) > 0,
+        'total': len(amostras),
+        'view': view,
+        'resumo': resumo_por_view(amostras),
+        'lentas': sorted(amostras, key=lambda a: -a['total_ms'])[:20],
     }
+    return render(request, 'escalas/desempenho.html', contexto)
 
-    return render(request, "escalas/cobertura.html", context)
-
-
+def calcular_ch_mensal(request, escala_id):
+    if request.method == 'POST':
+        escala = get_object_or_404(Escala, id=escala_id)
+        horas = recalcular_escala(escala)
+        return JsonResponse({
+            'status': 'success',
+            'total_horas': sum(horas.values()),
+            'funcionarios': {str(func_id): total for func_id, total in horas.items()},
+        })
+    return JsonResponse({'status': 'error'})
 
 def cobertura(request):
 
-    atribuicoes = ''
+    escala = None
     nome_unidade = ''
     
 
@@ -401,39 +703,35 @@ def cobertura(request):
     if request.method == 'POST':
         if unidade_id :
             unidade_id = int(unidade_id)
-            escala = Escala.objects.filter(ano=ano, mes=mes, unidade_id = unidade_id).first()
+            escala = escala_do_mes(unidade_id, mes, ano)
             if escala: 
-                escala_id = escala.id
                 nome_unidade = escala.unidade.nome 
-                # buscar atribuições no banco (ajuste conforme seus models)
-                atribuicoes = AtribuicaoEscala.objects.filter(escala_id=escala_id)
 
 
-    # montar matriz de dias do mês (semanas completas)
-    cal = calendar.Calendar(firstweekday=6)  # domingo
-    dias_mes = list(cal.monthdatescalendar(ano, mes))
-    
-
     # dicionário dia -> nomes
-    cobertura_dict = {}
+    cobertura_dict = cobertura_da_escala(escala)
 
-    for atrib in atribuicoes:
-        d = atrib.dia
-        if d not in cobertura_dict:
-            cobertura_dict[d] = []
-        cobertura_dict[d].append(atrib.funcionario.nome_completo)
+    # equipe fora de férias em cada dia (só com a unidade escolhida)
+    disponiveis = []
+    if request.method == 'POST' and unidade_id:
+        equipe = Funcionario.objects.filter(unidade_id=unidade_id).values_list("id", flat=True)
+        disponiveis = DisponibilidadeMes.da_unidade(unidade_id, ano, mes, list(equipe)).disponiveis_por_dia()
 
-    # agora monta matriz com nomes já prontos
+    # semanas completas (domingo a sábado) com os nomes já prontos
+    calendario_mes = mes_calendario(ano, mes)
     dias_com_cobertura = []
-    for semana in dias_mes:
+    for semana in calendario_mes.semanas:
         semana_lista = []
-        for dia in semana:
-            nomes = cobertura_dict.get(dia.day, []) if dia.month == mes else []
+        for data in semana:
+            do_mes = data.month == mes
+            dia = calendario_mes.dia(data.day) if do_mes else None
             semana_lista.append({
-                "data": dia,
-                "nomes": nomes
+                "data": data,
+                "nomes": cobertura_dict.get(data.day, []) if do_mes else [],
+                "fim_de_semana": data.weekday() >= 5,
+                "feriado": dia.feriado if dia else False,
+                "disponiveis": disponiveis[data.day - 1] if do_mes and disponiveis else None,
             })
-        semana_lista = semana_lista
         dias_com_cobertura.append(semana_lista)
 
     MESES_PT = [
@@ -444,6 +742,7 @@ def cobertura(request):
    
 
     return render(request, "escalas/cobertura.html", {
+        "escala": escala,
         "nome_unidade":nome_unidade,
         "ano": ano,
         "mes": mes,
@@ -457,68 +756,17 @@ def cobertura(request):
 
 def ver_escalas(request):
 
-    atribuicoes = []
     nome_unidade = ''
 
     ano = int(request.POST.get("ano", datetime.now().year))
     mes = int(request.POST.get("mes", datetime.now().month))
     unidade_id = int(request.POST.get("unidade",0))
 
-    try:
-        unidade = Unidade.objects.get(id=unidade_id)    
-        nome_unidade = unidade.nome
-    except Unidade.DoesNotExist:
-        nome_unidade =''
-        unidade = []
-    
-    escala = Escala.objects.filter(ano=ano, mes=mes, unidade_id = unidade_id).first()
-
-    atribuicoes = AtribuicaoEscala.objects.filter(escala=escala)
-
-    
-    num_days = calendar.monthrange(ano, mes)[1]
-    days = [date(ano, mes, d) for d in range(1, num_days + 1)]
-        
-    dias_com_cobertura = []
-
-    cal = calendar.Calendar(firstweekday=6)  # domingo
-    dias_mes = list(cal.monthdatescalendar(ano, mes))
-
-    # dicionário dia -> nomes
-    cobertura_dict = {}
-
-    for semana in dias_mes:
-        semana_lista = []
-        for dia in semana:
-            nomes = cobertura_dict.get(dia.day, []) if dia.month == mes else []
-            semana_lista.append({
-                "data": dia,
-                "nomes": nomes
-            })
-        semana_lista = semana_lista
-        dias_com_cobertura.append(semana_lista)
-
-    funcionarios_dict = {}
-    for atrib in atribuicoes:
-        func = atrib.funcionario
-        
-        if func.id not in funcionarios_dict:
-            funcionarios_dict[func.id] = {
-                "funcionario": func,
-                "dias": {d.day: "" for d in days},  # todos os dias em branco
-                "total_horas": 0,
-            }
-
-        funcionarios_dict[func.id]["dias"][atrib.dia] = atrib.tipo_turno.codigo
-
-        funcionarios_dict[func.id]["dias_list"] = [
-            funcionarios_dict[func.id]["dias"][d.day] for d in days
-        ]
-        
-        if hasattr(atrib.tipo_turno, "duracao_horas"):
-            funcionarios_dict[func.id]["total_horas"] += int(atrib.tipo_turno.duracao_horas)
-
-    funcionarios = list(funcionarios_dict.values())
+    escala = escala_do_mes(unidade_id, mes, ano)
+    if escala:
+        nome_unidade = escala.unidade.nome
+    else:
+        nome_unidade = Unidade.objects.filter(id=unidade_id).values_list('nome', flat=True).first() or ''
 
     MESES_PT = [
         "", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
@@ -529,29 +777,14 @@ def ver_escalas(request):
 
     anos = [ano for ano in range(2023, ano + 2)]  # exemplo
 
-    # totais por turno (igual já tínhamos)
-    totals = {"matutino": [], "vespertino": [], "noturno": []}
-    for day in days:
-        totals["matutino"].append(
-                atribuicoes.filter(dia=day.day, tipo_turno__codigo__startswith="M").count()
-        )
-        totals["vespertino"].append(
-            atribuicoes.filter(dia=day.day, tipo_turno__codigo__startswith="T").count()
-        )
-        totals["noturno"].append(
-            atribuicoes.filter(dia=day.day, tipo_turno__codigo__startswith="N").count()
-        )
-
     return render(request, "escalas/ver_escala.html",{
         "ano": ano,
         "mes": mes,
         "anos":anos,
         "meses": meses,
-        "days": days,
-        "funcionarios": funcionarios, 
-        "dias_mes": dias_com_cobertura,
         'nome_unidade': nome_unidade,
         "unidade_selecionada": unidade_id,
         "unidades": Unidade.objects.all(),
-        'totals':totals,
+        'escala': escala,
+        **contexto_grade(escala, unidade_id, mes, ano),
     })
\ No newline at end of file